@@ -0,0 +1,213 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agents.nodes.context import terms
+from agents.nodes.notes import CITATION
+from core.cache import canonical_url
+from core.config import GROUNDING_MIN_SUPPORT
+
+# Sentence ends, and line breaks (bullets, headings)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+# A full stop after one of these doesn't end the sentence ("e.g. LangGraph",
+# "Dr. Smith", "the U.S. market")
+_ABBREVIATION = re.compile(
+    r"(?:\b(?:e\.g|i\.e|vs|cf|al|approx|Dr|Mr|Mrs|Ms|Prof|St|Fig|Inc|Ltd|Jr|Sr)|\b[A-Z](?:\.[A-Z])*)\.$"
+)
+# Citations opening a part close the previous sentence ("Fact. (source: URL) Next...")
+_LEADING_CITATIONS = re.compile(r"^(?:\s*" + CITATION.pattern + r")+")
+
+# Indexes kept for reuse (one per distinct document set)
+_INDEX_CACHE_SIZE = 64
+
+
+def split_sentences(draft: str) -> List[Tuple[str, List[str]]]:
+    """(sentence text without citations, cited URLs) for each sentence of a draft.
+
+    A citation after the sentence's full stop ("... fact. (source: URL)")
+    belongs to the sentence before it.
+    """
+    sentences: List[Tuple[str, List[str]]] = []
+    for part in _parts(draft):
+        lead = _LEADING_CITATIONS.match(part)
+        if lead and sentences:
+            sentences[-1][1].extend(CITATION.findall(lead.group(0)))
+            part = part[lead.end():]
+        urls = CITATION.findall(part)
+        text = CITATION.sub("", part).strip()
+        if not terms(text):
+            if urls and sentences:
+                sentences[-1][1].extend(urls)
+            continue
+        sentences.append((text, urls))
+    return sentences
+
+
+def _parts(draft: str) -> List[str]:
+    """The draft split at sentence ends and line breaks, except after an abbreviation."""
+    parts: List[str] = []
+    pos = 0
+    glue = False
+    for match in _SENTENCE_SPLIT.finditer(draft):
+        piece = draft[pos:match.start()]
+        if glue:
+            parts[-1] += piece
+        else:
+            parts.append(piece)
+        glue = "\n" not in match.group(0) and _ABBREVIATION.search(piece) is not None
+        if glue:
+            parts[-1] += match.group(0)
+        pos = match.end()
+    if glue:
+        parts[-1] += draft[pos:]
+    else:
+        parts.append(draft[pos:])
+    return parts
+
+
+class DocumentIndex:
+    """Inverted index over one run's retrieved documents.
+
+    Each term maps to the documents containing it (a term x document
+    incidence matrix plus idf weights). A sentence's support against a
+    document is the idf-weighted share of its terms that occur in that
+    document, 0..1; every sentence is scored against every document in a
+    single matrix pass.
+    """
+
+    def __init__(self, documents: Sequence[Dict[str, Any]]):
+        self.urls = [d.get("url") or "" for d in documents]
+        self._by_url = {canonical_url(u): i for i, u in enumerate(self.urls) if u}
+        # Cited URL -> document; a run's drafts cite the same few URLs again
+        # and again, and parsing one is most of a lookup's cost
+        self._found: Dict[str, Optional[int]] = {}
+        n_docs = len(documents)
+        vocab: Dict[str, int] = {}
+        doc_ids: List[np.ndarray] = []
+        for d in documents:
+            words = set(terms(d.get("content") or ""))
+            doc_ids.append(np.fromiter((vocab.setdefault(w, len(vocab)) for w in words), dtype=np.int64, count=len(words)))
+        self.vocab = vocab
+        self.present = np.zeros((len(vocab), n_docs), dtype=bool)
+        for j, ids in enumerate(doc_ids):
+            self.present[ids, j] = True
+        df = self.present.sum(axis=1)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        # A term no document contains counts as fully specific
+        self.unseen_idf = float(np.log1p((n_docs + 0.5) / 0.5))
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def find(self, url: str) -> Optional[int]:
+        try:
+            return self._found[url]
+        except KeyError:
+            found = self._found[url] = self._by_url.get(canonical_url(url))
+            return found
+
+    def support(self, sentences: Sequence[str]) -> np.ndarray:
+        """Support of each sentence (rows) by each document (columns)."""
+        n, n_docs = len(sentences), len(self.urls)
+        if n == 0 or n_docs == 0:
+            return np.zeros((n, n_docs))
+        rows: List[int] = []
+        ids: List[int] = []
+        for i, s in enumerate(sentences):
+            for w in set(terms(s)):
+                rows.append(i)
+                ids.append(self.vocab.get(w, -1))
+        rows_a = np.asarray(rows, dtype=np.int64)
+        ids_a = np.asarray(ids, dtype=np.int64)
+        known = ids_a >= 0
+        weight = np.full(ids_a.size, self.unseen_idf)
+        weight[known] = self.idf[ids_a[known]]
+        total = np.bincount(rows_a, weights=weight, minlength=n)
+        covered = np.zeros((n, n_docs))
+        # Sum idf of each sentence's terms present in each document
+        np.add.at(covered, rows_a[known], weight[known, None] * self.present[ids_a[known]])
+        out = np.zeros((n, n_docs))
+        np.divide(covered, total[:, None], out=out, where=total[:, None] > 0)
+        return out
+
+
+_cache: "OrderedDict[bytes, DocumentIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _documents_key(documents: Sequence[Dict[str, Any]]) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for d in documents:
+        h.update((d.get("url") or "").encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+        h.update((d.get("content") or "").encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return h.digest()
+
+
+def get_index(documents: Sequence[Dict[str, Any]]) -> DocumentIndex:
+    """The index for this document set, built on first use.
+
+    The verifier and drift scoring look at the same run's documents, so
+    they share one index.
+    """
+    key = _documents_key(documents)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+    index = DocumentIndex(documents)
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > _INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def grounding_report(
+    draft: str,
+    documents: Sequence[Dict[str, Any]],
+    min_support: float = GROUNDING_MIN_SUPPORT,
+) -> Dict[str, Any]:
+    """How well the draft's sentences are supported by the retrieved documents.
+
+    For each sentence: support by its cited source(s) (best of them; 0 when
+    none of them was retrieved) and by the best-matching source overall.
+    The summary covers cited sentences only.
+    """
+    sentences = split_sentences(draft)
+    index = get_index(documents)
+    scores = index.support([text for text, _ in sentences])
+
+    per_sentence = []
+    unknown: List[str] = []
+    cited_support: List[float] = []
+    for i, (text, urls) in enumerate(sentences):
+        best = int(scores[i].argmax()) if len(index) else None
+        entry = {
+            "sentence": text,
+            "cited": urls,
+            "cited_support": None,
+            "best_url": index.urls[best] if best is not None else None,
+            "best_support": float(scores[i, best]) if best is not None else 0.0,
+        }
+        if urls:
+            docs = [index.find(u) for u in urls]
+            found = [j for j in docs if j is not None]
+            unknown.extend(u for u, j in zip(urls, docs) if j is None and u not in unknown)
+            entry["cited_support"] = float(max(scores[i, j] for j in found)) if found else 0.0
+            cited_support.append(entry["cited_support"])
+        per_sentence.append(entry)
+
+    return {
+        "sentences": per_sentence,
+        "cited_sentences": len(cited_support),
+        "unknown_citations": unknown,
+        "support_score": float(np.mean(cited_support)) if cited_support else None,
+        "unsupported": sum(1 for s in cited_support if s < min_support),
+    }
@@ -0,0 +1,302 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import sys
+import time
+import zlib
+from collections import deque
+from typing import TYPE_CHECKING, Any, AsyncIterator, Deque, Dict, Optional, Sequence, Tuple, Union
+
+from core.cache import SingleFlight, cache
+from core.metrics import TOKEN_BUCKETS, metrics
+from core.config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_MODEL,
+    CACHE_ENABLED,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_TTL_S,
+)
+
+if TYPE_CHECKING:
+    # Imported on first use: langchain_openai alone takes over a second to
+    # import, which every worker would otherwise pay before serving
+    import httpx
+    from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+    from langchain_openai import ChatOpenAI
+
+Prompt = Union[str, Sequence["BaseMessage"]]
+
+# Per-call records kept for /api/llm/stats
+_RECENT_CALLS = 200
+
+log = logging.getLogger(__name__)
+
+LLM_SECONDS = metrics.histogram(
+    "agentlens_llm_call_seconds", "LLM call latency (cache hits included)", ("node", "source")
+)
+LLM_TTFT_SECONDS = metrics.histogram(
+    "agentlens_llm_ttft_seconds", "Time to first token of streamed LLM calls", ("node", "source")
+)
+LLM_TOKENS = metrics.counter("agentlens_llm_tokens_total", "Tokens spent on LLM API calls", ("node", "kind"))
+LLM_CALL_TOKENS = metrics.histogram(
+    "agentlens_llm_call_tokens", "Tokens (input + output) per LLM API call", ("node",), TOKEN_BUCKETS
+)
+
+
+def _prompt_payload(prompt: Prompt) -> Any:
+    if isinstance(prompt, str):
+        return prompt
+    return [(m.type, m.content) for m in prompt]
+
+
+def is_timeout(error: BaseException) -> bool:
+    """Whether a model call failed because its request timed out."""
+    # openai is loaded by the time one of its calls has failed
+    openai = sys.modules.get("openai")
+    timeout_error = getattr(openai, "APITimeoutError", None)
+    return isinstance(error, asyncio.TimeoutError) or (timeout_error is not None and isinstance(error, timeout_error))
+
+
+def cache_key(model: str, temperature: float, params: Dict[str, Any], prompt: Prompt) -> str:
+    """Exact-match key: model, temperature, extra parameters and a hash of the prompt."""
+    prompt_hash = hashlib.sha256(
+        json.dumps(_prompt_payload(prompt), ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    extra = json.dumps(params, sort_keys=True, default=str) if params else ""
+    return f"{model}:{temperature}:{extra}:{prompt_hash}"
+
+
+class LLMGateway:
+    """Process-wide entry point for chat model calls.
+
+    - one `ChatOpenAI` per (model, temperature, params), reused across calls,
+      all sharing one connection pool that survives between nodes and runs
+    - exact-match response cache on disk (the shared DiskCache, namespace
+      "llm", with its TTL and size-capped LRU eviction)
+    - concurrent identical requests share one API call
+    - per-call latency, time-to-first-token (streamed calls) and token accounting
+    """
+
+    def __init__(self, cache_enabled: bool = LLM_CACHE_ENABLED, ttl: float = LLM_CACHE_TTL_S):
+        self.cache_enabled = cache_enabled and CACHE_ENABLED
+        self.ttl = ttl
+        self._clients: Dict[Tuple, "ChatOpenAI"] = {}
+        self._http: Optional["httpx.AsyncClient"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flight = SingleFlight()
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=_RECENT_CALLS)
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def client(self, model: str = OPENAI_MODEL, temperature: float = 0.2, **params) -> "ChatOpenAI":
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        # The async HTTP client is bound to the loop it was first used on.
+        # ChatOpenAI's default one is cached for the whole process, so it
+        # would outlive its loop; the gateway passes its own instead.
+        if loop is not self._loop:
+            self._clients = {}
+            self._http = None
+            self._loop = loop
+        key = (model, temperature, tuple(sorted(params.items())))
+        llm = self._clients.get(key)
+        if llm is None:
+            import httpx
+            from langchain_openai import ChatOpenAI
+
+            if self._http is None:
+                self._http = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+                )
+            llm = self._clients[key] = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                api_key=OPENAI_API_KEY,
+                base_url=OPENAI_BASE_URL,
+                http_async_client=self._http,
+                # graph runs stream model output; ask for usage in streamed replies too
+                stream_usage=True,
+                **params,
+            )
+        return llm
+
+    async def aclose(self) -> None:
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+        self._clients = {}
+
+    async def ainvoke(
+        self,
+        prompt: Prompt,
+        model: str = OPENAI_MODEL,
+        temperature: float = 0.2,
+        node: str = "",
+        timeout: Optional[float] = None,
+        **params,
+    ) -> "AIMessage":
+        """Call the model (or answer from cache) and return the reply message.
+
+        With `timeout`, the call is one API request of at most that many
+        seconds, not retried (a timeout raises; see `is_timeout`). It is not
+        part of the cache key. Don't bound a call with asyncio.wait_for
+        instead: concurrent identical calls share one request.
+        """
+        from langchain_core.messages import AIMessage
+
+        key = cache_key(model, temperature, params, prompt)
+        called = False
+        transport = {"timeout": timeout, "max_retries": 0} if timeout else {}
+
+        async def call() -> Dict[str, Any]:
+            nonlocal called
+            called = True
+            msg = await self.client(model, temperature, **params, **transport).ainvoke(prompt)
+            content = msg.content if hasattr(msg, "content") else str(msg)
+            return {
+                "content": content,
+                "usage_metadata": dict(getattr(msg, "usage_metadata", None) or {}),
+                "response_metadata": dict(getattr(msg, "response_metadata", None) or {}),
+            }
+
+        start = time.perf_counter()
+        if self.cache_enabled:
+            reply = await cache.get_or_fetch("llm", key, call, self.ttl)
+        else:
+            reply = await self._flight.do(key, call)
+        latency_ms = (time.perf_counter() - start) * 1000
+        self._account(model, node, reply, latency_ms, "api" if called else "cache")
+        return AIMessage(
+            content=reply["content"],
+            usage_metadata=reply["usage_metadata"] or None,
+            response_metadata={**reply["response_metadata"], "cached": not called},
+        )
+
+    async def astream(
+        self,
+        prompt: Prompt,
+        model: str = OPENAI_MODEL,
+        temperature: float = 0.2,
+        node: str = "",
+        **params,
+    ) -> AsyncIterator["AIMessageChunk"]:
+        """Stream the reply as it is generated; chunks add up to the full message.
+
+        A cache hit arrives as a single chunk. Streamed calls are not shared
+        between concurrent callers, but a finished reply is cached like
+        `ainvoke`'s (same key), so either method can answer the other.
+        """
+        key = cache_key(model, temperature, params, prompt)
+        start = time.perf_counter()
+        if self.cache_enabled:
+            try:
+                reply = await cache.aget("llm", key)
+            except (ValueError, zlib.error, sqlite3.Error) as e:
+                log.warning("LLM cache read failed", extra={"key": key, "error": str(e)})
+                reply = None
+            if reply is not None:
+                from langchain_core.messages import AIMessageChunk
+
+                latency_ms = (time.perf_counter() - start) * 1000
+                self._account(model, node, reply, latency_ms, "cache", ttft_ms=latency_ms)
+                yield AIMessageChunk(
+                    content=reply["content"],
+                    usage_metadata=reply["usage_metadata"] or None,
+                    response_metadata={**reply["response_metadata"], "cached": True},
+                )
+                return
+
+        ttft_ms: Optional[float] = None
+        full: Optional["AIMessageChunk"] = None
+        async for chunk in self.client(model, temperature, **params).astream(prompt):
+            if ttft_ms is None and chunk.content:
+                ttft_ms = (time.perf_counter() - start) * 1000
+            full = chunk if full is None else full + chunk
+            yield chunk
+        latency_ms = (time.perf_counter() - start) * 1000
+        reply = {
+            "content": full.content if full is not None else "",
+            "usage_metadata": dict((full.usage_metadata if full is not None else None) or {}),
+            "response_metadata": dict((full.response_metadata if full is not None else None) or {}),
+        }
+        self._account(model, node, reply, latency_ms, "api", ttft_ms=ttft_ms)
+        if self.cache_enabled and reply["content"]:
+            try:
+                await cache.aset("llm", key, reply, self.ttl)
+            except (TypeError, ValueError, sqlite3.Error) as e:
+                log.warning("LLM cache write failed", extra={"key": key, "error": str(e)})
+
+    def _account(
+        self,
+        model: str,
+        node: str,
+        reply: Dict[str, Any],
+        latency_ms: float,
+        source: str,
+        ttft_ms: Optional[float] = None,
+    ) -> None:
+        usage = reply.get("usage_metadata") or {}
+        # Tokens are only spent on calls that reached the API
+        input_tokens = int(usage.get("input_tokens") or 0) if source == "api" else 0
+        output_tokens = int(usage.get("output_tokens") or 0) if source == "api" else 0
+        self.recent.append({
+            "ts": time.time(),
+            "model": model,
+            "node": node,
+            "source": source,
+            "latency_ms": round(latency_ms, 3),
+            "ttft_ms": round(ttft_ms, 3) if ttft_ms is not None else None,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+        })
+        t = self.totals.setdefault(model, {
+            "calls": 0, "api_calls": 0, "cache_hits": 0,
+            "input_tokens": 0, "output_tokens": 0, "latency_ms": 0.0,
+            "streamed_calls": 0, "ttft_ms": 0.0,
+        })
+        LLM_SECONDS.observe(latency_ms / 1000, node=node, source=source)
+        if ttft_ms is not None:
+            LLM_TTFT_SECONDS.observe(ttft_ms / 1000, node=node, source=source)
+        if source == "api":
+            LLM_TOKENS.inc(input_tokens, node=node, kind="input")
+            LLM_TOKENS.inc(output_tokens, node=node, kind="output")
+            LLM_CALL_TOKENS.observe(input_tokens + output_tokens, node=node)
+        t["calls"] += 1
+        t["api_calls" if source == "api" else "cache_hits"] += 1
+        t["input_tokens"] += input_tokens
+        t["output_tokens"] += output_tokens
+        t["latency_ms"] += latency_ms
+        if ttft_ms is not None:
+            t["streamed_calls"] += 1
+            t["ttft_ms"] += ttft_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        models = {}
+        for model, t in self.totals.items():
+            models[model] = {
+                **t,
+                "avg_latency_ms": t["latency_ms"] / t["calls"] if t["calls"] else 0.0,
+                "hit_rate": t["cache_hits"] / t["calls"] if t["calls"] else 0.0,
+                "avg_ttft_ms": t["ttft_ms"] / t["streamed_calls"] if t["streamed_calls"] else None,
+            }
+        return {
+            "cache_enabled": self.cache_enabled,
+            "pooled_clients": len(self._clients),
+            "models": models,
+            "recent": list(self.recent),
+        }
+
+
+llm_gateway = LLMGateway()
+
+
+def tokens_spent(msg: Any) -> int:
+    """Tokens a reply actually cost (cache hits are free)."""
+    if (getattr(msg, "response_metadata", None) or {}).get("cached"):
+        return 0
+    usage = getattr(msg, "usage_metadata", None) or {}
+    return int(usage.get("total_tokens") or 0)
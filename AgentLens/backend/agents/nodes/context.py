@@ -0,0 +1,145 @@
+import math
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from core.config import CONTEXT_TOKEN_BUDGET, CONTEXT_CHUNK_CHARS
+
+# OpenAI models average about 4 characters of English per token; an
+# estimate avoids loading a tokenizer vocabulary on the hot path
+CHARS_PER_TOKEN = 4
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_BLOCK_SEP = "\n\n"
+_CHUNK_SEP = " ... "
+
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "how", "in",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where",
+    "which", "who", "why", "with",
+])
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def terms(text: str) -> List[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def split_chunks(text: str, chunk_chars: int = CONTEXT_CHUNK_CHARS) -> List[str]:
+    """Split text into chunks of up to `chunk_chars`, on sentence boundaries where possible."""
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        while len(sentence) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:chunk_chars])
+            sentence = sentence[chunk_chars:]
+        if current and len(current) + 1 + len(sentence) > chunk_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def bm25_scores(query: str, chunks: List[str]) -> np.ndarray:
+    """BM25 score of every chunk against `query`, computed as one array pass."""
+    vocab = {t: i for i, t in enumerate(dict.fromkeys(terms(query)))}
+    if not chunks or not vocab:
+        return np.zeros(len(chunks))
+    chunk_terms = [terms(c) for c in chunks]
+    lengths = np.fromiter((len(t) for t in chunk_terms), dtype=np.float64, count=len(chunks))
+    # Term frequency matrix (chunks x query terms) from flat token ids
+    ids = np.fromiter((vocab.get(t, -1) for ts in chunk_terms for t in ts), dtype=np.int64)
+    owner = np.repeat(np.arange(len(chunks)), lengths.astype(np.int64))
+    hit = ids >= 0
+    tf = np.bincount(
+        owner[hit] * len(vocab) + ids[hit], minlength=len(chunks) * len(vocab)
+    ).reshape(len(chunks), len(vocab)).astype(np.float64)
+
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(chunks) - df + 0.5) / (df + 0.5))
+    avgdl = lengths.mean() or 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl)
+    return (idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def _source_block(doc: Dict[str, Any], content: str) -> str:
+    return f"TITLE: {doc['title']}\nURL: {doc['url']}\nCONTENT:\n{content}"
+
+
+def pack_context(
+    question: str,
+    documents: List[Dict[str, Any]],
+    budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+    chunk_chars: int = CONTEXT_CHUNK_CHARS,
+) -> Tuple[str, Dict[str, int]]:
+    """Sources text for the extraction prompt, packed into `budget_tokens`.
+
+    Documents are split into chunks and ranked with BM25 against the
+    question. Each document's best chunk goes in first (so the notes can
+    cite several sources), then the rest by score until the budget is
+    used. Packed chunks keep their original order within a document.
+    Returns the text and token stats for the run; a budget of 0, or
+    sources that already fit, are passed through whole.
+    """
+    full = _BLOCK_SEP.join(_source_block(d, d["content"]) for d in documents)
+    full_tokens = estimate_tokens(full)
+    if budget_tokens <= 0 or full_tokens <= budget_tokens:
+        return full, {
+            "input_tokens": full_tokens, "packed_tokens": full_tokens, "tokens_saved": 0,
+            "chunks": len(documents), "packed_chunks": len(documents),
+        }
+
+    chunks: List[Tuple[int, int, str]] = []
+    for doc_index, d in enumerate(documents):
+        for pos, text in enumerate(split_chunks(d["content"], chunk_chars)):
+            chunks.append((doc_index, pos, text))
+    scores = bm25_scores(question, [c[2] for c in chunks])
+    ranked = [int(i) for i in np.argsort(-scores, kind="stable")]
+
+    first_per_doc: Dict[int, int] = {}
+    for i in ranked:
+        first_per_doc.setdefault(chunks[i][0], i)
+    seeds = set(first_per_doc.values())
+    order = list(first_per_doc.values()) + [i for i in ranked if i not in seeds]
+
+    # Counted in characters, separators included: per-chunk token estimates
+    # round and would let many short chunks overrun the budget
+    remaining = budget_tokens * CHARS_PER_TOKEN
+    picked: Dict[int, List[int]] = {}
+    for i in order:
+        doc_index, _, text = chunks[i]
+        cost = len(text) + len(_CHUNK_SEP)
+        if doc_index not in picked:
+            cost += len(_source_block(documents[doc_index], "")) + len(_BLOCK_SEP)
+        if cost > remaining:
+            continue
+        picked.setdefault(doc_index, []).append(i)
+        remaining -= cost
+
+    packed = _BLOCK_SEP.join(
+        _source_block(documents[doc_index], _CHUNK_SEP.join(chunks[i][2] for i in sorted(picked[doc_index])))
+        for doc_index in sorted(picked)
+    )
+    packed_tokens = estimate_tokens(packed)
+    return packed, {
+        "input_tokens": full_tokens,
+        "packed_tokens": packed_tokens,
+        "tokens_saved": full_tokens - packed_tokens,
+        "chunks": len(chunks),
+        "packed_chunks": sum(len(v) for v in picked.values()),
+    }
@@ -0,0 +1,211 @@
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+
+from core.config import HTML_EXTRACTOR
+
+# Subtrees removed before text extraction
+SKIP_TAGS = frozenset(["script", "style", "noscript"])
+# BeautifulSoup files strings inside these under non-text string types
+# (TemplateString, RubyTextString, ...), so get_text() leaves them out
+HIDDEN_STRING_TAGS = frozenset(["template", "rt", "rp"])
+# Void elements never stay open (BeautifulSoup closes them immediately)
+VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+    "link", "menuitem", "meta", "param", "source", "track", "wbr",
+    "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+])
+
+
+def bs4_html_to_text(html: str, max_chars: int = 6000) -> str:
+    # bs4 is imported on first use; the streaming extractor only needs it for
+    # character references
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    # remove scripts/styles
+    for tag in soup(["script", "style", "noscript"]):
+        tag.extract()
+
+    text = " ".join(soup.get_text().split())
+    return text[:max_chars]
+
+
+_DECIMAL_REF = re.compile("^([0-9]+)(.*)")
+_HEX_REF = re.compile("^([0-9a-f]+)(.*)", re.IGNORECASE)
+# Any character that ends a (possibly malformed) entity or character reference
+_REF_END = re.compile("[^-.#a-zA-Z0-9]")
+
+
+class _Done(Exception):
+    pass
+
+
+class StreamingTextExtractor(HTMLParser):
+    """Incremental HTML to visible-text extraction.
+
+    Produces the same text as `bs4_html_to_text` but works on chunks as they
+    arrive: script/style/noscript content is dropped and whitespace collapsed
+    as it goes, and parsing stops once `max_chars` of text exist.
+    """
+
+    def __init__(self, max_chars: int = 6000):
+        # References are resolved the way BeautifulSoup resolves them
+        super().__init__(convert_charrefs=False)
+        self.max_chars = max_chars
+        self.done = False
+        self._parts: List[str] = []
+        self._length = 0
+        self._pending_space = False
+        # Open elements, closed the way BeautifulSoup's tree builder closes them
+        self._stack: List[str] = []
+        self._skipped = 0
+        self._hidden = 0
+        self._carry = ""
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        self._stack.append(tag)
+        if tag in SKIP_TAGS:
+            self._skipped += 1
+        elif tag in HIDDEN_STRING_TAGS:
+            self._hidden += 1
+
+    def handle_endtag(self, tag):
+        stack = self._stack
+        # Unmatched end tags are ignored; matched ones close everything above them
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] == tag:
+                for closed in stack[i:]:
+                    if closed in SKIP_TAGS:
+                        self._skipped -= 1
+                    elif closed in HIDDEN_STRING_TAGS:
+                        self._hidden -= 1
+                del stack[i:]
+                return
+
+    def handle_data(self, data):
+        if self._hidden:
+            return
+        self._append(data)
+
+    def _append(self, data):
+        if self._skipped or not data:
+            return
+        words = data.split()
+        if not words:
+            if self._length:
+                self._pending_space = True
+            return
+        if self._length and (self._pending_space or data[0].isspace()):
+            self._parts.append(" ")
+            self._length += 1
+        text = " ".join(words)
+        self._parts.append(text)
+        self._length += len(text)
+        self._pending_space = data[-1].isspace()
+        if self._length >= self.max_chars:
+            raise _Done()
+
+    def handle_entityref(self, name):
+        from bs4.dammit import EntitySubstitution
+
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else f"&{name}")
+
+    def handle_charref(self, name):
+        base, reg = 10, _DECIMAL_REF
+        if name[:1] in ("x", "X"):
+            name, base, reg = name[1:], 16, _HEX_REF
+        extra = ""
+        try:
+            number = int(name, base)
+        except ValueError:
+            match = reg.search(name)
+            if match is None:
+                self.handle_data(name)
+                return
+            number, extra = int(match.group(1), base), match.group(2)
+        from bs4.dammit import UnicodeDammit
+
+        self.handle_data(UnicodeDammit.numeric_character_reference(number)[0])
+        if extra:
+            self.handle_data(extra)
+
+    def unknown_decl(self, data):
+        # BeautifulSoup keeps CDATA sections as text, even under template/rt/rp
+        if data.startswith("CDATA["):
+            self._append(data[6:])
+
+    def feed(self, data: str) -> bool:
+        """Feed a chunk; returns True once enough text has been collected."""
+        if self.done:
+            return True
+        data, self._carry = self._carry + data, ""
+        # html.parser resolves a reference cut by a chunk boundary differently
+        # than a whole one, so hold an unterminated trailing "&..." back
+        amp = data.rfind("&", max(0, len(data) - 32))
+        if amp != -1 and not _REF_END.search(data, amp + 1):
+            data, self._carry = data[:amp], data[amp:]
+        try:
+            super().feed(data)
+        except _Done:
+            self.done = True
+        return self.done
+
+    def text(self) -> str:
+        if not self.done:
+            try:
+                if self._carry:
+                    super().feed(self._carry)
+                    self._carry = ""
+                self.close()
+            except _Done:
+                self.done = True
+        return "".join(self._parts)[:self.max_chars]
+
+
+def stream_html_to_text(html: str, max_chars: int = 6000) -> str:
+    extractor = StreamingTextExtractor(max_chars)
+    extractor.feed(html)
+    return extractor.text()
+
+
+class StreamingDecoder:
+    """Decode body chunks incrementally and feed them to a text extractor."""
+
+    def __init__(self, encoding: Optional[str], max_chars: int = 6000):
+        try:
+            decoder_cls = codecs.getincrementaldecoder(encoding or "utf-8")
+        except LookupError:
+            decoder_cls = codecs.getincrementaldecoder("utf-8")
+        self._decoder = decoder_cls(errors="replace")
+        self.extractor = StreamingTextExtractor(max_chars)
+
+    def feed(self, chunk: bytes) -> bool:
+        return self.extractor.feed(self._decoder.decode(chunk))
+
+    def text(self) -> str:
+        if not self.extractor.done:
+            self.extractor.feed(self._decoder.decode(b"", final=True))
+        return self.extractor.text()
+
+
+EXTRACTORS: Dict[str, Callable[[str, int], str]] = {
+    "stream": stream_html_to_text,
+    "bs4": bs4_html_to_text,
+}
+
+
+def html_to_text(html: str, max_chars: int = 6000, engine: str = HTML_EXTRACTOR) -> str:
+    """Extract visible text with the configured engine, falling back to BeautifulSoup."""
+    extract = EXTRACTORS.get(engine, bs4_html_to_text)
+    if extract is bs4_html_to_text:
+        return extract(html, max_chars)
+    try:
+        return extract(html, max_chars)
+    except Exception:
+        return bs4_html_to_text(html, max_chars)
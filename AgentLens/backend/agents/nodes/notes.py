@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.llm import is_timeout, llm_gateway, tokens_spent
+from agents.nodes.context import pack_context, terms
+from core.config import (
+    OPENAI_MODEL,
+    EXTRACTION_CONCURRENCY,
+    EXTRACTION_TIMEOUT_S,
+    EXTRACTION_MAP_TOKEN_BUDGET,
+)
+
+log = logging.getLogger(__name__)
+
+EXTRACTION_MODES = ("single", "map_reduce")
+
+# Same pattern synthesizer_node uses to pull citations out of the draft
+CITATION = re.compile(r"\(source:\s*(https?://[^\s\)]+)\)")
+_BULLET_MARK = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+# Bullets whose word sets overlap this much are treated as the same fact
+DUPLICATE_JACCARD = 0.8
+
+
+def _content(msg: Any) -> str:
+    return msg.content if hasattr(msg, "content") else str(msg)
+
+
+async def extract_single(question: str, documents: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """One LLM call over the packed context of all documents."""
+    # Only the chunks most relevant to the question, within the token budget
+    joined, packing = pack_context(question, documents)
+    prompt = (
+        "You are a careful research assistant.\n"
+        f"Question: {question}\n\n"
+        "Given the sources below, extract 5-10 bullet facts that answer the question.\n"
+        "Each bullet must end with a citation like (source: URL).\n\n"
+        f"SOURCES:\n{joined}\n"
+    )
+    msg = await llm_gateway.ainvoke(prompt, model=OPENAI_MODEL, temperature=0.2, node="researcher")
+    return _content(msg), {"calls": 1, "failed": 0, "tokens": tokens_spent(msg), "packing": packing}
+
+
+def _bullets(text: str, url: str) -> List[str]:
+    bullets = []
+    for line in text.splitlines():
+        line = _BULLET_MARK.sub("", line).strip()
+        if not line or (line.endswith(":") and not CITATION.search(line)):
+            continue
+        # Each map call sees one source, so an uncited bullet can only be from it
+        if not CITATION.search(line):
+            line = f"{line} (source: {url})"
+        bullets.append(line)
+    return bullets
+
+
+def reduce_bullets(per_document: List[Tuple[str, str]]) -> str:
+    """Merge (url, notes) map outputs into one bullet list.
+
+    A fact repeated by several sources is kept once, citing all of them.
+    """
+    kept: List[Tuple[str, List[str], set]] = []
+    for url, text in per_document:
+        for bullet in _bullets(text, url):
+            fact = CITATION.sub("", bullet).strip()
+            words = set(terms(fact))
+            if not words:
+                continue
+            urls = CITATION.findall(bullet)
+            for _, seen_urls, seen_words in kept:
+                if len(words & seen_words) / len(words | seen_words) >= DUPLICATE_JACCARD:
+                    seen_urls.extend(u for u in urls if u not in seen_urls)
+                    break
+            else:
+                kept.append((fact, urls, words))
+    return "\n".join(
+        "- " + " ".join([fact] + [f"(source: {u})" for u in urls]) for fact, urls, _ in kept
+    )
+
+
+async def extract_map_reduce(
+    question: str,
+    documents: List[Dict[str, Any]],
+    concurrency: int = EXTRACTION_CONCURRENCY,
+    timeout: float = EXTRACTION_TIMEOUT_S,
+    budget_tokens: int = EXTRACTION_MAP_TOKEN_BUDGET,
+) -> Tuple[str, Dict[str, Any]]:
+    """One small LLM call per document, then a local merge of the bullets.
+
+    At most `concurrency` calls are in flight and each request gets `timeout`
+    seconds; a document whose call fails or times out is left out rather
+    than failing the round.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    packing: Dict[str, int] = {}
+    tokens = 0
+    errors: List[BaseException] = []
+
+    async def one(d: Dict[str, Any]) -> Optional[str]:
+        nonlocal tokens
+        source, stats = pack_context(question, [d], budget_tokens)
+        for k, v in stats.items():
+            packing[k] = packing.get(k, 0) + v
+        prompt = (
+            "You are a careful research assistant.\n"
+            f"Question: {question}\n\n"
+            "Given the source below, extract up to 4 bullet facts that answer the question.\n"
+            "Each bullet must end with a citation like (source: URL).\n\n"
+            f"SOURCE:\n{source}\n"
+        )
+        async with sem:
+            try:
+                msg = await llm_gateway.ainvoke(
+                    prompt, model=OPENAI_MODEL, temperature=0.2, node="researcher", timeout=timeout
+                )
+            except Exception as e:
+                if is_timeout(e):
+                    log.warning("Note extraction timed out", extra={"url": d["url"], "timeout_s": timeout})
+                    return None
+                log.warning("Note extraction failed", extra={"url": d["url"], "error": str(e)})
+                errors.append(e)
+                return None
+        tokens += tokens_spent(msg)
+        return _content(msg)
+
+    outputs = await asyncio.gather(*(one(d) for d in documents))
+    mapped = [(d["url"], text) for d, text in zip(documents, outputs) if text]
+    if not mapped and errors:
+        raise errors[0]
+    failed = len(documents) - len(mapped)
+    return reduce_bullets(mapped), {"calls": len(documents), "failed": failed, "tokens": tokens, "packing": packing}
+
+
+async def extract_notes(question: str, documents: List[Dict[str, Any]], mode: str) -> Tuple[str, Dict[str, Any]]:
+    """Notes for `documents` in the given mode, with the round's stats (incl. latency)."""
+    if mode not in EXTRACTION_MODES:
+        mode = "single"
+    start = time.perf_counter()
+    if mode == "map_reduce":
+        text, stats = await extract_map_reduce(question, documents)
+    else:
+        text, stats = await extract_single(question, documents)
+    stats.update({
+        "mode": mode,
+        "documents": len(documents),
+        "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+    })
+    return text, stats
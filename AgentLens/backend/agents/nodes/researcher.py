@@ -1,99 +1,79 @@
+import logging
+from typing import List
 from agents.state import AgentState
-from core.config import USE_TAVILY, OPENAI_API_KEY, OPENAI_MODEL
-from agents.nodes.utils import fetch_page_text
+from core.cache import canonical_url, normalize_query
+from core.config import OPENAI_API_KEY, EXTRACTION_MODE
+from agents.nodes.utils import fetch_pages_text
+from agents.nodes.search import search_web
+from agents.nodes.notes import extract_notes
 
-try:
-    from langchain_community.tools.tavily_search import TavilySearchResults
-except ImportError:
-    TavilySearchResults = None
-
-try:
-    from langchain_community.tools import DuckDuckGoSearchRun
-except ImportError:
-    DuckDuckGoSearchRun = None
-
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
 
+log = logging.getLogger(__name__)
+
+# Follow-up query suffixes per kind of verifier issue, tried in order on retries
+CITATION_SUFFIXES = ["sources", "research", "references", "study", "official documentation"]
+DEPTH_SUFFIXES = ["explained in depth", "detailed guide", "how it works", "use cases"]
+OTHER_SUFFIXES = ["details", "explained", "latest", "analysis"]
+
+
+def followup_queries(question: str, issues: List[str], done: List[str], per_issue: int = 2) -> List[str]:
+    """New search queries aimed at the verifier's issues, skipping ones already run."""
+    seen = {normalize_query(q) for q in done}
+    queries = []
+    for issue in issues or ["more sources"]:
+        text = issue.lower()
+        if "citation" in text or "source" in text:
+            suffixes = CITATION_SUFFIXES
+        elif "short" in text or "depth" in text:
+            suffixes = DEPTH_SUFFIXES
+        else:
+            suffixes = OTHER_SUFFIXES
+        added = 0
+        for suffix in suffixes:
+            q = f"{question} {suffix}"
+            if normalize_query(q) in seen:
+                continue
+            seen.add(normalize_query(q))
+            queries.append(q)
+            added += 1
+            if added >= per_issue:
+                break
+    return queries
+
 
 @traceable(run_type="chain", name="researcher")
 async def researcher_node(state: AgentState) -> AgentState:
     question = state["question"]
 
     # 1) Generate search queries (simple first pass)
-    queries = state.get("queries", [])
+    queries = list(state.get("queries", []))
+    known = list(state.get("documents", []))
     if not queries:
-        queries = [
+        new_queries = [
             question,
             f"{question} overview",
             f"{question} examples",
         ]
+    else:
+        # Retry: only search for what the verifier found missing
+        issues = (state.get("verification") or {}).get("issues") or []
+        new_queries = followup_queries(question, issues, queries)
+    queries = queries + new_queries
+
+    # 2) Search the web concurrently - Tavily first, DuckDuckGo as fallback
+    results = await search_web(new_queries) if new_queries else []
 
-    # 2) Search the web - try Tavily first, fallback to DuckDuckGo on SSL errors
-    results = []
-    search_tool = None
-    
-    if USE_TAVILY and TavilySearchResults:
-        try:
-            search_tool = TavilySearchResults(max_results=5)
-            # Test with first query to check for SSL issues
-            test_result = await search_tool.ainvoke(queries[0])
-            if isinstance(test_result, list) and len(test_result) > 0:
-                # Tavily works, use it for all queries
-                for q in queries:
-                    try:
-                        tool_out = await search_tool.ainvoke(q)
-                        if isinstance(tool_out, list):
-                            results.extend(tool_out)
-                        else:
-                            results.append(tool_out)
-                    except Exception as e:
-                        import traceback
-                        print(f"Error searching Tavily for query '{q}': {e}")
-                        continue
-            else:
-                raise Exception("Tavily returned empty results")
-        except Exception as e:
-            error_str = str(e).lower()
-            if "ssl" in error_str or "certificate" in error_str:
-                print(f"Tavily SSL error detected, falling back to DuckDuckGo: {e}")
-                search_tool = None  # Will use DuckDuckGo below
-            else:
-                print(f"Tavily error: {e}")
-                search_tool = None
-    
-    # Fallback to DuckDuckGo if Tavily failed or not available
-    if not results and DuckDuckGoSearchRun:
-        print("Using DuckDuckGo search as fallback")
-        search_tool = DuckDuckGoSearchRun()
-        for q in queries:
-            try:
-                tool_out = await search_tool.ainvoke(q)
-                # DDG returns string; normalize
-                if isinstance(tool_out, str):
-                    import json
-                    try:
-                        tool_out = json.loads(tool_out)
-                    except:
-                        # If not JSON, create a simple result structure
-                        tool_out = [{"title": q, "snippet": tool_out, "url": ""}]
-                if isinstance(tool_out, list):
-                    results.extend(tool_out)
-                else:
-                    results.append(tool_out)
-            except Exception as e:
-                import traceback
-                print(f"Error searching DuckDuckGo for query '{q}': {e}")
-                print(traceback.format_exc())
-                continue
-    
     if not results:
         # No search tool available or all failed
-        return {**state, "queries": queries, "documents": [], "notes": state.get("notes", [])}
-
-    # 3) Build document objects from results
-    documents = []
-    for r in results[:6]:
+        return {**state, "queries": queries, "documents": known, "notes": list(state.get("notes", []))}
+
+    # 3) Build document objects from results, skipping sources we already have
+    seen_urls = {canonical_url(d["url"]) for d in known}
+    candidates = []
+    for r in results:
+        if len(candidates) >= 6:
+            break
         url = r.get("url") or r.get("link")
         title = r.get("title") or "untitled"
         snippet = r.get("snippet") or r.get("body") or ""
@@ -101,24 +81,35 @@ async def researcher_node(state: AgentState) -> AgentState:
         # Tavily already provides content, so use it if available
         content = r.get("content") or ""
         
-        if not url:
+        if not url or canonical_url(url) in seen_urls:
             continue
+        seen_urls.add(canonical_url(url))
 
-        # If Tavily didn't provide content, fetch it
-        if not content:
-            content = await fetch_page_text(url)
-            if not content:
-                continue
+        candidates.append({"title": title, "url": url, "snippet": snippet, "content": content})
 
-        documents.append({
-            "title": title,
-            "url": url,
-            "snippet": snippet or content[:200],  # Use snippet or first 200 chars of content
-            "content": content,
+    # If Tavily didn't provide content, fetch all missing pages concurrently
+    missing = [c for c in candidates if not c["content"]]
+    fetched = await fetch_pages_text([c["url"] for c in missing])
+    for c, content in zip(missing, fetched):
+        c["content"] = content
+
+    new_documents = []
+    for c in candidates:
+        if not c["content"]:
+            continue
+        new_documents.append({
+            "title": c["title"],
+            "url": c["url"],
+            "snippet": c["snippet"] or c["content"][:200],  # Use snippet or first 200 chars of content
+            "content": c["content"],
         })
 
-    # 4) Extract notes with an LLM
-    notes = state.get("notes", [])
+    # 4) Extract notes with an LLM, from the new sources only
+    notes = list(state.get("notes", []))
+    documents = known + new_documents
+    tokens_used = state.get("tokens_used", 0)
+    context_stats = dict(state.get("context_stats") or {})
+    extraction_stats = list(state.get("extraction_stats") or [])
     
     if not documents:
         # If no documents found, add a note about it
@@ -129,39 +120,28 @@ async def researcher_node(state: AgentState) -> AgentState:
             "documents": [],
             "notes": notes,
         }
+    if not new_documents:
+        # Nothing new since the last round; earlier notes still stand
+        return {**state, "queries": queries, "documents": documents, "notes": notes}
     
     try:
         # Debug: verify API key is loaded
         if not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is not set in environment variables")
         
-        llm = ChatOpenAI(
-            model=OPENAI_MODEL,
-            temperature=0.2,
-            api_key=OPENAI_API_KEY
-        )
-
-        joined = "\n\n".join(
-            f"TITLE: {d['title']}\nURL: {d['url']}\nCONTENT:\n{d['content']}"
-            for d in documents
-        )
-
-        prompt = (
-            "You are a careful research assistant.\n"
-            f"Question: {question}\n\n"
-            "Given the sources below, extract 5-10 bullet facts that answer the question.\n"
-            "Each bullet must end with a citation like (source: URL).\n\n"
-            f"SOURCES:\n{joined}\n"
-        )
-
-        notes_msg = await llm.ainvoke(prompt)
-        notes_text = notes_msg.content if hasattr(notes_msg, "content") else str(notes_msg)
+        # "single": one call over all sources; "map_reduce": one call per source, merged
+        mode = state.get("extraction_mode") or EXTRACTION_MODE
+        notes_text, stats = await extract_notes(question, new_documents, mode)
         notes.append(notes_text)
+        tokens_used += stats.pop("tokens")
+        packing = stats.pop("packing")
+        context_stats = {
+            k: context_stats.get(k, 0) + v for k, v in packing.items()
+        }
+        extraction_stats.append(stats)
     except Exception as e:
         # If LLM call fails, at least return the documents
-        import traceback
-        print(f"Error in researcher LLM call: {e}")
-        print(traceback.format_exc())
+        log.exception("Note extraction failed", extra={"documents": len(new_documents)})
         notes.append(f"Error extracting notes: {str(e)}")
 
     return {
@@ -169,5 +149,8 @@ async def researcher_node(state: AgentState) -> AgentState:
         "queries": queries,
         "documents": documents,
         "notes": notes,
+        "tokens_used": tokens_used,
+        "context_stats": context_stats,
+        "extraction_stats": extraction_stats,
     }
 
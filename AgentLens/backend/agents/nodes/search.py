@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from core.cache import cache, normalize_query
+from core.metrics import metrics
+from core.config import (
+    USE_TAVILY,
+    SEARCH_CONCURRENCY,
+    SEARCH_TIMEOUT_S,
+    SEARCH_MAX_RESULTS,
+    SEARCH_CACHE_TTL_S,
+)
+
+log = logging.getLogger(__name__)
+
+SEARCH_SECONDS = metrics.histogram(
+    "agentlens_search_seconds", "Search query latency by provider and outcome", ("provider", "outcome")
+)
+
+try:
+    from langchain_community.tools.tavily_search import TavilySearchResults
+except ImportError:
+    TavilySearchResults = None
+
+try:
+    from langchain_community.tools import DuckDuckGoSearchRun
+except ImportError:
+    DuckDuckGoSearchRun = None
+
+
+def cached_search(provider: str, search: Callable[[str], Awaitable[Any]]) -> Callable[[str], Awaitable[Any]]:
+    """Wrap a search call with the on-disk cache, keyed on provider + normalized query."""
+    async def run(q: str) -> Any:
+        return await cache.get_or_fetch(
+            "search", f"{provider}:{normalize_query(q)}", lambda: search(q), SEARCH_CACHE_TTL_S
+        )
+    return run
+
+
+def _normalize_tavily(q: str, tool_out: Any) -> List[Dict[str, Any]]:
+    if isinstance(tool_out, list):
+        return tool_out
+    return [tool_out]
+
+
+def _normalize_ddg(q: str, tool_out: Any) -> List[Dict[str, Any]]:
+    # DDG returns string; normalize
+    if isinstance(tool_out, str):
+        try:
+            tool_out = json.loads(tool_out)
+        except ValueError:
+            # If not JSON, create a simple result structure
+            tool_out = [{"title": q, "snippet": tool_out, "url": ""}]
+    if isinstance(tool_out, list):
+        return tool_out
+    return [tool_out]
+
+
+async def search_all(
+    search: Callable[[str], Awaitable[Any]],
+    queries: List[str],
+    normalize: Callable[[str, Any], List[Dict[str, Any]]],
+    provider: str,
+    concurrency: int = SEARCH_CONCURRENCY,
+    timeout: float = SEARCH_TIMEOUT_S,
+) -> List[Dict[str, Any]]:
+    """Run every query concurrently and merge the results.
+
+    At most `concurrency` queries are in flight at once and each one is given
+    `timeout` seconds. Results are flattened in query order (first occurrence
+    of a URL wins) so the documents picked downstream stay deterministic.
+    Cancelling the call cancels the queries still running.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    errors: List[BaseException] = []
+
+    async def one(q: str) -> List[Dict[str, Any]]:
+        async with sem:
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                found = normalize(q, await asyncio.wait_for(search(q), timeout))
+                outcome = "ok"
+                return found
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                log.warning("Search timed out", extra={"provider": provider, "query": q, "timeout_s": timeout})
+            except Exception as e:
+                log.warning("Search failed", extra={"provider": provider, "query": q, "error": str(e)})
+                errors.append(e)
+            finally:
+                SEARCH_SECONDS.observe(time.perf_counter() - start, provider=provider, outcome=outcome)
+            return []
+
+    # gather (unlike as_completed) cancels its children when cancelled
+    slots = await asyncio.gather(*(one(q) for q in queries))
+
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for found in slots:
+        for r in found:
+            if not isinstance(r, dict):
+                continue
+            url = r.get("url") or r.get("link")
+            if url:
+                if url in seen:
+                    continue
+                seen.add(url)
+            merged.append(r)
+
+    if not merged and errors:
+        raise errors[0]
+    return merged
+
+
+async def search_web(queries: List[str]) -> List[Dict[str, Any]]:
+    """Search the web - try Tavily first, fallback to DuckDuckGo on errors."""
+    results: List[Dict[str, Any]] = []
+
+    if USE_TAVILY and TavilySearchResults:
+        try:
+            tool = TavilySearchResults(max_results=SEARCH_MAX_RESULTS)
+            results = await search_all(
+                cached_search(f"tavily:{SEARCH_MAX_RESULTS}", tool.ainvoke), queries, _normalize_tavily, "Tavily"
+            )
+            if not results:
+                raise Exception("Tavily returned empty results")
+        except Exception as e:
+            error_str = str(e).lower()
+            if "ssl" in error_str or "certificate" in error_str:
+                log.warning("Tavily SSL error, falling back to DuckDuckGo", extra={"error": str(e)})
+            else:
+                log.warning("Tavily search failed", extra={"error": str(e)})
+            results = []
+
+    # Fallback to DuckDuckGo if Tavily failed or not available
+    if not results and DuckDuckGoSearchRun:
+        log.info("Using DuckDuckGo search as fallback")
+        tool = DuckDuckGoSearchRun()
+        try:
+            results = await search_all(cached_search("ddg", tool.ainvoke), queries, _normalize_ddg, "DuckDuckGo")
+        except Exception as e:
+            log.warning("DuckDuckGo search failed", extra={"error": str(e)})
+            results = []
+
+    return results
@@ -1,3 +1,5 @@
+import time
+
 from agents.state import AgentState
 from langsmith import traceable
 
@@ -12,5 +14,12 @@ async def supervisor_node(state: AgentState) -> AgentState:
     4. Draft answer
     5. Verify citations and factual coverage
     """
-    return {**state, "plan": plan.strip()}
+    return {
+        **state,
+        "plan": plan.strip(),
+        # retry budget starts counting here
+        "started_at": state.get("started_at") or time.time(),
+        "retries": state.get("retries", 0),
+        "tokens_used": state.get("tokens_used", 0),
+    }
 
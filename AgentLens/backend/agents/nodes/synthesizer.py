@@ -1,8 +1,47 @@
 from agents.state import AgentState
-from langchain_openai import ChatOpenAI
 from langsmith import traceable
+from langchain_core.callbacks.manager import adispatch_custom_event
+from agents.llm import llm_gateway, tokens_spent
 from core.config import OPENAI_API_KEY, OPENAI_MODEL
 import re
+import time
+from typing import Any, Dict, List
+
+CITATION = re.compile(r"\(source:\s*(https?://[^\s\)]+)\)")
+
+
+class CitationScanner:
+    """Pulls cited URLs out of a draft as it streams in.
+
+    A match can only end at ")", so the buffer is only rescanned when a
+    chunk brings one; scanning resumes after the last complete match, which
+    yields exactly what `CITATION.findall` gives on the finished draft.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.urls: List[str] = []
+        self._pos = 0
+
+    def feed(self, chunk: str) -> List[str]:
+        self.text += chunk
+        if ")" not in chunk:
+            return []
+        found = []
+        for m in CITATION.finditer(self.text, self._pos):
+            found.append(m.group(1))
+            self._pos = m.end()
+        self.urls.extend(found)
+        return found
+
+
+async def _emit(name: str, data: Dict[str, Any]) -> None:
+    # Surfaces as an on_custom_event in the run's event stream
+    try:
+        await adispatch_custom_event(name, data)
+    except RuntimeError:
+        # called outside a graph run: nobody to tell
+        pass
 
 
 @traceable(run_type="chain", name="synthesizer")
@@ -13,26 +52,37 @@ async def synthesizer_node(state: AgentState) -> AgentState:
     # Debug: verify API key is loaded
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY is not set in environment variables")
-    
-    llm = ChatOpenAI(
-        model=OPENAI_MODEL,
-        temperature=0.2,
-        api_key=OPENAI_API_KEY
-    )
 
+    # Retry rounds add notes from new sources only, so draft from all of them
+    joined_notes = "\n\n".join(notes)
     prompt = (
         "Write a clear, structured answer to the user's question using ONLY the notes.\n"
         "Cite sources inline like (source: URL).\n\n"
         f"Question: {question}\n\n"
-        f"Notes:\n{notes[-1] if notes else ''}\n"
+        f"Notes:\n{joined_notes}\n"
     )
 
-    draft_msg = await llm.ainvoke(prompt)
-    draft = draft_msg.content if hasattr(draft_msg, "content") else str(draft_msg)
+    # Stream the draft: tokens reach the client as on_chat_model_stream events,
+    # citations as "citation" custom events once their URL is complete
+    scanner = CitationScanner()
+    draft_msg = None
+    start = time.perf_counter()
+    ttft_ms = None
+    async for chunk in llm_gateway.astream(prompt, model=OPENAI_MODEL, temperature=0.2, node="synthesizer"):
+        draft_msg = chunk if draft_msg is None else draft_msg + chunk
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        if ttft_ms is None and text:
+            ttft_ms = round((time.perf_counter() - start) * 1000, 3)
+            await _emit("first_token", {"node": "synthesizer", "ttft_ms": ttft_ms})
+        found = scanner.feed(text)
+        first = len(scanner.urls) - len(found)
+        for i, url in enumerate(found):
+            await _emit("citation", {"url": url, "index": first + i})
+    draft = scanner.text
 
     # pull cited urls into citations list
-    urls = re.findall(r"\(source:\s*(https?://[^\s\)]+)\)", draft)
-    citations = [{"url": u, "used_in": "draft"} for u in urls]
+    citations = [{"url": u, "used_in": "draft"} for u in scanner.urls]
 
-    return {**state, "draft": draft, "citations": citations}
+    tokens_used = state.get("tokens_used", 0) + tokens_spent(draft_msg)
 
+    return {**state, "draft": draft, "citations": citations, "tokens_used": tokens_used, "ttft_ms": ttft_ms}
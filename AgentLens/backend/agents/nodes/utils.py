@@ -1,20 +1,161 @@
-from typing import List, Dict, Any
+import asyncio
+import importlib.util
+import logging
+import time
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlsplit
 import httpx
-from bs4 import BeautifulSoup
 
-async def fetch_page_text(url: str, max_chars: int = 6000) -> str:
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            r = await client.get(url, follow_redirects=True)
-            r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+from agents.nodes.extract import StreamingDecoder, html_to_text
+from core.cache import cache, canonical_url
+from core.metrics import BYTE_BUCKETS, metrics
+from core.config import (
+    PAGE_CACHE_TTL_S,
+    FETCH_TIMEOUT_S,
+    FETCH_MAX_CONNECTIONS,
+    FETCH_MAX_PER_HOST,
+    FETCH_HTTP2,
+    FETCH_BYTES_PER_CHAR,
+    FETCH_MAX_BYTES,
+    HTML_EXTRACTOR,
+)
+
+log = logging.getLogger(__name__)
+
+FETCH_SECONDS = metrics.histogram(
+    "agentlens_fetch_seconds", "Page download + text extraction time by outcome", ("outcome",)
+)
+FETCH_BYTES = metrics.histogram("agentlens_fetch_bytes", "Body bytes read per page download", buckets=BYTE_BUCKETS)
+
+
+class PageFetcher:
+    """App-lifetime HTTP client for page downloads.
+
+    Keeps one pooled `httpx.AsyncClient` (optionally HTTP/2), caps concurrent
+    requests per host, and streams bodies so a download stops once enough bytes
+    have arrived to produce `max_chars` of text. With the "stream" extraction
+    engine, text is extracted chunk by chunk as the body arrives.
+    """
+
+    def __init__(
+        self,
+        timeout: float = FETCH_TIMEOUT_S,
+        max_connections: int = FETCH_MAX_CONNECTIONS,
+        max_per_host: int = FETCH_MAX_PER_HOST,
+        http2: bool = FETCH_HTTP2,
+        engine: str = HTML_EXTRACTOR,
+    ):
+        self.engine = engine
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        # HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self.http2:
+            log.warning("FETCH_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # A client is bound to the loop it was created on
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._loop = loop
+            self._host_limits = {}
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        sem = self._host_limits.get(host)
+        if sem is None:
+            sem = self._host_limits[host] = asyncio.Semaphore(max(1, self.max_per_host))
+        return sem
+
+    async def fetch_html(self, url: str, max_bytes: int = FETCH_MAX_BYTES) -> str:
+        """Download up to `max_bytes` of a page body and decode it."""
+        client = self.client
+        async with self._host_limit(url):
+            async with client.stream("GET", url) as r:
+                r.raise_for_status()
+                buf = bytearray()
+                async for chunk in r.aiter_bytes():
+                    buf += chunk
+                    if len(buf) >= max_bytes:
+                        break
+                FETCH_BYTES.observe(len(buf))
+                return buf[:max_bytes].decode(r.encoding or "utf-8", errors="replace")
 
-        # remove scripts/styles
-        for tag in soup(["script", "style", "noscript"]):
-            tag.extract()
+    async def stream_text(self, url: str, max_chars: int = 6000) -> str:
+        """Extract text while downloading; stops reading once max_chars exist."""
+        client = self.client
+        async with self._host_limit(url):
+            async with client.stream("GET", url) as r:
+                r.raise_for_status()
+                decoder = StreamingDecoder(r.encoding, max_chars)
+                received = 0
+                async for chunk in r.aiter_bytes():
+                    received += len(chunk)
+                    if decoder.feed(chunk) or received >= FETCH_MAX_BYTES:
+                        break
+                FETCH_BYTES.observe(received)
+                return decoder.text()
+
+    async def fetch_text(self, url: str, max_chars: int = 6000) -> str:
+        start = time.perf_counter()
+        text = await self._fetch_text(url, max_chars)
+        FETCH_SECONDS.observe(time.perf_counter() - start, outcome="ok" if text else "failed")
+        return text
+
+    async def _fetch_text(self, url: str, max_chars: int) -> str:
+        try:
+            if self.engine == "stream":
+                try:
+                    return await self.stream_text(url, max_chars)
+                except httpx.HTTPError:
+                    raise
+                except Exception as e:
+                    log.warning("Streaming extraction failed, falling back to BeautifulSoup", extra={"url": url, "error": str(e)})
+            max_bytes = min(FETCH_MAX_BYTES, max_chars * FETCH_BYTES_PER_CHAR)
+            html = await self.fetch_html(url, max_bytes)
+            # BeautifulSoup is CPU heavy on large pages; keep it off the event loop
+            return await asyncio.to_thread(html_to_text, html, max_chars, "bs4")
+        except Exception as e:
+            log.info("Page fetch failed", extra={"url": url, "error": str(e) or type(e).__name__})
+            return ""
+
+    async def fetch_many(self, urls: List[str], max_chars: int = 6000) -> List[str]:
+        """Fetch all urls concurrently; results line up with `urls`."""
+        return list(await asyncio.gather(*(self.fetch_text(u, max_chars) for u in urls)))
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+page_fetcher = PageFetcher()
+
+
+async def fetch_page_text(url: str, max_chars: int = 6000) -> str:
+    # Cached on the canonical URL; concurrent runs asking for it share one download
+    return await cache.get_or_fetch(
+        "page",
+        f"{max_chars}:{canonical_url(url)}",
+        lambda: page_fetcher.fetch_text(url, max_chars),
+        PAGE_CACHE_TTL_S,
+    )
 
-        text = " ".join(soup.get_text().split())
-        return text[:max_chars]
-    except Exception:
-        return ""
 
+async def fetch_pages_text(urls: List[str], max_chars: int = 6000) -> List[str]:
+    return list(await asyncio.gather(*(fetch_page_text(u, max_chars) for u in urls)))
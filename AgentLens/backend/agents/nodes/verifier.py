@@ -1,7 +1,34 @@
+import time
+from typing import Any, Dict, Optional
+
+from agents.grounding import grounding_report
 from agents.state import AgentState
+from core.config import (
+    GROUNDING_MIN_SUPPORT,
+    MAX_RESEARCH_RETRIES,
+    RUN_TIME_BUDGET_S,
+    RUN_TOKEN_BUDGET,
+)
 from langsmith import traceable
 
 
+def budget_exhausted(state: AgentState) -> Optional[str]:
+    """Which retry budget (if any) the run has used up."""
+    if state.get("retries", 0) >= MAX_RESEARCH_RETRIES:
+        return "retries"
+    started_at = state.get("started_at")
+    if RUN_TIME_BUDGET_S > 0 and started_at and time.time() - started_at >= RUN_TIME_BUDGET_S:
+        return "time"
+    if RUN_TOKEN_BUDGET > 0 and state.get("tokens_used", 0) >= RUN_TOKEN_BUDGET:
+        return "tokens"
+    return None
+
+
+def _rank(candidate: Dict[str, Any]):
+    # fewest issues first, then most citations, then the longer draft
+    return (-candidate["issues"], len(candidate["citations"]), len(candidate["draft"]))
+
+
 @traceable(run_type="chain", name="verifier")
 async def verifier_node(state: AgentState) -> AgentState:
     draft = state.get("draft", "")
@@ -13,12 +40,47 @@ async def verifier_node(state: AgentState) -> AgentState:
     if len(draft) < 200:
         issues.append("Draft too short, likely missing depth.")
 
+    # Cited URLs must be retrieved sources, and the cited sentences supported by them
+    grounding = grounding_report(draft, state.get("documents", []) or [])
+    if grounding["unknown_citations"]:
+        issues.append("Some citations point to sources that were not retrieved.")
+    if grounding["support_score"] is not None and grounding["support_score"] < GROUNDING_MIN_SUPPORT:
+        issues.append("Cited sentences are weakly supported by their sources.")
+
+    weakest = sorted(
+        (s for s in grounding["sentences"] if s["cited"]), key=lambda s: s["cited_support"]
+    )[:3]
     verification = {
         "coverage_score": min(1.0, len(citations) / 4.0),
-        "issues": issues
+        "issues": issues,
+        "grounding": {
+            "support_score": grounding["support_score"],
+            "cited_sentences": grounding["cited_sentences"],
+            "unsupported": grounding["unsupported"],
+            "unknown_citations": grounding["unknown_citations"],
+            "weakest": weakest,
+        },
     }
 
-    final = draft if not issues else ""
+    # Keep the best draft seen so far to fall back on when the budget runs out
+    candidate = {"draft": draft, "citations": citations, "issues": len(issues)}
+    best = state.get("best")
+    if not best or _rank(candidate) > _rank(best):
+        best = candidate
+
+    if not issues:
+        return {**state, "verification": verification, "final": draft, "best": best}
 
-    return {**state, "verification": verification, "final": final}
+    reason = budget_exhausted(state)
+    if reason:
+        verification["budget_exhausted"] = reason
+        return {
+            **state,
+            "verification": verification,
+            "draft": best["draft"],
+            "citations": best["citations"],
+            "final": best["draft"],
+            "best": best,
+        }
 
+    return {**state, "verification": verification, "final": "", "best": best, "retries": state.get("retries", 0) + 1}
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.config import RESEARCH_GRAPH_VERSION
+
+DEFAULT_GRAPH = "research"
+
+# Used when LangGraph introspection is unavailable for the research graph
+FALLBACK_SCHEMA = {
+    "nodes": [
+        {"id": "supervisor", "label": "supervisor"},
+        {"id": "researcher", "label": "researcher"},
+        {"id": "synthesizer", "label": "synthesizer"},
+        {"id": "verifier", "label": "verifier"},
+    ],
+    "edges": [
+        {"source": "supervisor", "target": "researcher"},
+        {"source": "researcher", "target": "synthesizer"},
+        {"source": "synthesizer", "target": "verifier"},
+        {"source": "verifier", "target": "researcher", "label": "retry if issues"},
+    ],
+}
+
+
+def describe_graph(graph) -> Dict[str, Any]:
+    """Introspect a compiled graph into the /graph-schema payload."""
+    # Best effort introspection, LangGraph API can vary by version
+    try:
+        g = graph.get_graph()
+        return {
+            "nodes": [{"id": n.id, "label": n.id} for n in g.nodes],
+            "edges": [{"source": e.source, "target": e.target} for e in g.edges],
+        }
+    except Exception:
+        return json.loads(json.dumps(FALLBACK_SCHEMA))
+
+
+@dataclass(frozen=True)
+class GraphEntry:
+    """A compiled graph plus its precomputed schema, immutable once registered."""
+    name: str
+    version: str
+    graph: Any
+    schema: Dict[str, Any] = field(compare=False)
+    etag: str = ""
+
+
+class GraphRegistry:
+    """Holds compiled graphs keyed by name and version.
+
+    Runs take a reference to a `GraphEntry` when they start, so activating a new
+    version only affects runs started afterwards; in-flight runs keep using the
+    graph they were handed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, GraphEntry]] = {}
+        self._active: Dict[str, str] = {}
+        # name -> (version the builder compiles, builder)
+        self._builders: Dict[str, Tuple[str, Callable[[], Any]]] = {}
+        self._build_lock = threading.Lock()
+
+    def register_builder(self, name: str, version: str, builder: Callable[[], Any]) -> None:
+        """Register a factory that compiles `version` of `name` lazily on first `get`."""
+        with self._lock:
+            self._builders[name] = (version, builder)
+
+    def register(self, name: str, version: str, graph, activate: bool = True) -> GraphEntry:
+        schema = describe_graph(graph)
+        digest = hashlib.sha256(
+            json.dumps(schema, sort_keys=True, separators=(",", ":")).encode()
+        ).hexdigest()[:16]
+        entry = GraphEntry(
+            name=name,
+            version=version,
+            graph=graph,
+            schema=schema,
+            etag=f'"{name}-{version}-{digest}"',
+        )
+        with self._lock:
+            self._entries.setdefault(name, {})[version] = entry
+            if activate or name not in self._active:
+                self._active[name] = version
+        return entry
+
+    def activate(self, name: str, version: str) -> GraphEntry:
+        """Atomically make an already registered version the default for new runs."""
+        with self._lock:
+            entry = self._entries.get(name, {}).get(version)
+            if entry is None:
+                raise KeyError(f"Graph {name!r} has no version {version!r}")
+            self._active[name] = version
+            return entry
+
+    def get(self, name: str = DEFAULT_GRAPH, version: Optional[str] = None) -> GraphEntry:
+        with self._lock:
+            versions = self._entries.get(name, {})
+            key = version or self._active.get(name)
+            entry = versions.get(key) if key else None
+            built = self._builders.get(name)
+        if entry is not None:
+            return entry
+        if built is None or version not in (None, built[0]):
+            raise KeyError(f"Graph {name!r} version {version!r} is not registered")
+        # Not warmed yet (e.g. startup hook not run): compile once on demand
+        build_version, builder = built
+        with self._build_lock:
+            with self._lock:
+                entry = self._entries.get(name, {}).get(build_version)
+            if entry is None:
+                entry = self.register(name, build_version, builder(), activate=False)
+            return entry
+
+    def versions(self, name: str = DEFAULT_GRAPH) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active.get(name),
+                "versions": sorted(self._entries.get(name, {})),
+            }
+
+
+def _build_research_graph():
+    from agents.research_graph import build_graph
+
+    return build_graph()
+
+
+graph_registry = GraphRegistry()
+graph_registry.register_builder(DEFAULT_GRAPH, RESEARCH_GRAPH_VERSION, _build_research_graph)
+
+
+def init_graph_registry() -> GraphEntry:
+    """Compile and register the research graph now, replacing any lazily built one."""
+    return graph_registry.register(DEFAULT_GRAPH, RESEARCH_GRAPH_VERSION, _build_research_graph())
+
+
+def get_graph(name: str = DEFAULT_GRAPH, version: Optional[str] = None):
+    return graph_registry.get(name, version).graph
@@ -1,103 +1,69 @@
+import asyncio
+import functools
+import logging
 import time
 import json
-from langgraph.graph import StateGraph, END
+from contextlib import aclosing
+from typing import Any, Dict, Optional
 from langsmith import uuid7
 from agents.state import AgentState
-from agents.nodes.supervisor import supervisor_node
-from agents.nodes.researcher import researcher_node
-from agents.nodes.synthesizer import synthesizer_node
-from agents.nodes.verifier import verifier_node
-
-def serialize_for_json(obj):
-    """Recursively serialize objects for JSON, handling LangChain message types"""
-    if obj is None:
-        return None
-    if isinstance(obj, (str, int, float, bool)):
-        return obj
-    if isinstance(obj, dict):
-        return {k: serialize_for_json(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple)):
-        return [serialize_for_json(item) for item in obj]
-    
-    # Special handling for objects with usage_metadata (token usage) - this is where OpenAI stores it
-    if hasattr(obj, 'usage_metadata'):
-        try:
-            usage_metadata = obj.usage_metadata
-            if isinstance(usage_metadata, dict):
-                # Preserve usage_metadata dict directly
-                return {
-                    'usage_metadata': usage_metadata
-                }
-            elif hasattr(usage_metadata, '__dict__'):
-                return {
-                    'usage_metadata': serialize_for_json(usage_metadata.__dict__)
-                }
-        except Exception:
-            pass
-    
-    # Also handle response_metadata for compatibility
-    if hasattr(obj, 'response_metadata'):
-        try:
-            metadata = obj.response_metadata
-            if isinstance(metadata, dict):
-                return {
-                    'response_metadata': metadata
-                }
-            elif hasattr(metadata, 'token_usage'):
-                token_usage = metadata.token_usage
-                if isinstance(token_usage, dict):
-                    return {
-                        'response_metadata': {
-                            'token_usage': token_usage
-                        }
-                    }
-        except Exception:
-            pass
-    
-    # Handle LangChain message objects (HumanMessage, AIMessage, etc.)
-    if hasattr(obj, 'content'):
-        try:
-            content = obj.content
-            # If content is a string, return it directly
-            if isinstance(content, str):
-                return content
-            # Otherwise, serialize it recursively
-            return serialize_for_json(content)
-        except Exception:
-            # Fallback: try to get content as string
-            try:
-                return str(obj.content) if hasattr(obj, 'content') else str(obj)
-            except:
-                return str(obj)
-    # Try to convert to dict if it has __dict__
-    if hasattr(obj, '__dict__'):
+from agents.serialization import serialize_for_json
+from agents.snapshots import SnapshotEncoder, is_state_payload
+from services.event_store import event_store
+from services.analytics_service import RunRecorder, record_run
+from core.config import CHECKPOINTS_ENABLED
+from core.metrics import TOKEN_BUCKETS, metrics
+
+log = logging.getLogger(__name__)
+
+NODE_SECONDS = metrics.histogram("agentlens_node_seconds", "Graph node duration by outcome", ("node", "outcome"))
+NODE_TOKENS = metrics.histogram("agentlens_node_tokens", "LLM tokens spent per node call", ("node",), buckets=TOKEN_BUCKETS)
+RUNS = metrics.counter("agentlens_runs_total", "Finished graph runs by status", ("status",))
+RUN_SECONDS = metrics.histogram("agentlens_run_seconds", "Graph run duration by status", ("status",))
+EVENTS = metrics.counter("agentlens_events_total", "Streamed events by kind", ("event",))
+
+
+def instrument_node(name: str, node):
+    """Wrap a node to record its duration, outcome and token spend."""
+
+    # wraps() keeps the node's signature visible, so LangGraph still passes
+    # the keyword arguments it asks for (`config` on @traceable nodes)
+    @functools.wraps(node)
+    async def wrapper(state: AgentState, **kwargs) -> AgentState:
+        start = time.perf_counter()
         try:
-            # Skip certain attributes that might cause recursion
-            d = {}
-            for k, v in obj.__dict__.items():
-                # Preserve response_metadata and usage_metadata (where token usage is stored)
-                if k in ['response_metadata', 'usage_metadata', 'token_usage']:
-                    if isinstance(v, dict):
-                        d[k] = v  # Keep dicts as-is for usage_metadata
-                    elif hasattr(v, '__dict__'):
-                        d[k] = serialize_for_json(v.__dict__)
-                    else:
-                        d[k] = serialize_for_json(v)
-                elif not k.startswith('_') or k in ['_type', '_name']:
-                    d[k] = serialize_for_json(v)
-            return d
+            result = await node(state, **kwargs)
+        except asyncio.CancelledError:
+            NODE_SECONDS.observe(time.perf_counter() - start, node=name, outcome="cancelled")
+            raise
         except Exception:
-            return str(obj)
-    # Final fallback: convert to string
-    return str(obj)
+            NODE_SECONDS.observe(time.perf_counter() - start, node=name, outcome="error")
+            log.exception("Node failed", extra={"node": name})
+            raise
+        NODE_SECONDS.observe(time.perf_counter() - start, node=name, outcome="ok")
+        spent = (result or {}).get("tokens_used", 0) - state.get("tokens_used", 0)
+        if spent > 0:
+            NODE_TOKENS.observe(spent, node=name)
+        return result
+
+    return wrapper
+
+
+def build_graph(checkpoints: bool = CHECKPOINTS_ENABLED):
+    # langgraph and the nodes (model, search and parsing libraries) load here,
+    # not when streaming helpers are imported: startup stays fast
+    from langgraph.graph import StateGraph, END
+    from agents.nodes.supervisor import supervisor_node
+    from agents.nodes.researcher import researcher_node
+    from agents.nodes.synthesizer import synthesizer_node
+    from agents.nodes.verifier import verifier_node
 
-def build_graph():
     g = StateGraph(AgentState)
 
-    g.add_node("supervisor", supervisor_node)
-    g.add_node("researcher", researcher_node)
-    g.add_node("synthesizer", synthesizer_node)
-    g.add_node("verifier", verifier_node)
+    g.add_node("supervisor", instrument_node("supervisor", supervisor_node))
+    g.add_node("researcher", instrument_node("researcher", researcher_node))
+    g.add_node("synthesizer", instrument_node("synthesizer", synthesizer_node))
+    g.add_node("verifier", instrument_node("verifier", verifier_node))
 
     g.set_entry_point("supervisor")
 
@@ -106,57 +72,151 @@ def build_graph():
     g.add_edge("synthesizer", "verifier")
 
     def route_after_verify(state: AgentState):
-        issues = (state.get("verification") or {}).get("issues") or []
-        if issues:
+        verification = state.get("verification") or {}
+        if verification.get("issues") and not verification.get("budget_exhausted"):
             return "researcher"
         return END
 
     g.add_conditional_edges("verifier", route_after_verify)
 
+    if checkpoints:
+        # Durable state after every node: runs can be resumed and forked
+        from services.checkpoint_store import checkpoint_store
+
+        return g.compile(checkpointer=checkpoint_store)
     return g.compile()
 
-async def run_graph_once(graph, question: str):
-    run_id_uuid = uuid7()
-    run_id = str(run_id_uuid)
-    initial_state: AgentState = {"question": question, "queries": [], "documents": [], "notes": []}
-    final_state = await graph.ainvoke(initial_state, config={"run_id": run_id_uuid})
+def is_final_event(event: Dict[str, Any]) -> bool:
+    # The graph's own end event (not a node's) carries the final state
+    return event["event"] == "on_chain_end" and not (event.get("metadata") or {}).get("langgraph_node")
+
+async def run_graph_once(graph, question: str, extraction_mode: Optional[str] = None):
+    # Runs through stream_graph so the run's events are recorded like a streamed one
+    run_id = None
+    final_state = None
+    async with aclosing(stream_graph(graph, question, extraction_mode)) as events:
+        async for event in events:
+            run_id = event["run_id"]
+            if is_final_event(event):
+                final_state = (event.get("data") or {}).get("output")
     return run_id, final_state
 
-async def stream_graph(graph, question: str):
-    run_id_uuid = uuid7()
+async def stream_graph(
+    graph,
+    question: str,
+    extraction_mode: Optional[str] = None,
+    run_id_uuid=None,
+    resume_from: Optional[Dict[str, Any]] = None,
+):
+    # Close with contextlib.aclosing when stopping early: that cancels the
+    # graph task (and its in-flight fetches/model calls) right away
+    run_id_uuid = run_id_uuid or uuid7()
     run_id = str(run_id_uuid)
-    initial_state: AgentState = {"question": question, "queries": [], "documents": [], "notes": []}
+    config: Dict[str, Any] = {"run_id": run_id_uuid}
+    graph_input: Optional[AgentState] = {"question": question, "queries": [], "documents": [], "notes": []}
+    if extraction_mode:
+        graph_input["extraction_mode"] = extraction_mode
+    if graph.checkpointer is not None:
+        # One checkpoint thread per run
+        config["configurable"] = {"thread_id": run_id}
+    if resume_from is not None:
+        # Continue another run's checkpoint on this run's own thread: no
+        # input, LangGraph picks up from the thread's latest checkpoint. The
+        # run's time budget (verifier) counts from now, not from the
+        # original run's start.
+        await graph.checkpointer.afork_thread(
+            resume_from["run_id"], run_id, resume_from["checkpoint_id"], resume_from.get("mode") == "resume",
+            {"started_at": time.time()},
+        )
+        graph_input = None
+    snapshots = SnapshotEncoder()
+    recorder = RunRecorder(run_id)
+    event_store.start_run(run_id, question)
+    status = "failed"
+    start = time.perf_counter()
+    try:
+        async with aclosing(_stream_events(graph, graph_input, config, snapshots)) as payloads:
+            async for payload in payloads:
+                EVENTS.inc(event=payload["event"])
+                event_store.append(payload)
+                if event_store.backlogged:
+                    await event_store.wait_for_room()
+                recorder.observe(payload)
+                yield payload
+        status = "completed"
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        raise
+    finally:
+        RUNS.inc(status=status)
+        RUN_SECONDS.observe(time.perf_counter() - start, status=status)
+        event_store.finish_run(run_id, status)
+        record_run(recorder, status)
+
+
+async def _stream_events(graph, graph_input: Optional[AgentState], config: Dict[str, Any], snapshots: SnapshotEncoder):
+    run_id = str(config["run_id"])
     step_index = 0
-    
-    async for step in graph.astream_events(initial_state, version="v2", config={"run_id": run_id_uuid}):
-        # Serialize data to handle non-JSON-serializable objects
-        serialized_data = serialize_for_json(step.get("data"))
-        serialized_metadata = serialize_for_json(step.get("metadata", {}))
-        
-        payload = {
-            "run_id": run_id,
-            "event": step["event"],
-            "name": step.get("name"),
-            "data": serialized_data,
-            "metadata": serialized_metadata,
-            "ts": time.time(),
-            "step_index": step_index,
-        }
-        
-        # On node end, include full output state for replay
-        # Check both on_chain_end and on_node_end events, and look in multiple places for state
-        if (step["event"] in ["on_chain_end", "on_node_end"]) and step.get("metadata", {}).get("langgraph_node"):
-            # Try to get state from output first, then from data directly
-            out_state = serialized_data.get("output") or serialized_data.get("data") or serialized_data
-            if out_state and isinstance(out_state, dict):
-                # Clean state for replay (remove internal LangGraph fields)
-                clean_state = {}
-                for k, v in out_state.items():
-                    if not (k == "__end__" or k == "END" or k.startswith("__")):
-                        clean_state[k] = v
-                if clean_state:  # Only add snapshot if we have actual state data
-                    payload["state_snapshot"] = clean_state
-        
-        step_index += 1
-        yield payload
+    kwargs = {}
+    if graph.checkpointer is not None:
+        # Each checkpoint is on disk before the next node starts
+        kwargs["durability"] = "sync"
+    steps = graph.astream_events(graph_input, version="v2", config=config, **kwargs)
+    async with aclosing(steps):
+        async for step in steps:
+            yield build_payload(step, run_id, step_index, snapshots)
+            step_index += 1
+
+
+def build_payload(step: Dict[str, Any], run_id: str, step_index: int, snapshots: SnapshotEncoder) -> Dict[str, Any]:
+    """One astream_events step as the JSON-ready event AgentLens streams and stores."""
+    # Serialize data to handle non-JSON-serializable objects
+    serialized_data = serialize_for_json(step.get("data"))
+    serialized_metadata = serialize_for_json(step.get("metadata", {}))
+
+    payload = {
+        "run_id": run_id,
+        "event": step["event"],
+        "name": step.get("name"),
+        "data": serialized_data,
+        "metadata": serialized_metadata,
+        "ts": time.time(),
+        "step_index": step_index,
+    }
+    # Id of the LangChain run (node, model call, ...) this event belongs to,
+    # so start and end events can be paired; stream chunks don't need it
+    if step["event"].endswith(("_start", "_end")):
+        payload["span_id"] = str(step.get("run_id"))
+
+    # The serializer reduces a message chunk to its metadata; a streamed
+    # token is what the live draft is built from, so keep its text
+    if step["event"] == "on_chat_model_stream" and isinstance(serialized_data, dict):
+        chunk = (step.get("data") or {}).get("chunk")
+        content = getattr(chunk, "content", None)
+        if content is not None and isinstance(serialized_data.get("chunk"), dict):
+            serialized_data["chunk"]["content"] = content if isinstance(content, str) else serialize_for_json(content)
+
+    # On node end, include output state for replay (keyframe or patch)
+    # Check both on_chain_end and on_node_end events, and look in multiple places for state
+    if (step["event"] in ["on_chain_end", "on_node_end"]) and step.get("metadata", {}).get("langgraph_node"):
+        # Try to get state from output first, then from data directly
+        out_state = serialized_data.get("output") or serialized_data.get("data") or serialized_data
+        if out_state and isinstance(out_state, dict):
+            # Clean state for replay (remove internal LangGraph fields)
+            clean_state = {}
+            for k, v in out_state.items():
+                if not (k == "__end__" or k == "END" or k.startswith("__")):
+                    clean_state[k] = v
+            if clean_state:  # Only add snapshot if we have actual state data
+                payload.update(snapshots.encode(step_index, clean_state))
+
+    # With delta snapshots, state travels only in snapshot/patch fields;
+    # drop the copies chain events carry as input/output/stream chunks
+    # (the graph's final output is kept)
+    is_final = step["event"] == "on_chain_end" and not step.get("parent_ids")
+    if snapshots.delta and step["event"].startswith("on_chain") and not is_final and isinstance(serialized_data, dict):
+        for key in ("input", "output", "chunk"):
+            if is_state_payload(serialized_data.get(key)):
+                del serialized_data[key]
 
+    return payload
@@ -0,0 +1,232 @@
+import datetime
+import decimal
+import json
+import sys
+import uuid
+from typing import Any, Callable, Dict, Optional, Set
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_MISSING = object()
+_PRIMITIVES = frozenset([str, int, float, bool, type(None)])
+# Metadata fields kept as-is (they carry token usage) when walking an object's __dict__
+_METADATA_KEYS = ("response_metadata", "usage_metadata", "token_usage")
+# Exact types whose instances have none of the attributes the generic path
+# probes and no __dict__, so they always end up as str(obj)
+_OPAQUE_TYPES = frozenset([
+    uuid.UUID, datetime.datetime, datetime.date, datetime.time, datetime.timedelta,
+    decimal.Decimal, bytes, bytearray, complex, set, frozenset,
+])
+
+Handler = Callable[[Any, int, Optional[Set[int]]], Any]
+
+# Containers are only tracked for cycles past this depth; a cycle always
+# recurses past it, while normal payloads never pay for the bookkeeping
+_CYCLE_CHECK_DEPTH = 48
+
+
+class JSONSerializer:
+    """Convert event payloads into JSON-compatible structures.
+
+    Produces the same output as the original recursive `serialize_for_json`,
+    but picks a handler once per concrete type and caches it, instead of
+    running the chain of `hasattr` probes on every object. Cycles serialize
+    as `str(obj)` rather than recursing until the interpreter gives up.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[type, Handler] = {}
+
+    def __call__(self, obj: Any) -> Any:
+        return self._serialize(obj, 0, None)
+
+    def _serialize(self, obj: Any, depth: int, seen: Optional[Set[int]]) -> Any:
+        t = type(obj)
+        if t in _PRIMITIVES:
+            return obj
+        return (self._handlers.get(t) or self._handler_for(t))(obj, depth, seen)
+
+    def _handler_for(self, t: type) -> Handler:
+        if issubclass(t, (str, int, float, bool)):
+            handler = _identity
+        elif issubclass(t, dict):
+            handler = self._dict
+        elif issubclass(t, (list, tuple)):
+            handler = self._list
+        elif _is_message_type(t):
+            handler = self._message
+        elif t in _OPAQUE_TYPES:
+            handler = _to_str
+        else:
+            handler = self._object
+        self._handlers[t] = handler
+        return handler
+
+    def _guarded(self, body: Handler, obj: Any, depth: int, seen: Optional[Set[int]]) -> Any:
+        if seen is None:
+            seen = set()
+        key = id(obj)
+        if key in seen:
+            return str(obj)
+        seen.add(key)
+        try:
+            return body(obj, depth, seen)
+        finally:
+            seen.discard(key)
+
+    def _dict(self, obj: dict, depth: int, seen: Optional[Set[int]]) -> Any:
+        if depth >= _CYCLE_CHECK_DEPTH:
+            return self._guarded(self._dict_items, obj, depth, seen)
+        return self._dict_items(obj, depth, seen)
+
+    def _dict_items(self, obj: dict, depth: int, seen: Optional[Set[int]]) -> Any:
+        handlers = self._handlers
+        depth += 1
+        out = {}
+        for k, v in obj.items():
+            t = type(v)
+            if t in _PRIMITIVES:
+                out[k] = v
+            else:
+                out[k] = (handlers.get(t) or self._handler_for(t))(v, depth, seen)
+        return out
+
+    def _list(self, obj, depth: int, seen: Optional[Set[int]]) -> Any:
+        if depth >= _CYCLE_CHECK_DEPTH:
+            return self._guarded(self._list_items, obj, depth, seen)
+        return self._list_items(obj, depth, seen)
+
+    def _list_items(self, obj, depth: int, seen: Optional[Set[int]]) -> Any:
+        handlers = self._handlers
+        depth += 1
+        out = []
+        for v in obj:
+            t = type(v)
+            if t in _PRIMITIVES:
+                out.append(v)
+            else:
+                out.append((handlers.get(t) or self._handler_for(t))(v, depth, seen))
+        return out
+
+    def _usage(self, obj, depth: int, seen: Optional[Set[int]]) -> Any:
+        # Objects with usage_metadata (token usage) - this is where OpenAI stores it
+        usage_metadata = getattr(obj, "usage_metadata", _MISSING)
+        if usage_metadata is _MISSING:
+            return _MISSING
+        try:
+            if isinstance(usage_metadata, dict):
+                return {"usage_metadata": usage_metadata}
+            elif hasattr(usage_metadata, "__dict__"):
+                return {"usage_metadata": self._serialize(usage_metadata.__dict__, depth + 1, seen)}
+        except Exception:
+            pass
+        return _MISSING
+
+    def _response_metadata(self, obj) -> Any:
+        metadata = getattr(obj, "response_metadata", _MISSING)
+        if metadata is _MISSING:
+            return _MISSING
+        try:
+            if isinstance(metadata, dict):
+                return {"response_metadata": metadata}
+            elif hasattr(metadata, "token_usage"):
+                token_usage = metadata.token_usage
+                if isinstance(token_usage, dict):
+                    return {"response_metadata": {"token_usage": token_usage}}
+        except Exception:
+            pass
+        return _MISSING
+
+    def _message(self, obj, depth: int, seen: Optional[Set[int]]) -> Any:
+        # LangChain messages: usage_metadata (AI messages) or the response_metadata
+        # dict every message carries; the content branch is effectively never reached
+        usage_metadata = getattr(obj, "usage_metadata", None)
+        if type(usage_metadata) is dict:
+            return {"usage_metadata": usage_metadata}
+        if usage_metadata is None:
+            metadata = getattr(obj, "response_metadata", None)
+            if type(metadata) is dict:
+                return {"response_metadata": metadata}
+        return self._object(obj, depth, seen)
+
+    def _object(self, obj, depth: int, seen: Optional[Set[int]]) -> Any:
+        out = self._usage(obj, depth, seen)
+        if out is not _MISSING:
+            return out
+        out = self._response_metadata(obj)
+        if out is not _MISSING:
+            return out
+
+        content = getattr(obj, "content", _MISSING)
+        if content is not _MISSING:
+            try:
+                if isinstance(content, str):
+                    return content
+                return self._serialize(content, depth + 1, seen)
+            except Exception:
+                try:
+                    return str(obj.content)
+                except Exception:
+                    return str(obj)
+
+        if getattr(obj, "__dict__", _MISSING) is _MISSING:
+            return str(obj)
+        if depth >= _CYCLE_CHECK_DEPTH:
+            return self._guarded(self._object_attrs, obj, depth, seen)
+        return self._object_attrs(obj, depth, seen)
+
+    def _object_attrs(self, obj, depth: int, seen: Optional[Set[int]]) -> Any:
+        depth += 1
+        try:
+            d = {}
+            for k, v in obj.__dict__.items():
+                if k in _METADATA_KEYS:
+                    if isinstance(v, dict):
+                        d[k] = v
+                    elif hasattr(v, "__dict__"):
+                        d[k] = self._serialize(v.__dict__, depth, seen)
+                    else:
+                        d[k] = self._serialize(v, depth, seen)
+                elif not k.startswith("_") or k in ("_type", "_name"):
+                    d[k] = self._serialize(v, depth, seen)
+            return d
+        except Exception:
+            return str(obj)
+
+
+def _is_message_type(t: type) -> bool:
+    # langchain_core is not imported just to check: until something has
+    # loaded its messages module, no object can be a BaseMessage
+    messages = sys.modules.get("langchain_core.messages")
+    base = getattr(messages, "BaseMessage", None)
+    return base is not None and issubclass(t, base)
+
+
+def _identity(obj, depth, seen):
+    return obj
+
+
+def _to_str(obj, depth, seen):
+    return str(obj)
+
+
+serialize_for_json = JSONSerializer()
+
+
+def _encode_default(obj: Any) -> Any:
+    out = serialize_for_json(obj)
+    return out if type(out) is not type(obj) else str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode a serialized payload straight to JSON bytes, using orjson when installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_encode_default, option=orjson.OPT_NON_STR_KEYS)
+        except (TypeError, orjson.JSONEncodeError):
+            pass  # e.g. integers wider than 64 bits; the stdlib encoder handles them
+    return json.dumps(obj, default=_encode_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,143 @@
+import copy
+from typing import Any, Dict, Iterable, List, Optional
+
+from agents.state import AgentState
+from core.config import SNAPSHOT_KEYFRAME_INTERVAL
+
+STATE_KEYS = frozenset(AgentState.__annotations__)
+
+_ADD = "add"
+_REMOVE = "remove"
+_REPLACE = "replace"
+
+
+def _escape(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """Structural diff of two JSON values as RFC 6902 (JSON Patch) operations.
+
+    Lists that only grew at the end (notes, documents) become "add .../-"
+    operations, so an appended note costs the note and not the whole list.
+    """
+    if old is new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for k in old:
+            if k not in new:
+                ops.append({"op": _REMOVE, "path": f"{path}/{_escape(k)}"})
+        for k, v in new.items():
+            child = f"{path}/{_escape(k)}"
+            if k not in old:
+                ops.append({"op": _ADD, "path": child, "value": v})
+            else:
+                ops.extend(diff(old[k], v, child))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        n = len(old)
+        if len(new) >= n and all(a == b for a, b in zip(old, new)):
+            return [{"op": _ADD, "path": f"{path}/-", "value": v} for v in new[n:]]
+        if len(new) == n:
+            ops = []
+            for i, (a, b) in enumerate(zip(old, new)):
+                ops.extend(diff(a, b, f"{path}/{i}"))
+            return ops
+        return [{"op": _REPLACE, "path": path, "value": new}]
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": _REPLACE, "path": path, "value": new}]
+
+
+def apply_patch(doc: Any, ops: Iterable[Dict[str, Any]]) -> Any:
+    """Apply JSON Patch operations produced by `diff`. `doc` is not modified."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        path = op["path"]
+        if path == "":
+            doc = copy.deepcopy(op.get("value"))
+            continue
+        tokens = [_unescape(t) for t in path.split("/")[1:]]
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        kind = op["op"]
+        if isinstance(parent, list):
+            if kind == _ADD:
+                value = copy.deepcopy(op["value"])
+                if last == "-":
+                    parent.append(value)
+                else:
+                    parent.insert(int(last), value)
+            elif kind == _REMOVE:
+                del parent[int(last)]
+            else:
+                parent[int(last)] = copy.deepcopy(op["value"])
+        else:
+            if kind == _REMOVE:
+                del parent[last]
+            else:
+                parent[last] = copy.deepcopy(op["value"])
+    return doc
+
+
+def is_state_payload(value: Any) -> bool:
+    """True for an agent state dict or a graph stream chunk of {node: state}."""
+    if not isinstance(value, dict) or not value:
+        return False
+    if value.keys() <= STATE_KEYS:
+        return True
+    return all(isinstance(v, dict) and v and v.keys() <= STATE_KEYS for v in value.values())
+
+
+class SnapshotEncoder:
+    """Turns the per-node state snapshots of one run into keyframes and patches.
+
+    Every `keyframe_interval`-th snapshot is sent whole as `state_snapshot`;
+    the ones in between carry `state_patch` against the previous snapshot,
+    whose step index is given in `state_base_step`. An interval of 1 sends
+    full snapshots every time (the previous wire format).
+    """
+
+    def __init__(self, keyframe_interval: int = SNAPSHOT_KEYFRAME_INTERVAL):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._prev: Optional[Dict[str, Any]] = None
+        self._prev_step: Optional[int] = None
+        self._count = 0
+
+    @property
+    def delta(self) -> bool:
+        return self.keyframe_interval > 1
+
+    def encode(self, step_index: int, state: Dict[str, Any]) -> Dict[str, Any]:
+        if self._prev is None or self._count % self.keyframe_interval == 0:
+            fields = {"state_snapshot": state}
+        else:
+            fields = {"state_patch": diff(self._prev, state), "state_base_step": self._prev_step}
+        self._prev = state
+        self._prev_step = step_index
+        self._count += 1
+        return fields
+
+
+def rebuild_state(events: Iterable[Dict[str, Any]], step_index: Optional[int] = None) -> Dict[str, Any]:
+    """Rebuild the agent state as of `step_index` (latest if None) from streamed events.
+
+    Walks keyframes and patches in step order; events after `step_index` are
+    ignored. Returns an empty dict if no snapshot was sent by then.
+    """
+    state: Optional[Dict[str, Any]] = None
+    for e in sorted(events, key=lambda e: e.get("step_index", 0)):
+        if step_index is not None and e.get("step_index", 0) > step_index:
+            break
+        if "state_snapshot" in e:
+            state = e["state_snapshot"]
+        elif "state_patch" in e and state is not None:
+            state = apply_patch(state, e["state_patch"])
+    return copy.deepcopy(state) if state is not None else {}
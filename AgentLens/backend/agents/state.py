@@ -10,4 +10,16 @@ class AgentState(TypedDict, total=False):
     citations: List[Dict[str, Any]]
     verification: Dict[str, Any]
     final: str
+    # synthesizer time-to-first-token of the latest draft
+    ttft_ms: float
+    # retry bookkeeping (verifier -> researcher loop)
+    retries: int
+    started_at: float
+    tokens_used: int
+    best: Dict[str, Any]
+    # extraction context packing, summed over rounds (tokens_saved etc.)
+    context_stats: Dict[str, int]
+    # note extraction: "single" or "map_reduce", and per-round mode/latency stats
+    extraction_mode: str
+    extraction_stats: List[Dict[str, Any]]
 
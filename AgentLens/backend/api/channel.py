@@ -0,0 +1,290 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import WebSocket
+
+from agents.serialization import dumps
+from core.config import (
+    WS_BATCH_WINDOW_MS,
+    WS_BATCH_MAX_EVENTS,
+    WS_MAX_QUEUED_FRAMES,
+    WS_CLOSE_QUEUED_FRAMES,
+    WS_CLOSE_QUEUED_BYTES,
+)
+from core.metrics import DEPTH_BUCKETS, metrics
+
+# Emitted many times per node (one per token / stream chunk). These are
+# coalesced into batch frames and are the only events that may be dropped.
+HIGH_RATE_EVENTS = frozenset([
+    "on_chat_model_stream", "on_llm_stream", "on_chain_stream", "on_tool_stream",
+])
+
+WS_QUEUE_DEPTH = metrics.histogram(
+    "agentlens_ws_queue_frames", "Frames already waiting when a frame is queued", buckets=DEPTH_BUCKETS
+)
+WS_DROPPED = metrics.counter("agentlens_ws_dropped_events_total", "High-rate events dropped for slow clients")
+WS_SLOW_CLOSED = metrics.counter("agentlens_ws_slow_closed_total", "Websocket clients closed for falling too far behind")
+
+# Close code for a client that fell too far behind: try again later
+CLOSE_TOO_SLOW = 1013
+
+
+class Subscription:
+    """Event kinds and node names a client asked for; empty means everything.
+
+    Events carrying a state snapshot or patch are always delivered, since a
+    patch can only be applied on top of the ones before it.
+    """
+
+    def __init__(self, events: Optional[Iterable[str]] = None, nodes: Optional[Iterable[str]] = None):
+        self.events = frozenset(events or ())
+        self.nodes = frozenset(nodes or ())
+
+    @classmethod
+    def from_message(cls, payload: Dict[str, Any]) -> "Subscription":
+        spec = payload.get("subscribe") or {}
+        if not isinstance(spec, dict):
+            return cls()
+        return cls(spec.get("events"), spec.get("nodes"))
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if "state_snapshot" in event or "state_patch" in event:
+            return True
+        if self.events and event.get("event") not in self.events:
+            return False
+        if self.nodes:
+            metadata = event.get("metadata") or {}
+            node = metadata.get("langgraph_node") if isinstance(metadata, dict) else None
+            if node not in self.nodes and event.get("name") not in self.nodes:
+                return False
+        return True
+
+
+def _batch_frame(events: List[str], dropped: int = 0) -> str:
+    # Events are already encoded; splice them into the frame as-is
+    frame = '{"type":"batch","events":[' + ",".join(events) + "]"
+    if dropped:
+        frame += f',"dropped":{dropped}'
+    return frame + "}"
+
+
+class EventChannel:
+    """Outbound side of one websocket run stream.
+
+    `publish` never blocks: events are encoded once and queued, and a sender
+    task writes frames at whatever pace the client reads them. High-rate
+    events are buffered for `batch_ms` and sent together as one
+    {"type": "batch", "events": [...]} frame. When more than `max_frames`
+    frames are waiting, new high-rate frames are dropped (and counted in the
+    next batch's "dropped" field); other events are still queued. A client
+    with `close_frames` frames or `close_bytes` bytes waiting is closed
+    with code 1013 instead, so a stalled client costs bounded memory.
+
+    Events from before the client attached (a run's history) go through
+    `backfill` / `replay` instead: they are never dropped, and don't count
+    towards those limits.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        subscription: Optional[Subscription] = None,
+        batch_ms: float = WS_BATCH_WINDOW_MS,
+        max_frames: int = WS_MAX_QUEUED_FRAMES,
+        max_batch: int = WS_BATCH_MAX_EVENTS,
+        close_frames: int = WS_CLOSE_QUEUED_FRAMES,
+        close_bytes: int = WS_CLOSE_QUEUED_BYTES,
+    ):
+        self.ws = ws
+        self.subscription = subscription or Subscription()
+        self.batch_s = max(0.0, batch_ms) / 1000
+        self.max_frames = max(1, max_frames)
+        self.max_batch = max(1, max_batch)
+        self.close_frames = max(self.max_frames, close_frames)
+        self.close_bytes = close_bytes
+        self.closed = False
+        # Closed with CLOSE_TOO_SLOW because the client fell too far behind
+        self.overflowed = False
+        self.sent = 0
+        self.dropped = 0
+        self._dropped_unreported = 0
+        self._frames: Deque[str] = deque()
+        self._queued_bytes = 0
+        # Backfilled frames still queued, at the front of _frames; they are
+        # not counted in _queued_bytes or towards the live limits
+        self._backfill_left = 0
+        self._backfilled = asyncio.Event()
+        self._ready = asyncio.Event()
+        self._pending: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._sender = asyncio.create_task(self._send_loop())
+        self._closer: Optional[asyncio.Task] = None
+
+    def publish(self, event: Dict[str, Any], encoded: Optional[str] = None) -> None:
+        # `encoded` lets a fan-out serialize an event once for all its channels
+        if self.closed or not self.subscription.matches(event):
+            return
+        if encoded is None:
+            encoded = dumps(event).decode("utf-8")
+        if event.get("event") not in HIGH_RATE_EVENTS:
+            # Keep ordering: anything buffered was emitted before this event
+            self._flush_pending()
+            self._enqueue(encoded, droppable=False)
+            return
+        if self.batch_s == 0:
+            self._enqueue(encoded, droppable=True)
+            return
+        self._pending.append(encoded)
+        if len(self._pending) >= self.max_batch:
+            self._flush_pending()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_s, self._flush_pending)
+
+    def backfill(self, events: Iterable[Tuple[Dict[str, Any], Optional[str]]]) -> None:
+        """Queue past (event, encoded) pairs, in order, without dropping any.
+
+        Only before live events: backfilled frames are sent ahead of them.
+        High-rate events still go out as batch frames of up to `max_batch`.
+        """
+        if self.closed:
+            return
+        frames: List[str] = []
+        batch: List[str] = []
+        for event, encoded in events:
+            if not self.subscription.matches(event):
+                continue
+            if encoded is None:
+                encoded = dumps(event).decode("utf-8")
+            if event.get("event") in HIGH_RATE_EVENTS:
+                batch.append(encoded)
+                if len(batch) >= self.max_batch:
+                    frames.append(_batch_frame(batch))
+                    batch = []
+                continue
+            if batch:
+                frames.append(_batch_frame(batch))
+                batch = []
+            frames.append(encoded)
+        if batch:
+            frames.append(_batch_frame(batch))
+        self._frames.extend(frames)
+        self._backfill_left += len(frames)
+        if frames:
+            self._ready.set()
+
+    async def replay(self, events: Iterable[Tuple[Dict[str, Any], Optional[str]]]) -> None:
+        """`backfill` `events` a `max_batch` at a time, waiting for each to be sent.
+
+        For histories too long to hold queued at once (a stored run).
+        """
+        chunk: List[Tuple[Dict[str, Any], Optional[str]]] = []
+        for item in events:
+            chunk.append(item)
+            if len(chunk) >= self.max_batch:
+                self.backfill(chunk)
+                chunk = []
+                await self._drain_backfill()
+                if self.closed:
+                    return
+        self.backfill(chunk)
+        await self._drain_backfill()
+
+    async def _drain_backfill(self) -> None:
+        while self._backfill_left and not self.closed:
+            self._backfilled.clear()
+            await self._backfilled.wait()
+
+    def _flush_pending(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        events, self._pending = self._pending, []
+        frame = _batch_frame(events, self._dropped_unreported)
+        if self._enqueue(frame, droppable=True, count=len(events)):
+            self._dropped_unreported = 0
+
+    def _enqueue(self, frame: str, droppable: bool, count: int = 1) -> bool:
+        depth = len(self._frames) - self._backfill_left
+        WS_QUEUE_DEPTH.observe(depth)
+        if droppable and depth >= self.max_frames:
+            self.dropped += count
+            self._dropped_unreported += count
+            WS_DROPPED.inc(count)
+            return False
+        if depth >= self.close_frames or self._queued_bytes + len(frame) > self.close_bytes:
+            self._overflow()
+            return False
+        self._frames.append(frame)
+        self._queued_bytes += len(frame)
+        self._ready.set()
+        return True
+
+    def _overflow(self) -> None:
+        # Stop queueing for a client that isn't reading; the sender may be
+        # stuck mid-write, so it is cancelled rather than drained
+        self.closed = True
+        self.overflowed = True
+        self._clear()
+        self._pending = []
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        WS_SLOW_CLOSED.inc()
+        self._sender.cancel()
+        self._closer = asyncio.create_task(self._close_slow())
+
+    async def _close_slow(self) -> None:
+        try:
+            await asyncio.wait_for(self.ws.close(code=CLOSE_TOO_SLOW), 5)
+        except Exception:
+            pass
+
+    async def _send_loop(self) -> None:
+        try:
+            while True:
+                while self._frames:
+                    frame = self._frames.popleft()
+                    if self._backfill_left:
+                        self._backfill_left -= 1
+                        if not self._backfill_left:
+                            self._backfilled.set()
+                    else:
+                        self._queued_bytes -= len(frame)
+                    await self.ws.send_text(frame)
+                    self.sent += 1
+                if self.closed:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+        except Exception:
+            # Client went away; stop accepting events
+            self.closed = True
+            self._clear()
+
+    def _clear(self) -> None:
+        self._frames.clear()
+        self._queued_bytes = 0
+        self._backfill_left = 0
+        # Wake a replay waiting on frames that will never be sent
+        self._backfilled.set()
+
+    async def aclose(self) -> None:
+        """Flush buffered events and wait until everything queued is sent."""
+        if not self.closed:
+            self._flush_pending()
+            self.closed = True
+            self._ready.set()
+        if self.overflowed:
+            await self._closer
+            return
+        await self._sender
+
+    def cancel(self) -> None:
+        self.closed = True
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._sender.cancel()
+        self._backfilled.set()
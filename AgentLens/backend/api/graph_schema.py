@@ -1,32 +1,22 @@
-from fastapi import APIRouter
-from agents.research_graph import build_graph
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from agents.registry import DEFAULT_GRAPH, graph_registry
 
 router = APIRouter()
 
 @router.get("/graph-schema")
-async def graph_schema():
-    graph = build_graph()
-    schema = {"nodes": [], "edges": []}
-
-    # Best effort introspection, LangGraph API can vary by version
+async def graph_schema(request: Request, name: str = DEFAULT_GRAPH, version: str | None = None):
+    # Schema is precomputed once per graph version by the registry
     try:
-        g = graph.get_graph()
-        schema["nodes"] = [{"id": n.id, "label": n.id} for n in g.nodes]
-        schema["edges"] = [{"source": e.source, "target": e.target} for e in g.edges]
-        return schema
-    except Exception:
-        # Fallback to known structure
-        schema["nodes"] = [
-            {"id": "supervisor", "label": "supervisor"},
-            {"id": "researcher", "label": "researcher"},
-            {"id": "synthesizer", "label": "synthesizer"},
-            {"id": "verifier", "label": "verifier"},
-        ]
-        schema["edges"] = [
-            {"source": "supervisor", "target": "researcher"},
-            {"source": "researcher", "target": "synthesizer"},
-            {"source": "synthesizer", "target": "verifier"},
-            {"source": "verifier", "target": "researcher", "label": "retry if issues"},
-        ]
-        return schema
+        entry = graph_registry.get(name, version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+
+    # Weak comparison (RFC 9110): a W/ prefix doesn't prevent a match
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if entry.etag in tags or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
 
+    return JSONResponse(entry.schema, headers=headers)
@@ -1,24 +1,100 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from agents.research_graph import build_graph, run_graph_once
-from services.langsmith_service import fetch_trace
-from services.analytics_service import compute_analytics
-from services.drift_service import compute_drift
+from services.langsmith_service import fetch_trace, stream_trace
+from services.analytics_service import compute_analytics, fleet_snapshot
+from services.drift_service import compute_drift, stream_drift
+from services.event_store import event_store
+from services.scheduler import FINISHED, QueueFull, run_scheduler
+from services.run_hub import run_hub
+from agents.serialization import dumps
+from core.cache import cache
+from agents.llm import llm_gateway
+from agents.registry import get_graph
+from core.config import CHECKPOINTS_ENABLED
 
 router = APIRouter()
 
+class DriftBatchRequest(BaseModel):
+    # States to score, and/or stored runs (by id, or every run with all_runs)
+    states: Optional[List[Dict[str, Any]]] = None
+    run_ids: Optional[List[str]] = None
+    all_runs: bool = False
+    # Also score citation support against each run's documents (slower)
+    grounding: bool = False
+
 class RunRequest(BaseModel):
     question: str
+    # Note extraction mode for this run (default: EXTRACTION_MODE)
+    extraction_mode: Optional[Literal["single", "map_reduce"]] = None
+    # Scheduling: higher runs first; the X-Tenant-Id header wins over tenant
+    priority: int = 0
+    tenant: Optional[str] = None
+
+class ResumeRequest(BaseModel):
+    priority: int = 0
+    tenant: Optional[str] = None
+
+class ForkRequest(ResumeRequest):
+    # Fork point: a checkpoint id, or a LangGraph step (see /runs/{run_id}/checkpoints)
+    checkpoint_id: Optional[str] = None
+    step: Optional[int] = None
+
+def _submit(req: RunRequest, tenant: Optional[str]):
+    try:
+        return run_scheduler.submit(
+            req.question, tenant or req.tenant or "default", req.priority, req.extraction_mode
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
 @router.post("/run-agent")
-async def run_agent(req: RunRequest):
-    graph = build_graph()
-    run_id, final_state = await run_graph_once(graph, req.question)
-    return {"run_id": run_id, "final_state": final_state}
+async def run_agent(req: RunRequest, x_tenant_id: Optional[str] = Header(None)):
+    # If this request is cancelled while waiting, the run is cancelled too
+    job = await run_scheduler.wait(_submit(req, x_tenant_id))
+    if job.status != "completed":
+        raise HTTPException(status_code=500, detail=f"Run {job.run_id} {job.status}: {job.error or 'no error recorded'}")
+    return {"run_id": job.run_id, "final_state": job.final_state}
+
+@router.post("/runs", status_code=202)
+async def submit_run(req: RunRequest, x_tenant_id: Optional[str] = Header(None)):
+    job = _submit(req, x_tenant_id)
+    return {"run_id": job.run_id, "status": job.status, "status_url": f"/api/runs/{job.run_id}/status"}
+
+@router.get("/runs/{run_id}/status")
+async def run_status(run_id: str):
+    status = run_scheduler.status(run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run: {run_id}")
+    return status
+
+@router.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    if run_scheduler.get(run_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run: {run_id}")
+    return {"run_id": run_id, "cancelled": run_scheduler.cancel(run_id)}
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    return {**run_scheduler.snapshot(), "hub": run_hub.snapshot()}
 
 @router.get("/trace/{run_id}")
-async def trace(run_id: str):
-    return await fetch_trace(run_id)
+async def trace(run_id: str, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1)):
+    return await fetch_trace(run_id, offset, limit)
+
+@router.get("/trace/{run_id}/stream")
+async def trace_stream(run_id: str):
+    # Newline-delimited JSON, one page of runs per line
+    async def lines():
+        async for page in stream_trace(run_id):
+            yield dumps(page) + b"\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/analytics")
+async def fleet_analytics():
+    return await fleet_snapshot()
 
 @router.get("/analytics/{run_id}")
 async def analytics(run_id: str):
@@ -28,3 +104,115 @@ async def analytics(run_id: str):
 async def drift(state: dict):
     return compute_drift(state)
 
+@router.post("/drift/batch")
+async def drift_batch(req: DriftBatchRequest):
+    # Newline-delimited JSON, one result per state/run, then a "done" line
+    async def lines():
+        async for result in stream_drift(req.states, req.run_ids, req.all_runs, grounding=req.grounding):
+            yield dumps(result) + b"\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return cache.snapshot()
+
+
+@router.get("/llm/stats")
+async def llm_stats():
+    return llm_gateway.snapshot()
+
+
+@router.get("/runs")
+async def list_runs(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    return {"runs": await event_store.list_runs(limit, offset)}
+
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    run = await event_store.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run: {run_id}")
+    return run
+
+
+@router.get("/runs/{run_id}/events")
+async def run_events(
+    run_id: str,
+    start: Optional[int] = Query(None, ge=0, description="First step_index (inclusive)"),
+    end: Optional[int] = Query(None, ge=0, description="Last step_index (inclusive)"),
+    node: Optional[str] = None,
+    event: Optional[str] = None,
+    limit: int = Query(10000, ge=1, le=100000),
+):
+    if await event_store.get_run(run_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run: {run_id}")
+    events = await event_store.get_events(run_id, start, end, node, event, limit)
+    return {"run_id": run_id, "count": len(events), "events": events}
+
+
+@router.get("/runs/{run_id}/state")
+async def run_state(run_id: str, step: Optional[int] = Query(None, ge=0)):
+    state = await event_store.state_at(run_id, step)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"No state recorded for run {run_id}")
+    return {"run_id": run_id, "step_index": step, "state": state}
+
+async def _checkpoints():
+    if not CHECKPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Checkpoints are disabled (CHECKPOINTS_ENABLED=false)")
+    # Imported here: loads langgraph, which the app only needs once a run starts
+    from services import checkpoint_store
+    return await asyncio.to_thread(get_graph), checkpoint_store
+
+async def _continue_run(run_id: str, req: ResumeRequest, mode: str, tenant: Optional[str], checkpoint_id=None, step=None):
+    live = run_scheduler.get(run_id)
+    if live is not None and live.status not in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Run {run_id} is still {live.status}")
+    graph, store = await _checkpoints()
+    snapshot = await store.find_checkpoint(graph, run_id, checkpoint_id, step)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"No such checkpoint recorded for run {run_id}")
+    if not snapshot.next:
+        raise HTTPException(status_code=409, detail=f"Run {run_id} has nothing left to run from that checkpoint")
+    state = snapshot.values
+    resume_from = {"run_id": run_id, "checkpoint_id": snapshot.config["configurable"]["checkpoint_id"], "mode": mode}
+    try:
+        job = run_scheduler.submit(
+            state.get("question", ""), tenant or req.tenant or "default", req.priority,
+            state.get("extraction_mode"), resume_from=resume_from,
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {**job.to_dict(), "status_url": f"/api/runs/{job.run_id}/status"}
+
+@router.get("/runs/{run_id}/checkpoints")
+async def run_checkpoints(run_id: str, limit: int = Query(100, ge=1, le=1000)):
+    # The latest `limit`, oldest first
+    graph, store = await _checkpoints()
+    found = await store.list_checkpoints(graph, run_id, limit)
+    if not found:
+        raise HTTPException(status_code=404, detail=f"No checkpoints recorded for run {run_id}")
+    return {"run_id": run_id, "checkpoints": found}
+
+@router.get("/runs/{run_id}/checkpoints/{checkpoint_id}")
+async def run_checkpoint(run_id: str, checkpoint_id: str):
+    # State at that step, loaded from disk (nothing is re-executed)
+    graph, store = await _checkpoints()
+    snapshot = await store.find_checkpoint(graph, run_id, checkpoint_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Unknown checkpoint {checkpoint_id} of run {run_id}")
+    return {"run_id": run_id, **store.snapshot_dict(snapshot)}
+
+@router.post("/runs/{run_id}/resume", status_code=202)
+async def resume_run(run_id: str, req: Optional[ResumeRequest] = None, x_tenant_id: Optional[str] = Header(None)):
+    # A new run continuing from the last node that completed: the failed or
+    # interrupted node (and what follows) runs again, nothing before it does
+    return await _continue_run(run_id, req or ResumeRequest(), "resume", x_tenant_id)
+
+@router.post("/runs/{run_id}/fork", status_code=202)
+async def fork_run(run_id: str, req: ForkRequest, x_tenant_id: Optional[str] = Header(None)):
+    # A new run from any checkpoint of this one; the nodes after it run again
+    if req.checkpoint_id is None and req.step is None:
+        raise HTTPException(status_code=422, detail="Give checkpoint_id or step")
+    return await _continue_run(run_id, req, "fork", x_tenant_id, req.checkpoint_id, req.step)
@@ -1,17 +1,123 @@
+import asyncio
+from typing import Any, Dict
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from agents.research_graph import build_graph, stream_graph
+from starlette.websockets import WebSocketState
+from agents.nodes.notes import EXTRACTION_MODES
+from api.channel import EventChannel, Subscription
+from core.config import WS_BATCH_WINDOW_MS
+from services.event_store import event_store
+from services.run_hub import RunTopic, run_hub
+from services.scheduler import FAILED, QueueFull, run_scheduler
 
 ws_router = APIRouter()
 
+# Stored events read per query when replaying a finished run
+_REPLAY_PAGE_EVENTS = 2000
+
+
+def _channel(ws: WebSocket, payload: Dict[str, Any]) -> EventChannel:
+    batch_ms = payload.get("batch_ms", WS_BATCH_WINDOW_MS)
+    if not isinstance(batch_ms, (int, float)):
+        batch_ms = WS_BATCH_WINDOW_MS
+    return EventChannel(ws, Subscription.from_message(payload), batch_ms=batch_ms)
+
+
+async def _wait_disconnect(ws: WebSocket) -> None:
+    # Clients send nothing after the first message; this returns when they leave
+    while True:
+        message = await ws.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+async def _close(ws: WebSocket, code: int = 1000) -> None:
+    # The channel may already have closed a client that fell behind
+    if ws.client_state == WebSocketState.CONNECTED and ws.application_state == WebSocketState.CONNECTED:
+        await ws.close(code=code)
+
+
+async def _watch(ws: WebSocket, channel: EventChannel, topic: RunTopic) -> None:
+    """Stream a live run to one client until the run ends or the client leaves."""
+    disconnect = asyncio.create_task(_wait_disconnect(ws))
+    finished = asyncio.create_task(topic.done.wait())
+    try:
+        await topic.attach(channel)
+        await asyncio.wait({disconnect, finished}, return_when=asyncio.FIRST_COMPLETED)
+        if topic.done.is_set():
+            await channel.aclose()
+            job = run_scheduler.get(topic.run_id)
+            await _close(ws, 1011 if job is not None and job.status == FAILED else 1000)
+    finally:
+        disconnect.cancel()
+        finished.cancel()
+        topic.detach(channel)
+        channel.cancel()
+        # Last viewer of a websocket-started run left mid-run: stop the graph
+        # and its in-flight calls now
+        if topic.cancel_when_unwatched and not topic.subscribers and not topic.closed:
+            await run_scheduler.cancel_and_wait(topic.run_id)
+
+
 @ws_router.websocket("/run")
 async def run_stream(ws: WebSocket):
     await ws.accept()
     try:
         payload = await ws.receive_json()
-        question = payload.get("question", "")
-        graph = build_graph()
-        async for event in stream_graph(graph, question):
-            await ws.send_json(event)
     except WebSocketDisconnect:
         return
+    question = payload.get("question", "")
+    extraction_mode = payload.get("extraction_mode")
+    if extraction_mode not in EXTRACTION_MODES:
+        extraction_mode = None
+    tenant = payload.get("tenant")
+    if not isinstance(tenant, str) or not tenant:
+        tenant = "default"
+    priority = payload.get("priority", 0)
+    if not isinstance(priority, int):
+        priority = 0
+    channel = _channel(ws, payload)
+    try:
+        job = run_scheduler.submit(question, tenant, priority, extraction_mode)
+    except QueueFull as e:
+        channel.cancel()
+        await ws.send_json({"type": "error", "detail": str(e)})
+        await ws.close(code=1013)  # try again later
+        return
+    job.topic.cancel_when_unwatched = True
+    await _watch(ws, channel, job.topic)
+
 
+@ws_router.websocket("/runs/{run_id}")
+async def attach_stream(ws: WebSocket, run_id: str):
+    # Watch a run someone else started: from step 0, then live. The first
+    # message carries the same subscribe/batch_ms options as /ws/run ({} for none).
+    await ws.accept()
+    try:
+        payload = await ws.receive_json()
+    except WebSocketDisconnect:
+        return
+    channel = _channel(ws, payload if isinstance(payload, dict) else {})
+    topic = run_hub.get(run_id)
+    if topic is not None:
+        await _watch(ws, channel, topic)
+        return
+    # Not live (finished, or never ran here): replay what the store has
+    if await event_store.get_run(run_id) is None:
+        channel.cancel()
+        await ws.send_json({"type": "error", "detail": f"Unknown run: {run_id}"})
+        await ws.close(code=1008)
+        return
+    try:
+        # Not live: nothing is dropped, the client is sent it as fast as it
+        # reads, a page of the store at a time
+        start = 0
+        while not channel.closed:
+            page = await event_store.get_events(run_id, start, limit=_REPLAY_PAGE_EVENTS)
+            await channel.replay((event, None) for event in page)
+            if len(page) < _REPLAY_PAGE_EVENTS:
+                break
+            start = page[-1]["step_index"] + 1
+        await channel.aclose()
+        await _close(ws)
+    finally:
+        channel.cancel()
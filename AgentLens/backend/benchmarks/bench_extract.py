@@ -0,0 +1,66 @@
+"""Speed and output parity of the HTML text extraction engines.
+
+Run from backend/:  python -m benchmarks.bench_extract [--max-chars 6000] [--rounds 20]
+
+Every page in benchmarks/fixtures/html is extracted by each engine in
+agents.nodes.extract.EXTRACTORS; output is compared against the BeautifulSoup
+engine, both whole-document and fed in network-sized chunks.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from agents.nodes.extract import EXTRACTORS, StreamingTextExtractor, bs4_html_to_text
+
+FIXTURES = Path(__file__).parent / "fixtures" / "html"
+
+
+def chunked(html: str, max_chars: int, size: int = 16 * 1024) -> str:
+    extractor = StreamingTextExtractor(max_chars)
+    for i in range(0, len(html), size):
+        if extractor.feed(html[i:i + size]):
+            break
+    return extractor.text()
+
+
+def time_it(fn, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--max-chars", type=int, default=6000)
+    p.add_argument("--rounds", type=int, default=20)
+    args = p.parse_args()
+
+    pages = sorted(FIXTURES.glob("*.html"))
+    mismatches = 0
+    print(f"{'page':16s} {'KB':>6s}  " + "  ".join(f"{name + ' ms':>10s}" for name in EXTRACTORS) + "   speedup  parity")
+    for path in pages:
+        html = path.read_text(encoding="utf-8")
+        expected = bs4_html_to_text(html, args.max_chars)
+        medians = {}
+        for name, extract in EXTRACTORS.items():
+            medians[name] = time_it(lambda: extract(html, args.max_chars), args.rounds)
+        same = all(extract(html, args.max_chars) == expected for extract in EXTRACTORS.values())
+        same = same and chunked(html, args.max_chars) == expected
+        mismatches += not same
+        print(
+            f"{path.stem:16s} {len(html.encode()) // 1024:6d}  "
+            + "  ".join(f"{medians[name] * 1000:10.2f}" for name in EXTRACTORS)
+            + f"   {medians['bs4'] / medians['stream']:6.1f}x  {'ok' if same else 'MISMATCH'}"
+        )
+    if mismatches:
+        print(f"{mismatches} page(s) differ from the BeautifulSoup output")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
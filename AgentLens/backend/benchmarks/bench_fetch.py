@@ -0,0 +1,113 @@
+"""Compare per-URL clients vs the pooled PageFetcher against a local server.
+
+Run from backend/:  python -m benchmarks.bench_fetch --pages 6 --rounds 5
+
+The stand-in server speaks HTTP/1.1 with keep-alive, sleeps `--handshake-ms`
+on every new connection (standing in for TCP+TLS setup) and `--latency-ms`
+per request, and serves pages of `--page-kb` KB.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from agents.nodes.extract import bs4_html_to_text as html_to_text
+from agents.nodes.utils import PageFetcher
+
+
+def make_page(kb: int) -> bytes:
+    para = "<p>AgentLens fetch benchmark paragraph with some visible text.</p>\n"
+    script = "<script>var x = " + "1" * 200 + ";</script>\n"
+    body = []
+    size = 0
+    while size < kb * 1024:
+        body.append(script if len(body) % 5 == 0 else para)
+        size += len(body[-1])
+    return ("<html><head><title>bench</title></head><body>" + "".join(body) + "</body></html>").encode()
+
+
+def start_server(page: bytes, handshake_s: float, latency_s: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            time.sleep(handshake_s)
+            super().setup()
+
+        def do_GET(self):
+            time.sleep(latency_s)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            try:
+                self.wfile.write(page)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def baseline_fetch(url: str, max_chars: int = 6000) -> str:
+    # Previous behavior: a fresh client per URL, full body download
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            r = await client.get(url, follow_redirects=True)
+            r.raise_for_status()
+        return html_to_text(r.text, max_chars)
+    except Exception:
+        return ""
+
+
+async def run(args):
+    server = start_server(make_page(args.page_kb), args.handshake_ms / 1000, args.latency_ms / 1000)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/page/{i}" for i in range(args.pages)]
+    fetcher = PageFetcher(max_per_host=args.pages)
+
+    async def serial_baseline():
+        return [await baseline_fetch(u) for u in urls]
+
+    async def pooled():
+        return await fetcher.fetch_many(urls)
+
+    results = {}
+    for name, fn in [("baseline (serial, client per URL)", serial_baseline), ("pooled (concurrent, streamed)", pooled)]:
+        timings = []
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            texts = await fn()
+            timings.append(time.perf_counter() - t0)
+        assert all(texts), f"{name} returned empty pages"
+        results[name] = timings
+
+    await fetcher.aclose()
+    server.shutdown()
+
+    print(f"{args.pages} pages x {args.page_kb} KB, handshake {args.handshake_ms} ms, latency {args.latency_ms} ms")
+    for name, timings in results.items():
+        print(f"  {name:36s} median {statistics.median(timings) * 1000:8.1f} ms   min {min(timings) * 1000:8.1f} ms")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--pages", type=int, default=6)
+    p.add_argument("--page-kb", type=int, default=512)
+    p.add_argument("--handshake-ms", type=float, default=50)
+    p.add_argument("--latency-ms", type=float, default=30)
+    p.add_argument("--rounds", type=int, default=5)
+    asyncio.run(run(p.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Micro-benchmarks of the per-event and per-document hot paths, gated on a baseline.
+
+Run from backend/:  python -m benchmarks.bench_micro [--filter drift] [--threshold 0.25]
+                    python -m benchmarks.bench_micro --save-baseline
+
+Fixtures are fixed: a recorded astream_events trace and run states
+(benchmarks/record_fixtures.py) and the saved pages in fixtures/html.
+For each benchmark it reports ops/sec (best of several timed repeats) and
+the peak memory allocated by one op (tracemalloc). It exits 1 when a
+benchmark is more than `--threshold` slower, or allocates that much more,
+than in benchmarks/baseline.json. Baselines are machine-specific: save one
+on the machine that runs the gate.
+"""
+import argparse
+import gc
+import gzip
+import json
+import logging
+import queue
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from agents.nodes.extract import StreamingDecoder, html_to_text
+from agents.research_graph import build_payload
+from agents.serialization import dumps, serialize_for_json
+from agents.snapshots import SnapshotEncoder
+from core.logging import _QueueHandler
+from core.metrics import Registry
+from services.drift_service import compute_drift, compute_drift_batch
+
+HERE = Path(__file__).parent
+FIXTURES = HERE / "fixtures"
+BASELINE = HERE / "baseline.json"
+
+# Peak-memory growth under this many KB is noise, whatever the ratio
+MIN_PEAK_DELTA_KB = 16
+
+
+def load_fixture(path: Path) -> Any:
+    from langchain_core.load import load
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    with warnings.catch_warnings():
+        # langchain_core.load is marked beta; the fixtures are our own
+        warnings.simplefilter("ignore")
+        return load(data)
+
+
+def benchmarks() -> Dict[str, Callable[[], Any]]:
+    trace: List[Dict[str, Any]] = load_fixture(FIXTURES / "traces" / "research_run.json.gz")
+    states: List[Dict[str, Any]] = load_fixture(FIXTURES / "states" / "run_states.json.gz")
+    run_id = "00000000-0000-0000-0000-000000000000"
+    payloads = []
+    encoder = SnapshotEncoder()
+    for i, step in enumerate(trace):
+        payloads.append(build_payload(step, run_id, i, encoder))
+
+    def serialize_trace():
+        for step in trace:
+            serialize_for_json(step.get("data"))
+            serialize_for_json(step.get("metadata", {}))
+
+    def build_trace():
+        # Fresh encoder per pass: keyframes and patches as in a real run
+        snapshots = SnapshotEncoder()
+        for i, step in enumerate(trace):
+            build_payload(step, run_id, i, snapshots)
+
+    def encode_trace():
+        for payload in payloads:
+            dumps(payload)
+
+    benches: Dict[str, Callable[[], Any]] = {
+        "serialize_for_json/trace": serialize_trace,
+        "build_payload/trace": build_trace,
+        "dumps/trace": encode_trace,
+        "compute_drift/states": lambda: [compute_drift(s, grounding=False) for s in states],
+        "compute_drift_batch/states": lambda: compute_drift_batch(states),
+        "compute_drift_batch/states+grounding": lambda: compute_drift_batch(states, grounding=True),
+    }
+
+    benches.update(instrumentation_benchmarks())
+
+    for path in sorted((FIXTURES / "html").glob("*.html")):
+        raw = path.read_bytes()
+
+        def streamed(raw=raw):
+            # What fetch_page_text does with a body as it arrives
+            decoder = StreamingDecoder("utf-8", 6000)
+            for i in range(0, len(raw), 16 * 1024):
+                if decoder.feed(raw[i:i + 16 * 1024]):
+                    break
+            return decoder.text()
+
+        html = raw.decode("utf-8")
+        benches[f"fetch_extract/{path.stem}"] = streamed
+        benches[f"html_to_text/{path.stem}"] = lambda html=html: html_to_text(html, 6000)
+    return benches
+
+
+def instrumentation_benchmarks(n: int = 1000) -> Dict[str, Callable[[], Any]]:
+    """Hot-path instrumentation, `n` calls per op (so ops/s * n = calls/s)."""
+    registry = Registry()
+    counter = registry.counter("bench_total", "", ("event",))
+    histogram = registry.histogram("bench_seconds", "", ("node", "outcome"))
+
+    # The handler configure_logging installs, minus the writer thread; the
+    # queue is drained after each op so it doesn't grow while timing
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    log = logging.getLogger("agentlens.bench")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    log.handlers = [_QueueHandler(records)]
+
+    def counter_inc():
+        for _ in range(n):
+            counter.inc(event="on_chat_model_stream")
+
+    def histogram_observe():
+        for i in range(n):
+            histogram.observe(i * 0.001, node="researcher", outcome="ok")
+
+    def log_enabled():
+        for _ in range(n):
+            log.info("Search timed out", extra={"provider": "Tavily", "query": "q"})
+        while not records.empty():
+            records.get_nowait()
+
+    def log_disabled():
+        for _ in range(n):
+            log.debug("Search timed out", extra={"provider": "Tavily", "query": "q"})
+
+    return {
+        f"metrics/counter_inc_x{n}": counter_inc,
+        f"metrics/histogram_observe_x{n}": histogram_observe,
+        f"metrics/log_queued_x{n}": log_enabled,
+        f"metrics/log_filtered_x{n}": log_disabled,
+    }
+
+
+def time_op(fn: Callable[[], Any], min_time: float, repeats: int) -> float:
+    """Ops/sec: loops per repeat calibrated to ~min_time, best repeat wins.
+
+    GC is off while timing (as in timeit): collections land on whichever op
+    happens to trigger them and are the main source of noise.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _time_op(fn, min_time, repeats)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _time_op(fn: Callable[[], Any], min_time: float, repeats: int) -> float:
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 4:
+            break
+        loops *= 4
+    loops = max(1, int(loops * min_time / max(elapsed, 1e-9)))
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return 1.0 / best
+
+
+def peak_kb(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(fn: Callable[[], Any], min_time: float, repeats: int) -> Dict[str, float]:
+    return {
+        "ops_per_s": round(time_op(fn, min_time, repeats), 2),
+        "peak_kb": round(peak_kb(fn), 1),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[Tuple[str, str]]:
+    failures = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if r["ops_per_s"] < base["ops_per_s"] * (1 - threshold):
+            failures.append((name, f"{r['ops_per_s']:.1f} ops/s vs baseline {base['ops_per_s']:.1f}"))
+        if r["peak_kb"] > base["peak_kb"] * (1 + threshold) and r["peak_kb"] - base["peak_kb"] > MIN_PEAK_DELTA_KB:
+            failures.append((name, f"peak {r['peak_kb']:.0f} KB vs baseline {base['peak_kb']:.0f} KB"))
+    return failures
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--filter", default="", help="only benchmarks whose name contains this")
+    p.add_argument("--min-time", type=float, default=0.2, help="seconds per timed repeat")
+    p.add_argument("--repeats", type=int, default=7)
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown / extra memory (0.25 = 25%%)")
+    p.add_argument("--confirm", type=int, default=2, help="re-measure a regressed benchmark this many times; best result counts")
+    p.add_argument("--baseline", type=Path, default=BASELINE)
+    p.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    p.add_argument("--json", type=Path, default=None, help="also write results here")
+    args = p.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())["benchmarks"] if args.baseline.exists() else {}
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'benchmark':34s} {'ops/s':>12s} {'peak KB':>10s} {'vs base':>8s}")
+    benches = {name: fn for name, fn in benchmarks().items() if args.filter in name}
+    for name, fn in benches.items():
+        fn()  # warm caches and lazy imports
+        results[name] = measure(fn, args.min_time, args.repeats)
+        base = baseline.get(name)
+        change = f"{results[name]['ops_per_s'] / base['ops_per_s'] - 1:+7.1%}" if base else "     new"
+        print(f"{name:34s} {results[name]['ops_per_s']:12.1f} {results[name]['peak_kb']:10.1f} {change:>8s}")
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": results,
+    }
+    if args.save_baseline:
+        # Keep entries for benchmarks filtered out of this run
+        report["benchmarks"] = {**baseline, **results}
+        args.baseline.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    failures = compare(results, baseline, args.threshold)
+    for _ in range(args.confirm):
+        if not failures:
+            break
+        # Shared machines are noisy: a real regression survives re-measuring
+        for name in {name for name, _ in failures}:
+            again = measure(benches[name], args.min_time, args.repeats)
+            results[name] = {
+                "ops_per_s": max(results[name]["ops_per_s"], again["ops_per_s"]),
+                "peak_kb": min(results[name]["peak_kb"], again["peak_kb"]),
+            }
+        failures = compare(results, baseline, args.threshold)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if failures:
+        print(f"\n{len(failures)} regression(s) past {args.threshold:.0%}:")
+        for name, why in failures:
+            print(f"  {name}: {why}")
+        sys.exit(1)
+    if baseline:
+        print(f"\nNo regressions past {args.threshold:.0%} against {args.baseline.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Throughput and output parity of the event serializer.
+
+Run from backend/:  python -m benchmarks.bench_serialize [--tokens 400] [--rounds 10]
+
+Builds a synthetic astream_events v2 trace (token stream chunks, chat model
+start/end, node end events carrying full state) from real LangChain message
+objects, then compares the previous recursive serialize_for_json + json.dumps
+with the type-dispatched serializer + dumps.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from agents.serialization import dumps, orjson, serialize_for_json
+
+
+def legacy_serialize_for_json(obj):
+    """Recursively serialize objects for JSON, handling LangChain message types"""
+    if obj is None:
+        return None
+    if isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, dict):
+        return {k: legacy_serialize_for_json(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [legacy_serialize_for_json(item) for item in obj]
+    if hasattr(obj, 'usage_metadata'):
+        try:
+            usage_metadata = obj.usage_metadata
+            if isinstance(usage_metadata, dict):
+                return {'usage_metadata': usage_metadata}
+            elif hasattr(usage_metadata, '__dict__'):
+                return {'usage_metadata': legacy_serialize_for_json(usage_metadata.__dict__)}
+        except Exception:
+            pass
+    if hasattr(obj, 'response_metadata'):
+        try:
+            metadata = obj.response_metadata
+            if isinstance(metadata, dict):
+                return {'response_metadata': metadata}
+            elif hasattr(metadata, 'token_usage'):
+                token_usage = metadata.token_usage
+                if isinstance(token_usage, dict):
+                    return {'response_metadata': {'token_usage': token_usage}}
+        except Exception:
+            pass
+    if hasattr(obj, 'content'):
+        try:
+            content = obj.content
+            if isinstance(content, str):
+                return content
+            return legacy_serialize_for_json(content)
+        except Exception:
+            try:
+                return str(obj.content) if hasattr(obj, 'content') else str(obj)
+            except:
+                return str(obj)
+    if hasattr(obj, '__dict__'):
+        try:
+            d = {}
+            for k, v in obj.__dict__.items():
+                if k in ['response_metadata', 'usage_metadata', 'token_usage']:
+                    if isinstance(v, dict):
+                        d[k] = v
+                    elif hasattr(v, '__dict__'):
+                        d[k] = legacy_serialize_for_json(v.__dict__)
+                    else:
+                        d[k] = legacy_serialize_for_json(v)
+                elif not k.startswith('_') or k in ['_type', '_name']:
+                    d[k] = legacy_serialize_for_json(v)
+            return d
+        except Exception:
+            return str(obj)
+    return str(obj)
+
+
+def make_trace(tokens: int):
+    """A research-run-shaped list of raw astream_events v2 events."""
+    question = "How do LangGraph agents stream events?"
+    docs = [
+        {"title": f"Doc {i}", "url": f"https://example.com/{i}", "snippet": "s" * 200, "content": "word " * 1200}
+        for i in range(6)
+    ]
+    state = {"question": question, "queries": [question, f"{question} overview"], "documents": docs, "notes": ["- fact (source: https://example.com/1)"] * 3}
+    run_id = str(uuid.uuid4())
+
+    def meta(node, step):
+        return {
+            "langgraph_step": step, "langgraph_node": node, "langgraph_triggers": ("branch:to:" + node,),
+            "langgraph_path": ("__pregel_pull", node), "langgraph_checkpoint_ns": f"{node}:{run_id}",
+            "ls_provider": "openai", "ls_model_name": "gpt-4o-mini", "ls_model_type": "chat", "ls_temperature": 0.2,
+        }
+
+    events = [{"event": "on_chain_start", "name": "LangGraph", "run_id": run_id, "data": {"input": {"question": question}}, "metadata": {}}]
+    for step, node in enumerate(["supervisor", "researcher", "synthesizer", "verifier"], 1):
+        events.append({"event": "on_chain_start", "name": node, "data": {"input": state}, "metadata": meta(node, step)})
+        if node in ("researcher", "synthesizer"):
+            events.append({"event": "on_chat_model_start", "name": "ChatOpenAI", "metadata": meta(node, step),
+                           "data": {"input": {"messages": [[HumanMessage(content="prompt " * 2000)]]}}})
+            for i in range(tokens):
+                chunk = AIMessageChunk(content=f" tok{i}", id=f"run-{run_id}")
+                events.append({"event": "on_chat_model_stream", "name": "ChatOpenAI", "metadata": meta(node, step), "data": {"chunk": chunk}})
+            out = AIMessage(content="answer " * tokens, response_metadata={"model_name": "gpt-4o-mini", "finish_reason": "stop"},
+                            usage_metadata={"input_tokens": 9000, "output_tokens": tokens, "total_tokens": 9000 + tokens})
+            events.append({"event": "on_chat_model_end", "name": "ChatOpenAI", "metadata": meta(node, step),
+                           "data": {"output": out, "input": {"messages": [[HumanMessage(content="prompt")]]}}})
+        events.append({"event": "on_chain_end", "name": node, "metadata": meta(node, step), "data": {"input": state, "output": state}})
+    return events
+
+
+def bench(fn, events, rounds):
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for e in events:
+            fn(e)
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--tokens", type=int, default=400, help="stream chunks per LLM call")
+    p.add_argument("--rounds", type=int, default=10)
+    args = p.parse_args()
+
+    events = make_trace(args.tokens)
+    pairs = [(e.get("data"), e.get("metadata", {})) for e in events]
+
+    for data, metadata in pairs:
+        if serialize_for_json(data) != legacy_serialize_for_json(data) or serialize_for_json(metadata) != legacy_serialize_for_json(metadata):
+            print("MISMATCH: serializer output differs from the previous implementation")
+            sys.exit(1)
+        if json.loads(dumps(serialize_for_json(data))) != json.loads(json.dumps(legacy_serialize_for_json(data))):
+            print("MISMATCH: encoded bytes differ from json.dumps output")
+            sys.exit(1)
+
+    legacy = bench(lambda pair: (legacy_serialize_for_json(pair[0]), legacy_serialize_for_json(pair[1])), pairs, args.rounds)
+    new = bench(lambda pair: (serialize_for_json(pair[0]), serialize_for_json(pair[1])), pairs, args.rounds)
+    legacy_enc = bench(lambda pair: json.dumps([legacy_serialize_for_json(pair[0]), legacy_serialize_for_json(pair[1])]).encode(), pairs, args.rounds)
+    new_enc = bench(lambda pair: dumps([serialize_for_json(pair[0]), serialize_for_json(pair[1])]), pairs, args.rounds)
+
+    n = len(pairs)
+    print(f"{n} events, json backend: {'orjson' if orjson else 'stdlib json'}")
+    print(f"  serialize         legacy {n / legacy:10.0f} ev/s   new {n / new:10.0f} ev/s   {legacy / new:5.1f}x")
+    print(f"  serialize+encode  legacy {n / legacy_enc:10.0f} ev/s   new {n / new_enc:10.0f} ev/s   {legacy_enc / new_enc:5.1f}x")
+    print("  parity ok")
+
+
+if __name__ == "__main__":
+    main()
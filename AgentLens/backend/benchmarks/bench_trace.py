@@ -0,0 +1,82 @@
+"""Event-loop stall and latency of trace fetching against a fake LangSmith API.
+
+Run from backend/:  python -m benchmarks.bench_trace --runs 1000 --page-latency-ms 40
+
+Fetches one trace of `--runs` runs from fakes.langsmith.FakeLangSmithClient
+(which blocks `--page-latency-ms` per page of 100, like the real client) while
+a ticker task measures how long the event loop goes without running it.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from core.cache import DiskCache
+from fakes.langsmith import FakeLangSmithClient
+from services import langsmith_service
+
+
+async def baseline_fetch(client, run_id: str):
+    # Previous behavior: synchronous SDK calls inside the coroutine, full run dicts
+    runs = list(client.list_runs(project_name="agentlens", run_ids=[run_id], limit=1))
+    tree = list(client.list_runs(project_name="agentlens", trace_id=runs[0].trace_id, limit=100))
+    return [vars(r) for r in tree]
+
+
+async def measure(fn):
+    """Run `fn` while a 1 ms ticker records the worst gap between its ticks."""
+    worst = 0.0
+    stop = False
+
+    async def ticker():
+        nonlocal worst
+        last = time.perf_counter()
+        while not stop:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst = max(worst, now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    t0 = time.perf_counter()
+    result = await fn()
+    elapsed = time.perf_counter() - t0
+    stop = True
+    await task
+    return result, elapsed, worst
+
+
+async def run(args):
+    fake = FakeLangSmithClient(page_latency_s=args.page_latency_ms / 1000)
+    run_id = fake.add_trace(args.runs)
+    langsmith_service.set_client(fake)
+    langsmith_service.cache = DiskCache(os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+
+    base, base_s, base_stall = await measure(lambda: baseline_fetch(fake, run_id))
+    cold, cold_s, cold_stall = await measure(lambda: langsmith_service.fetch_trace(run_id))
+    warm, warm_s, warm_stall = await measure(lambda: langsmith_service.fetch_trace(run_id))
+    assert cold["complete"] and len(cold["runs"]) == args.runs, cold.get("error")
+    assert warm["runs"] == cold["runs"]
+
+    print(f"trace of {args.runs} runs, {args.page_latency_ms} ms per page of 100")
+    rows = [
+        (f"baseline (blocking, {len(base)} runs)", base_s, base_stall),
+        ("trace service, cold", cold_s, cold_stall),
+        ("trace service, cached", warm_s, warm_stall),
+    ]
+    for name, elapsed, stall in rows:
+        print(f"  {name:34s} {elapsed * 1000:8.1f} ms   worst loop stall {stall * 1000:7.1f} ms")
+    print(f"  payload per run: baseline {len(str(base[0]))} chars, projected {len(str(cold['runs'][0]))} chars")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--runs", type=int, default=1000)
+    p.add_argument("--page-latency-ms", type=float, default=40)
+    asyncio.run(run(p.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Load test: concurrent clients against the app, fully offline.
+
+Run from backend/:  python -m benchmarks.load_test --clients 8 --runs 32 --mode mixed
+
+Boots main.app under uvicorn (in a background thread) with local stand-ins:
+fakes.openai_stub for the LLM, fakes.web_stub for search and the pages it
+returns. `--clients` clients then run `--runs` research runs over /ws/run,
+/api/run-agent or both, and the harness reports runs/sec, run latency,
+event delivery latency (event "ts" to client receipt), server event-loop
+lag and memory per run. Results are written as JSON (default
+benchmarks/results/load-<commit>-<time>.json) for comparison across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p99": None, "max": None}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50": round(ordered[int(0.50 * (len(ordered) - 1))], 3),
+        "p99": round(ordered[int(0.99 * (len(ordered) - 1))], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        # Peak rather than current outside Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+class ServerThread:
+    """uvicorn serving the app on its own loop, with a lag ticker on that loop."""
+
+    def __init__(self, app, tick_s: float = 0.01):
+        import uvicorn
+
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+        self.tick_s = tick_s
+        self.lag_ms: List[float] = []
+        self.port: Optional[int] = None
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+
+    async def _ticker(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.tick_s)
+            self.lag_ms.append((time.perf_counter() - start - self.tick_s) * 1000)
+
+    async def _serve(self) -> None:
+        ticker = asyncio.create_task(self._ticker())
+        try:
+            await self.server.serve()
+        finally:
+            ticker.cancel()
+
+    def start(self) -> None:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("server failed to start")
+            time.sleep(0.01)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+class Results:
+    def __init__(self):
+        self.completed = {"ws": 0, "http": 0}
+        self.failed = {"ws": 0, "http": 0}
+        self.errors: List[str] = []
+        self.run_ms: List[float] = []
+        self.event_ms: List[float] = []
+        self.events = 0
+        self.dropped = 0
+
+
+async def ws_run(base: str, question: str, tenant: str, batch_ms: Optional[float], results: Results) -> None:
+    payload: Dict[str, Any] = {"question": question, "tenant": tenant}
+    if batch_ms is not None:
+        payload["batch_ms"] = batch_ms
+    async with websockets.connect(f"ws://{base}/ws/run", max_size=None) as ws:
+        await ws.send(json.dumps(payload))
+        final = False
+        async for frame in ws:
+            now = time.time()
+            msg = json.loads(frame)
+            if msg.get("type") == "error":
+                raise RuntimeError(msg.get("detail"))
+            if msg.get("type") == "batch":
+                events = msg["events"]
+                results.dropped += msg.get("dropped", 0)
+            else:
+                events = [msg]
+            for ev in events:
+                results.events += 1
+                results.event_ms.append((now - ev["ts"]) * 1000)
+                if ev["event"] == "on_chain_end" and ev.get("name") == "LangGraph":
+                    final = True
+    if not final:
+        raise RuntimeError("stream ended before the run's final event")
+
+
+async def http_run(client: httpx.AsyncClient, question: str, tenant: str) -> None:
+    r = await client.post("/api/run-agent", json={"question": question}, headers={"X-Tenant-Id": tenant})
+    r.raise_for_status()
+    if not (r.json().get("final_state") or {}).get("final"):
+        raise RuntimeError("run finished without a final answer")
+
+
+async def drive(port: int, args, results: Results) -> float:
+    base = f"127.0.0.1:{port}"
+    counter = iter(range(args.runs))
+
+    async with httpx.AsyncClient(base_url=f"http://{base}", timeout=None) as client:
+        async def client_loop(c: int) -> None:
+            tenant = f"tenant-{c % args.tenants}"
+            for i in counter:
+                mode = args.mode if args.mode != "mixed" else ("ws", "http")[i % 2]
+                # Distinct questions so no run is served from another's work
+                question = f"Load test question {i}: how do research agents use {['caching', 'streaming', 'retries', 'grounding'][i % 4]}?"
+                start = time.perf_counter()
+                try:
+                    if mode == "ws":
+                        await ws_run(base, question, tenant, args.batch_ms, results)
+                    else:
+                        await http_run(client, question, tenant)
+                except Exception as e:
+                    results.failed[mode] += 1
+                    results.errors.append(f"{mode}: {e!r}")
+                    continue
+                results.run_ms.append((time.perf_counter() - start) * 1000)
+                results.completed[mode] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(c) for c in range(args.clients)))
+        return time.perf_counter() - start
+
+
+def configure_env(args, llm_base_url: str, data_dir: str) -> None:
+    # Read by core.config at import, so set before anything imports it
+    os.environ.update({
+        "OPENAI_BASE_URL": llm_base_url,
+        "OPENAI_API_KEY": "stub",
+        "LANGSMITH_TRACING": "false",
+        "LANGCHAIN_TRACING_V2": "false",
+        "CACHE_ENABLED": "false",
+        "LLM_CACHE_ENABLED": "false",
+        "EVENT_STORE_PATH": os.path.join(data_dir, "events.sqlite"),
+        "RUN_WORKERS": str(args.workers or args.clients),
+        "RUN_QUEUE_MAX": str(max(args.runs, 100)),
+        "RUN_TENANT_LIMIT": str(args.workers or args.clients),
+    })
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    p.add_argument("--runs", type=int, default=32, help="total runs")
+    p.add_argument("--mode", choices=("ws", "http", "mixed"), default="mixed")
+    p.add_argument("--tenants", type=int, default=1, help="clients are spread over this many tenants")
+    p.add_argument("--workers", type=int, default=0, help="RUN_WORKERS (default: --clients)")
+    p.add_argument("--batch-ms", type=float, default=None, help="websocket batch window (default: server's)")
+    p.add_argument("--llm-latency-ms", type=float, default=200)
+    p.add_argument("--search-latency-ms", type=float, default=100)
+    p.add_argument("--search-results", type=int, default=5)
+    p.add_argument("--page-latency-ms", type=float, default=30)
+    p.add_argument("--page-kb", type=int, default=64)
+    p.add_argument("--warmup", type=int, default=1, help="runs before measuring (not counted)")
+    p.add_argument("--out", default=None, help="results JSON path")
+    args = p.parse_args()
+    if args.mode != "http" and websockets is None:
+        raise SystemExit("websocket clients need the `websockets` package (or use --mode http)")
+
+    from fakes.openai_stub import start_stub
+
+    llm_server, llm_base_url, llm_stats = start_stub(args.llm_latency_ms / 1000)
+    configure_env(args, llm_base_url, tempfile.mkdtemp(prefix="agentlens-load-"))
+
+    # Everything below imports core.config, so only now
+    from fakes.web_stub import make_search, start_pages
+    from agents.nodes import researcher
+    import main as app_module
+
+    page_server, page_base_url, page_stats = start_pages(args.page_kb, args.page_latency_ms / 1000)
+    researcher.search_web = make_search(page_base_url, args.search_results, args.search_latency_ms / 1000, stats=page_stats)
+    server = ServerThread(app_module.app)
+    server.start()
+
+    if args.warmup:
+        warm = argparse.Namespace(**{**vars(args), "runs": args.warmup, "clients": 1, "mode": "http"})
+        asyncio.run(drive(server.port, warm, Results()))
+    server.lag_ms.clear()
+    llm_before, pages_before, searches_before = llm_stats.requests, page_stats.requests, page_stats.searches
+    rss_before = rss_mb()
+
+    results = Results()
+    elapsed = asyncio.run(drive(server.port, args, results))
+    rss_after = rss_mb()
+    server.stop()
+    llm_server.shutdown()
+    page_server.shutdown()
+
+    completed = sum(results.completed.values())
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "runs": {"completed": results.completed, "failed": results.failed, "errors": results.errors[:20]},
+        "duration_s": round(elapsed, 3),
+        "runs_per_s": round(completed / elapsed, 3) if elapsed else None,
+        "run_latency_ms": percentiles(results.run_ms),
+        "event_delivery_ms": percentiles(results.event_ms),
+        "events": {"received": results.events, "dropped": results.dropped},
+        "loop_lag_ms": percentiles(server.lag_ms),
+        "memory": {
+            "rss_before_mb": round(rss_before, 1),
+            "rss_after_mb": round(rss_after, 1),
+            "per_run_kb": round((rss_after - rss_before) * 1024 / completed, 1) if completed else None,
+        },
+        "backends": {
+            "llm_requests": llm_stats.requests - llm_before,
+            "searches": page_stats.searches - searches_before,
+            "page_fetches": page_stats.requests - pages_before,
+        },
+    }
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"load-{report['commit'] or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+
+    print(f"{completed}/{args.runs} runs in {elapsed:.2f}s ({report['runs_per_s']} runs/s), {args.clients} clients, mode {args.mode}")
+    for name in ("run_latency_ms", "event_delivery_ms", "loop_lag_ms"):
+        q = report[name]
+        print(f"  {name:18s} p50 {q['p50']}  p99 {q['p99']}  max {q['max']}  (n={q['count']})")
+    print(f"  memory per run     {report['memory']['per_run_kb']} KB (rss {rss_before:.0f} -> {rss_after:.0f} MB)")
+    if results.errors:
+        print(f"  {len(results.errors)} failed, e.g. {results.errors[0]}")
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
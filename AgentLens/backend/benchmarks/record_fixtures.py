@@ -0,0 +1,85 @@
+"""Record the trace and run-state fixtures used by benchmarks.bench_micro.
+
+Run from backend/:  python -m benchmarks.record_fixtures
+
+Runs the research graph offline (fakes.openai_stub, fakes.web_stub) and
+saves:
+  fixtures/traces/research_run.json.gz  raw astream_events v2 steps of one
+                                        run, LangChain objects included
+                                        (langchain_core.load format)
+  fixtures/states/run_states.json.gz    final states of a few runs, both
+                                        extraction modes
+
+Re-record only when the graph's event shape changes on purpose; the
+baseline in benchmarks/baseline.json is tied to these files.
+"""
+import asyncio
+import gzip
+import json
+import os
+from pathlib import Path
+
+FIXTURES = Path(__file__).parent / "fixtures"
+TRACE_PATH = FIXTURES / "traces" / "research_run.json.gz"
+STATES_PATH = FIXTURES / "states" / "run_states.json.gz"
+PAGES_PORT = 8765
+
+QUESTIONS = [
+    ("What is LangGraph and how does it manage agent state?", "single"),
+    ("How do research agents ground their answers in sources?", "single"),
+    ("Why do streaming LLM responses reduce perceived latency?", "map_reduce"),
+    ("What are the trade-offs of caching search results?", "map_reduce"),
+]
+
+
+def write_json_gz(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # mtime=0 keeps re-recorded files byte-identical when nothing changed
+    with open(path, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        gz.write(json.dumps(data, sort_keys=True).encode("utf-8"))
+
+
+async def record() -> None:
+    from langchain_core.load import dumpd
+    from agents.research_graph import build_graph, is_final_event
+
+    graph = build_graph()
+    trace = None
+    states = []
+    for question, mode in QUESTIONS:
+        initial = {"question": question, "queries": [], "documents": [], "notes": [], "extraction_mode": mode}
+        steps = [step async for step in graph.astream_events(initial, version="v2")]
+        if trace is None:
+            trace = steps
+        final = next(s for s in reversed(steps) if is_final_event(s))
+        states.append(final["data"]["output"])
+    write_json_gz(TRACE_PATH, dumpd(trace))
+    write_json_gz(STATES_PATH, dumpd(states))
+    print(f"{len(trace)} trace events -> {TRACE_PATH}")
+    print(f"{len(states)} run states -> {STATES_PATH}")
+
+
+def main():
+    from fakes.openai_stub import start_stub
+
+    _, base_url, _ = start_stub()
+    os.environ.update({
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_KEY": "stub",
+        "LANGSMITH_TRACING": "false",
+        "CACHE_ENABLED": "false",
+        "LLM_CACHE_ENABLED": "false",
+        "EVENT_STORE_ENABLED": "false",
+    })
+    # Imported after the environment is set: these load core.config
+    from fakes.web_stub import make_search, start_pages
+    from agents.nodes import researcher
+
+    # A fixed port, so recorded URLs don't change between recordings
+    _, pages_url, _ = start_pages(page_kb=32, port=PAGES_PORT)
+    researcher.search_web = make_search(pages_url)
+    asyncio.run(record())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Cold-start report: where import time goes and how soon the app serves.
+
+Run from backend/:  python -m benchmarks.startup [--budget-ms 1500] [--repeats 3]
+
+Every measurement runs in a fresh interpreter:
+  import   `python -X importtime -c "import main"`: total import time, the
+           slowest modules (cumulative) and time by top-level package (self)
+  serve    uvicorn serving main:app: process start until the first request
+           succeeds ("ready"), and until the background warmup finished
+           ("warm", from agentlens_warmup_seconds in /metrics)
+It exits 1 when the median time to ready is over `--budget-ms`, or when
+`import main` loads one of LAZY_MODULES, which must only load on first use
+or during warmup.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND = Path(__file__).parent.parent
+LAZY_MODULES = ("langchain_core", "langchain_openai", "langchain_community", "langgraph", "openai", "bs4")
+READY_PATH = "/api/scheduler/stats"
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def child_env(data_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "LANGSMITH_TRACING": "false",
+        "EVENT_STORE_PATH": os.path.join(data_dir, "events.sqlite"),
+        "CACHE_PATH": os.path.join(data_dir, "cache.sqlite"),
+        "STARTUP_WARMUP": "background",
+        "METRICS_ENABLED": "true",
+    })
+    # Warmup builds the model client, which wants a key; nothing is called
+    env.setdefault("OPENAI_API_KEY", "startup-report")
+    return env
+
+
+def import_profile(env: Dict[str, str]) -> List[Tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, depth) for every module `import main` loads."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        m = _IMPORT_LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def warmup_seconds(client: httpx.Client) -> Optional[float]:
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith("agentlens_warmup_seconds "):
+            return float(line.split()[1])
+    return None
+
+
+def serve_profile(env: Dict[str, str], timeout_s: float) -> Dict[str, Optional[float]]:
+    """Start the server and time it to first response, then to warm."""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    ready_ms = warm_ms = warmup_s = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while ready_ms is None and time.perf_counter() - start < timeout_s:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited with {proc.returncode}")
+                try:
+                    if client.get(READY_PATH).status_code == 200:
+                        ready_ms = (time.perf_counter() - start) * 1000
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+            while ready_ms is not None and time.perf_counter() - start < timeout_s:
+                warmup_s = warmup_seconds(client)
+                if warmup_s is not None:
+                    warm_ms = (time.perf_counter() - start) * 1000
+                    break
+                time.sleep(0.05)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {"ready_ms": ready_ms, "warm_ms": warm_ms, "warmup_ms": warmup_s * 1000 if warmup_s is not None else None}
+
+
+def median(values: List[Optional[float]]) -> Optional[float]:
+    present = [v for v in values if v is not None]
+    return round(statistics.median(present), 1) if present else None
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--budget-ms", type=float, default=1500, help="max median time from process start to first response")
+    p.add_argument("--repeats", type=int, default=3)
+    p.add_argument("--top", type=int, default=15, help="modules / packages to list")
+    p.add_argument("--timeout", type=float, default=120, help="seconds to wait for ready and warm")
+    p.add_argument("--json", type=Path, default=None, help="also write results here")
+    args = p.parse_args()
+
+    env = child_env(tempfile.mkdtemp(prefix="agentlens-startup-"))
+    profiles = [import_profile(env) for _ in range(args.repeats)]
+    # The fastest run has the least scheduling noise in it
+    rows = min(profiles, key=lambda r: next((c for name, _, c, _ in r if name == "main"), 0))
+    import_ms = next(c for name, _, c, _ in rows if name == "main") / 1000
+    by_package: Dict[str, int] = {}
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] = by_package.get(name.split(".")[0], 0) + self_us
+    slowest = sorted((r for r in rows if r[0] != "main"), key=lambda r: -r[2])[:args.top]
+    eager = sorted({name.split(".")[0] for name, *_ in rows} & set(LAZY_MODULES))
+
+    print(f"import main: {import_ms:.0f} ms, {len(rows)} modules")
+    print(f"\n{'package (self time)':40s} {'ms':>8s}")
+    for pkg, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{pkg:40s} {us / 1000:8.1f}")
+    print(f"\n{'module (cumulative)':40s} {'ms':>8s}")
+    for name, _, cumulative, depth in slowest:
+        print(f"{'  ' * min(depth, 4) + name:40s} {cumulative / 1000:8.1f}")
+
+    serves = [serve_profile(env, args.timeout) for _ in range(args.repeats)]
+    report: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "import_ms": round(import_ms, 1),
+        "ready_ms": median([s["ready_ms"] for s in serves]),
+        "warm_ms": median([s["warm_ms"] for s in serves]),
+        "warmup_ms": median([s["warmup_ms"] for s in serves]),
+        "budget_ms": args.budget_ms,
+        "packages_ms": {pkg: round(us / 1000, 1) for pkg, us in by_package.items()},
+        "eager_lazy_modules": eager,
+    }
+    print(f"\nserving after {report['ready_ms']} ms, warm after {report['warm_ms']} ms "
+          f"(warmup {report['warmup_ms']} ms; median of {args.repeats})")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    failures = []
+    if report["ready_ms"] is None or report["ready_ms"] > args.budget_ms:
+        failures.append(f"time to ready {report['ready_ms']} ms is over the {args.budget_ms:.0f} ms budget")
+    if eager:
+        failures.append(f"`import main` loads {', '.join(eager)}; these should load on first use or in warmup")
+    if failures:
+        print()
+        for why in failures:
+            print(f"FAIL: {why}")
+        sys.exit(1)
+    print(f"Within the {args.budget_ms:.0f} ms cold-start budget")
+
+
+if __name__ == "__main__":
+    main()
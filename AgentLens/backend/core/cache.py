@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from core.config import CACHE_ENABLED, CACHE_PATH, CACHE_MAX_BYTES
+
+log = logging.getLogger(__name__)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def canonical_url(url: str) -> str:
+    """Canonical form for cache keys: lowercase host, no fragment, default port,
+    tracking params, and sorted query string."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    params = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_")
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(params), ""))
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one in-flight call.
+
+    The call runs in a task owned by the flight, not by whichever caller
+    started it: a caller that is cancelled (a timeout, a closed run) only
+    stops waiting. The task is cancelled once no caller is left waiting.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Flight] = {}
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = self._calls[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda task: self._done(key, flight))
+        else:
+            self.shared += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # The last caller gave up; later callers start a fresh call
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _done(self, key: str, flight: _Flight) -> None:
+        self._forget(key, flight)
+        # Mark retrieved so waiter-less failures don't log "never retrieved"
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+
+class DiskCache:
+    """SQLite-backed TTL cache with LRU eviction under a total size cap.
+
+    Values are JSON-encoded and zlib-compressed. Blocking SQLite calls run in a
+    worker thread when used through the async API.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self.flight = SingleFlight()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _count(self, namespace: str, field: str, n: int = 1) -> None:
+        ns = self.stats.setdefault(namespace, {"hits": 0, "misses": 0, "sets": 0, "evictions": 0})
+        ns[field] = ns.get(field, 0) + n
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        full_key = f"{namespace}:{key}"
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, size, expires_at FROM entries WHERE key = ?", (full_key,)).fetchone()
+            if row is None:
+                self._count(namespace, "misses")
+                return None
+            value, size, expires_at = row
+            if expires_at <= now:
+                db.execute("DELETE FROM entries WHERE key = ?", (full_key,))
+                self._total_bytes -= size
+                self._count(namespace, "misses")
+                return None
+            db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, full_key))
+            self._count(namespace, "hits")
+        return json.loads(zlib.decompress(value))
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        full_key = f"{namespace}:{key}"
+        blob = zlib.compress(json.dumps(value).encode("utf-8"), 6)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            old = db.execute("SELECT size FROM entries WHERE key = ?", (full_key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (full_key, blob, len(blob), now + ttl, now),
+            )
+            self._total_bytes += len(blob) - (old[0] if old else 0)
+            self._count(namespace, "sets")
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        db = self._conn
+        now = time.time()
+        # Expired entries go first, then least recently used down to 90% of the cap
+        freed = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE expires_at <= ?", (now,)).fetchone()[0]
+        db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        self._total_bytes -= freed
+        target = int(self.max_bytes * 0.9)
+        if self._total_bytes <= target:
+            return
+        victims = []
+        excess = self._total_bytes - target
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            self._total_bytes -= size
+            self._count(key.split(":", 1)[0], "evictions")
+            if excess <= 0:
+                break
+        db.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    async def aget(self, namespace: str, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, namespace, key)
+
+    async def aset(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self.set, namespace, key, value, ttl)
+
+    async def get_or_fetch(
+        self,
+        namespace: str,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: float,
+    ) -> Any:
+        """Return the cached value or run `fetch` once for all concurrent callers.
+
+        Empty results (falsy values) are returned but not cached, so transient
+        failures are retried on the next call.
+        """
+        if not CACHE_ENABLED:
+            return await fetch()
+
+        async def load():
+            try:
+                cached = await self.aget(namespace, key)
+            except (ValueError, zlib.error, sqlite3.Error) as e:
+                log.warning("Cache read failed", extra={"namespace": namespace, "key": key, "error": str(e)})
+                cached = None
+            if cached is not None:
+                return cached
+            value = await fetch()
+            if value:
+                try:
+                    await self.aset(namespace, key, value, ttl)
+                except (TypeError, ValueError, sqlite3.Error) as e:
+                    log.warning("Cache write failed", extra={"namespace": namespace, "key": key, "error": str(e)})
+            return value
+
+        return await self.flight.do(f"{namespace}:{key}", load)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._db()
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            namespaces = {}
+            for ns, counts in self.stats.items():
+                lookups = counts["hits"] + counts["misses"]
+                namespaces[ns] = {**counts, "hit_rate": counts["hits"] / lookups if lookups else 0.0}
+            return {
+                "enabled": CACHE_ENABLED,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "singleflight_shared": self.flight.shared,
+                "namespaces": namespaces,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+cache = DiskCache()
@@ -2,13 +2,16 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 
-# Ensure .env is loaded (in case it wasn't loaded before this module)
+# Ensure .env is loaded (in case it wasn't loaded before this module);
+# variables already set in the process environment take precedence
 backend_dir = Path(__file__).parent.parent
 env_path = backend_dir / ".env"
-load_dotenv(dotenv_path=env_path, override=True)
+load_dotenv(dotenv_path=env_path)
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Any OpenAI-compatible endpoint (e.g. fakes/openai_stub.py for local testing)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 
 # Strip any whitespace from the API key
 if OPENAI_API_KEY:
@@ -17,5 +20,116 @@ if OPENAI_API_KEY:
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")  # strongly recommended
 USE_TAVILY = bool(TAVILY_API_KEY)
 
+# Search fan-out: queries run concurrently, each bounded by a timeout
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "4"))
+SEARCH_TIMEOUT_S = float(os.getenv("SEARCH_TIMEOUT_S", "15"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "5"))
+
+# Note extraction: sources are chunked, ranked against the question (BM25) and
+# packed into this many prompt tokens (0 sends every document whole)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_CHUNK_CHARS = int(os.getenv("CONTEXT_CHUNK_CHARS", "800"))
+
+# Note extraction mode per run unless the request picks one: "single" (one call
+# over all sources) or "map_reduce" (one call per source, merged locally)
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "single")
+EXTRACTION_CONCURRENCY = int(os.getenv("EXTRACTION_CONCURRENCY", "4"))
+EXTRACTION_TIMEOUT_S = float(os.getenv("EXTRACTION_TIMEOUT_S", "30"))
+EXTRACTION_MAP_TOKEN_BUDGET = int(os.getenv("EXTRACTION_MAP_TOKEN_BUDGET", "1000"))
+
+# Grounding: cited sentences whose support by their source (0..1, share of
+# idf-weighted terms found in it) falls below this are flagged
+GROUNDING_MIN_SUPPORT = float(os.getenv("GROUNDING_MIN_SUPPORT", "0.3"))
+
+# Batch drift scoring: states scored per array pass (and per streamed chunk)
+DRIFT_BATCH_SIZE = int(os.getenv("DRIFT_BATCH_SIZE", "1000"))
+
+# Verifier -> researcher retries stop at whichever budget runs out first;
+# the best draft so far becomes the final answer (0 disables the time/token budgets)
+MAX_RESEARCH_RETRIES = int(os.getenv("MAX_RESEARCH_RETRIES", "2"))
+RUN_TIME_BUDGET_S = float(os.getenv("RUN_TIME_BUDGET_S", "120"))
+RUN_TOKEN_BUDGET = int(os.getenv("RUN_TOKEN_BUDGET", "60000"))
+
+# Page fetching: one pooled client for the app lifetime
+FETCH_TIMEOUT_S = float(os.getenv("FETCH_TIMEOUT_S", "10"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "50"))
+FETCH_MAX_PER_HOST = int(os.getenv("FETCH_MAX_PER_HOST", "4"))
+FETCH_HTTP2 = os.getenv("FETCH_HTTP2", "false").lower() in ("1", "true", "yes")
+# Stop reading a body after max_chars * FETCH_BYTES_PER_CHAR bytes (HTML is mostly markup)
+FETCH_BYTES_PER_CHAR = int(os.getenv("FETCH_BYTES_PER_CHAR", "64"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+# Event stream: send a full state snapshot every N node ends and JSON Patch
+# deltas in between (1 = full snapshot on every node end)
+SNAPSHOT_KEYFRAME_INTERVAL = int(os.getenv("SNAPSHOT_KEYFRAME_INTERVAL", "8"))
+# Websocket channel: high-rate events (token chunks) are coalesced into one
+# frame per window; past WS_MAX_QUEUED_FRAMES unsent frames they are dropped
+WS_BATCH_WINDOW_MS = float(os.getenv("WS_BATCH_WINDOW_MS", "50"))
+WS_BATCH_MAX_EVENTS = int(os.getenv("WS_BATCH_MAX_EVENTS", "200"))
+WS_MAX_QUEUED_FRAMES = int(os.getenv("WS_MAX_QUEUED_FRAMES", "256"))
+# A client this far behind (unsent frames, or bytes) is closed with 1013
+WS_CLOSE_QUEUED_FRAMES = int(os.getenv("WS_CLOSE_QUEUED_FRAMES", "1024"))
+WS_CLOSE_QUEUED_BYTES = int(os.getenv("WS_CLOSE_QUEUED_BYTES", str(16 * 1024 * 1024)))
+# Live run hub: recent events kept per run for viewers attaching mid-run
+# (older ones are read back from the event store)
+RUN_HUB_BUFFER_EVENTS = int(os.getenv("RUN_HUB_BUFFER_EVENTS", "2000"))
+
+# HTML text extraction engine: "stream" (incremental, stops early) or "bs4"
+HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "stream")
+
+# Local on-disk cache for search results and fetched page text
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_PATH = os.getenv("CACHE_PATH", str(backend_dir / ".cache" / "agentlens_cache.sqlite"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+SEARCH_CACHE_TTL_S = float(os.getenv("SEARCH_CACHE_TTL_S", str(6 * 3600)))
+PAGE_CACHE_TTL_S = float(os.getenv("PAGE_CACHE_TTL_S", str(24 * 3600)))
+# Exact-match LLM response cache (same store; keyed on model, temperature, prompt hash)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(24 * 3600)))
+
+# Run scheduler: runs executing at once, runs waiting (beyond that: 429),
+# runs executing at once per tenant
+RUN_WORKERS = int(os.getenv("RUN_WORKERS", "4"))
+RUN_QUEUE_MAX = int(os.getenv("RUN_QUEUE_MAX", "100"))
+RUN_TENANT_LIMIT = int(os.getenv("RUN_TENANT_LIMIT", "2"))
+
+# Local append-only store of every streamed run event (replay / analysis)
+EVENT_STORE_ENABLED = os.getenv("EVENT_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+EVENT_STORE_PATH = os.getenv("EVENT_STORE_PATH", str(backend_dir / ".data" / "agentlens_events.sqlite"))
+EVENT_STORE_BATCH_SIZE = int(os.getenv("EVENT_STORE_BATCH_SIZE", "256"))
+EVENT_STORE_FLUSH_MS = float(os.getenv("EVENT_STORE_FLUSH_MS", "200"))
+# Queued writes past which runs wait for the writer to catch up
+EVENT_STORE_MAX_PENDING = int(os.getenv("EVENT_STORE_MAX_PENDING", "10000"))
+# Runs older than this are deleted (0 = keep forever)
+EVENT_STORE_RETENTION_DAYS = float(os.getenv("EVENT_STORE_RETENTION_DAYS", "30"))
+# Finished runs older than this lose their token-level stream events (0 = never)
+EVENT_STORE_COMPACT_AFTER_H = float(os.getenv("EVENT_STORE_COMPACT_AFTER_H", "24"))
+
+# Durable graph checkpoints (the state after every node), so failed or
+# interrupted runs can be resumed and any step forked: SQLite file, values
+# at least this big stored compressed, threads kept this many days (0 = forever)
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "false").lower() in ("1", "true", "yes")
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", str(backend_dir / ".data" / "agentlens_checkpoints.sqlite"))
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "1024"))
+CHECKPOINT_RETENTION_DAYS = float(os.getenv("CHECKPOINT_RETENTION_DAYS", "30"))
+
 LANGSMITH_PROJECT = os.getenv("LANGSMITH_PROJECT", "agentlens")
+# Trace fetching: runs per page, cap per trace, cache lifetime of finished traces
+TRACE_PAGE_SIZE = int(os.getenv("TRACE_PAGE_SIZE", "100"))
+TRACE_MAX_RUNS = int(os.getenv("TRACE_MAX_RUNS", "5000"))
+TRACE_CACHE_TTL_S = float(os.getenv("TRACE_CACHE_TTL_S", "3600"))
+
+
+# Logs: level, and "json" (one object per line) or "text"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Prometheus metrics at GET /metrics; event-loop lag sampled every N ms (0 = off)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+
+# Loading the graph, model client and search/parsing libraries: "background"
+# (after the server starts accepting connections), "eager" (before) or
+# "lazy" (on the first run that needs them)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background").lower()
 
+# Version tag for the compiled research graph served by the graph registry
+RESEARCH_GRAPH_VERSION = os.getenv("RESEARCH_GRAPH_VERSION", "v1")
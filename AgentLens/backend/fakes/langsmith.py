@@ -0,0 +1,93 @@
+"""In-memory stand-in for the parts of the LangSmith API AgentLens reads.
+
+    from fakes.langsmith import FakeLangSmithClient
+    from services import langsmith_service
+
+    fake = FakeLangSmithClient(page_latency_s=0.05)
+    run_id = fake.add_trace(n_runs=500)
+    langsmith_service.set_client(fake)
+
+`list_runs` pages like the real client: it blocks for `page_latency_s`
+before each page of `page_size` runs, and only returns selected fields.
+"""
+import datetime
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+
+class FakeLangSmithClient:
+    def __init__(self, page_size: int = 100, page_latency_s: float = 0.0):
+        self.page_size = page_size
+        self.page_latency_s = page_latency_s
+        self.runs: List[Dict[str, Any]] = []
+        self.calls = 0
+        self.pages_served = 0
+
+    def add_trace(self, n_runs: int = 10, complete: bool = True, project: str = "agentlens") -> str:
+        """Add a trace of `n_runs` runs (root first) and return the root run id."""
+        root_id = uuid.uuid4()
+        start = datetime.datetime.now(datetime.timezone.utc)
+        for i in range(n_runs):
+            run_id = root_id if i == 0 else uuid.uuid4()
+            # The root (and, for an unfinished trace, the last run) is still open
+            done = complete or (i != 0 and i != n_runs - 1)
+            self.runs.append({
+                "id": run_id,
+                "name": "LangGraph" if i == 0 else f"step_{i}",
+                "run_type": "chain" if i % 3 else "llm",
+                "status": "success" if done else "pending",
+                "error": None,
+                "parent_run_id": None if i == 0 else root_id,
+                "trace_id": root_id,
+                "dotted_order": f"{i:08d}",
+                "start_time": start + datetime.timedelta(milliseconds=i),
+                "end_time": start + datetime.timedelta(milliseconds=i + 5) if done else None,
+                "total_tokens": 0 if i % 3 else 120,
+                "prompt_tokens": 0 if i % 3 else 100,
+                "completion_tokens": 0 if i % 3 else 20,
+                "total_cost": None,
+                "project": project,
+                # heavy fields the real API also returns unless projected away
+                "inputs": {"payload": "x" * 2000},
+                "outputs": {"payload": "y" * 2000},
+                "events": [{"name": "start"}] * 20,
+            })
+        return str(root_id)
+
+    def finish(self, trace_id: str) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for r in self.runs:
+            if str(r["trace_id"]) == trace_id and r["end_time"] is None:
+                r["status"], r["end_time"] = "success", now
+
+    def list_runs(
+        self,
+        *,
+        project_name: Optional[str] = None,
+        trace_id: Optional[Any] = None,
+        run_ids: Optional[Sequence[Any]] = None,
+        select: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        **kwargs: Any,
+    ) -> Iterator[SimpleNamespace]:
+        self.calls += 1
+        wanted = {str(r) for r in run_ids} if run_ids else None
+        matches = [
+            r for r in self.runs
+            if (project_name is None or r["project"] == project_name)
+            and (trace_id is None or str(r["trace_id"]) == str(trace_id))
+            and (wanted is None or str(r["id"]) in wanted)
+        ]
+        if limit is not None:
+            matches = matches[:limit]
+        return self._paginate(matches, select)
+
+    def _paginate(self, matches: List[Dict[str, Any]], select: Optional[Sequence[str]]) -> Iterator[SimpleNamespace]:
+        for i, r in enumerate(matches):
+            if i % self.page_size == 0:
+                time.sleep(self.page_latency_s)
+                self.pages_served += 1
+            fields = select or [k for k in r if k != "project"]
+            yield SimpleNamespace(**{f: r.get(f) for f in fields})
@@ -0,0 +1,155 @@
+"""Local OpenAI-compatible chat completions endpoint for offline runs and tests.
+
+    python -m fakes.openai_stub --port 8001 --latency-ms 200
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub uvicorn main:app
+
+Replies are deterministic: one bullet per URL found in the prompt, quoting
+that source and ending in "(source: URL)", so the research graph can run
+end to end and pass verification.
+Supports streaming (SSE) and reports token usage like the real API.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+_URL = re.compile(r"https?://[^\s\)]+")
+
+
+_EXCERPT_WORDS = 16
+
+
+def _excerpt(prompt: str, url: str) -> str:
+    # Quote the source's own words, so the reply is grounded in it: its
+    # CONTENT block (extraction prompts) or a note citing it (synthesis)
+    marker = f"URL: {url}\nCONTENT:\n"
+    i = prompt.find(marker)
+    if i >= 0:
+        words = prompt[i + len(marker):].split()[:_EXCERPT_WORDS]
+    else:
+        words = []
+        for line in prompt.splitlines():
+            if f"(source: {url})" in line:
+                words = line.replace(f"(source: {url})", "").lstrip("-* ").split()[:_EXCERPT_WORDS]
+                break
+    text = " ".join(words).rstrip(".")
+    return text or "the source describes this aspect of the question in detail, with supporting context and examples"
+
+
+def reply_for(prompt: str) -> str:
+    urls = list(dict.fromkeys(_URL.findall(prompt)))[:10] or ["https://example.com/stub"]
+    lines = [f"- {_excerpt(prompt, url)}. (source: {url})" for url in urls]
+    return "\n".join(lines)
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, list):
+            content = " ".join(c.get("text", "") for c in content if isinstance(c, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class StubStats:
+    def __init__(self):
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def start_stub(latency_s: float = 0.0, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str, StubStats]:
+    """Serve the stub in a background thread; returns (server, base_url, stats)."""
+    stats = StubStats()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            with stats.lock:
+                stats.requests += 1
+            time.sleep(latency_s)
+            prompt = _prompt_text(body.get("messages") or [])
+            text = reply_for(prompt)
+            model = body.get("model") or "stub"
+            usage = {
+                "prompt_tokens": _tokens(prompt),
+                "completion_tokens": _tokens(text),
+                "total_tokens": _tokens(prompt) + _tokens(text),
+            }
+            if body.get("stream"):
+                self._stream(model, text, usage if (body.get("stream_options") or {}).get("include_usage") else None)
+            else:
+                self._json(200, {
+                    "id": f"chatcmpl-stub-{stats.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+
+        def _json(self, status: int, payload: Dict[str, Any]):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, model: str, text: str, usage: Optional[Dict[str, int]]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+            words = re.findall(r"\S+\s*", text)
+            for i, word in enumerate(words):
+                delta = {"role": "assistant", "content": word} if i == 0 else {"content": word}
+                self._event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            self._event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if usage is not None:
+                self._event({**base, "choices": [], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _event(self, payload: Dict[str, Any]):
+            self.wfile.write(b"data: " + json.dumps(payload).encode() + b"\n\n")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1", stats
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8001)
+    p.add_argument("--latency-ms", type=float, default=0)
+    args = p.parse_args()
+    server, base_url, _ = start_stub(args.latency_ms / 1000, args.host, args.port)
+    print(f"OpenAI-compatible stub at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
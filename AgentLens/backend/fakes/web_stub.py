@@ -0,0 +1,143 @@
+"""Local stand-ins for web search and the pages it points to, for offline runs.
+
+    from fakes.web_stub import start_pages, make_search
+    from agents.nodes import researcher
+
+    server, base_url, stats = start_pages(page_kb=64, latency_s=0.03)
+    researcher.search_web = make_search(base_url, latency_s=0.1)
+
+Search results are deterministic per query (URLs derive from a hash of the
+query) and point at the page server, so fetches go through the real
+PageFetcher. Pages are HTML of roughly `page_kb` KB mixing text, markup
+and scripts.
+"""
+import asyncio
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from agents.nodes.search import _normalize_tavily, search_all
+
+_WORDS = (
+    "agent graph state node research source answer model token stream event "
+    "search fetch verify draft citation latency cache budget retry context"
+).split()
+
+
+def make_page(n: int, kb: int) -> bytes:
+    body = []
+    size = 0
+    i = 0
+    while size < kb * 1024:
+        if i % 5 == 4:
+            part = "<script>var x = " + "1" * 200 + ";</script>\n"
+        else:
+            words = " ".join(_WORDS[(n + i + j) % len(_WORDS)] for j in range(40))
+            part = f"<p>Page {n} paragraph {i}: {words}.</p>\n"
+        body.append(part)
+        size += len(part)
+        i += 1
+    return (f"<html><head><title>Page {n}</title></head><body>" + "".join(body) + "</body></html>").encode()
+
+
+class PageStats:
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.searches = 0
+        # Requests being served right now, and the most seen at once (per Host header)
+        self.active: Dict[str, int] = {}
+        self.peak: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def peak_total(self) -> int:
+        return self.peak.get("*", 0)
+
+
+def start_pages(page_kb: int = 64, latency_s: float = 0.0, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str, PageStats]:
+    """Serve /page/<n> in a background thread; returns (server, base_url, stats).
+
+    `/page/<n>?delay=<s>` waits `s` seconds instead of `latency_s`.
+    """
+    stats = PageStats()
+    pages: Dict[int, bytes] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            params = dict(p.split("=", 1) for p in query.split("&") if "=" in p)
+            host = self.headers.get("Host", "")
+            with stats.lock:
+                for key in (host, "*"):
+                    stats.active[key] = stats.active.get(key, 0) + 1
+                    stats.peak[key] = max(stats.peak.get(key, 0), stats.active[key])
+            try:
+                time.sleep(float(params.get("delay", latency_s)))
+            finally:
+                with stats.lock:
+                    for key in (host, "*"):
+                        stats.active[key] -= 1
+            try:
+                n = int(path.rstrip("/").rsplit("/", 1)[-1])
+            except ValueError:
+                n = 0
+            page = pages.get(n)
+            if page is None:
+                page = pages[n] = make_page(n, page_kb)
+            with stats.lock:
+                stats.requests += 1
+                stats.bytes += len(page)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            try:
+                self.wfile.write(page)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}", stats
+
+
+def make_search(
+    base_url: str,
+    results: int = 5,
+    latency_s: float = 0.0,
+    pages: int = 1000,
+    stats: Optional[PageStats] = None,
+) -> Callable[[List[str]], Awaitable[List[Dict[str, Any]]]]:
+    """A drop-in for agents.nodes.search.search_web backed by the page server.
+
+    Queries fan out through the same search_all as the real providers.
+    """
+    async def one(q: str) -> List[Dict[str, Any]]:
+        if stats is not None:
+            with stats.lock:
+                stats.searches += 1
+        await asyncio.sleep(latency_s)
+        seed = zlib.crc32(q.encode())
+        out = []
+        for i in range(results):
+            n = (seed + i * 7919) % pages
+            out.append({
+                "url": f"{base_url}/page/{n}",
+                "title": f"Page {n}",
+                # No "content" (unlike Tavily), so the researcher fetches the page
+                "snippet": f"Result {i} for {q}: " + " ".join(_WORDS[(n + j) % len(_WORDS)] for j in range(30)),
+            })
+        return out
+
+    async def search_web(queries: List[str]) -> List[Dict[str, Any]]:
+        return await search_all(one, queries, _normalize_tavily, "stub")
+
+    return search_web
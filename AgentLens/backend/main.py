@@ -1,4 +1,10 @@
+import asyncio
+import importlib
+import logging
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
@@ -19,8 +25,74 @@ os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
 from api.routes import router as api_router
 from api.websocket import ws_router
 from api.graph_schema import router as graph_schema_router
+from agents.llm import llm_gateway
+from agents.registry import get_graph
+from agents.nodes.utils import page_fetcher
+from core.cache import cache
+from core.config import CHECKPOINTS_ENABLED, METRICS_ENABLED, STARTUP_WARMUP
+from core.logging import configure_logging, shutdown_logging
+from core.metrics import loop_lag_monitor, metrics
+from services.event_store import event_store
+from services.analytics_service import init_fleet_analytics
+from services.scheduler import run_scheduler
 
-app = FastAPI(title="AgentLens API")
+log = logging.getLogger("agentlens")
+
+WARMUP_SECONDS = metrics.gauge("agentlens_warmup_seconds", "How long the startup warmup took")
+
+
+async def warmup() -> None:
+    """Load what the first run would otherwise wait for: the compiled graph
+    (langgraph, the nodes and their search/parsing libraries), the model
+    client, and event store maintenance."""
+    start = time.perf_counter()
+    try:
+        # Imports and compiling happen in a thread so the loop keeps serving
+        await asyncio.to_thread(get_graph)
+        await asyncio.to_thread(importlib.import_module, "langchain_openai")
+        # Model clients are bound to the loop they run on, so build it here
+        llm_gateway.client()
+        await event_store.amaintain()
+        if CHECKPOINTS_ENABLED:
+            from services.checkpoint_store import checkpoint_store
+
+            await checkpoint_store.amaintain()
+    except Exception:
+        # The first run retries whatever failed and reports it properly
+        log.exception("Warmup failed")
+        return
+    WARMUP_SECONDS.set(time.perf_counter() - start)
+    log.info("Warmup finished", extra={"seconds": round(time.perf_counter() - start, 3)})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    loop_lag_monitor.start()
+    await init_fleet_analytics()
+    warmup_task = None
+    if STARTUP_WARMUP == "eager":
+        await warmup()
+    elif STARTUP_WARMUP == "background":
+        warmup_task = asyncio.create_task(warmup(), name="warmup")
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+        await asyncio.gather(warmup_task, return_exceptions=True)
+    await run_scheduler.aclose()
+    await page_fetcher.aclose()
+    await llm_gateway.aclose()
+    cache.close()
+    await event_store.aclose()
+    if CHECKPOINTS_ENABLED:
+        from services.checkpoint_store import checkpoint_store
+
+        checkpoint_store.close()
+    await loop_lag_monitor.aclose()
+    shutdown_logging()
+
+
+app = FastAPI(title="AgentLens API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,3 +106,11 @@ app.include_router(api_router, prefix="/api")
 app.include_router(graph_schema_router, prefix="/api")
 app.include_router(ws_router, prefix="/ws")
 
+if METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def get_metrics():
+        # Prometheus text exposition format. Rendered on the event loop, the
+        # only thread that updates metrics: a threadpool route could iterate
+        # a metric's values while the loop adds to them
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
@@ -1,4 +1,372 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.event_store import event_store
+from services.sketch import LogHistogram
+
+# USD per 1M tokens (input, output); matched on the longest model-name prefix
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "o3-mini": (1.10, 4.40),
+    "o4-mini": (1.10, 4.40),
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+NODE_EVENTS = ("on_chain_start", "on_chain_end")
+MODEL_EVENTS = ("on_chat_model_start", "on_chat_model_end", "on_llm_start", "on_llm_end")
+# Custom events from nodes; "first_token" carries a streamed call's TTFT
+CUSTOM_EVENTS = ("on_custom_event",)
+# Everything analytics reads from a run's events
+ANALYTICS_EVENTS = NODE_EVENTS + MODEL_EVENTS + CUSTOM_EVENTS
+
+
+def model_price(model: str) -> Tuple[float, float]:
+    best = ""
+    for prefix in MODEL_PRICES:
+        if model.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    return MODEL_PRICES.get(best, (0.0, 0.0))
+
+
+def _usage(event: Dict[str, Any]) -> Tuple[int, int]:
+    output = (event.get("data") or {}).get("output")
+    if not isinstance(output, dict):
+        return 0, 0
+    usage = output.get("usage_metadata")
+    if isinstance(usage, dict):
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    usage = (output.get("response_metadata") or {}).get("token_usage")
+    if isinstance(usage, dict):
+        return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+    return 0, 0
+
+
+class RunRecorder:
+    """Collects the columns analytics needs from one run's events as they stream by.
+
+    Only node and model start/end events are kept, as flat lists; `metrics()`
+    turns them into per-node and per-model latency, tokens and cost.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        # one entry per kept event
+        self._span: List[str] = []
+        self._end: List[bool] = []
+        self._ts: List[float] = []
+        self._is_model: List[bool] = []
+        self._node: List[str] = []
+        self._model: List[str] = []
+        self._input: List[int] = []
+        self._output: List[int] = []
+        # time-to-first-token samples per node
+        self._ttft: Dict[str, List[float]] = {}
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        ts = event.get("ts")
+        if ts is None:
+            return
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+        kind = event.get("event")
+        if kind in CUSTOM_EVENTS:
+            data = event.get("data") or {}
+            if event.get("name") == "first_token" and isinstance(data, dict) and data.get("ttft_ms") is not None:
+                node = data.get("node") or (event.get("metadata") or {}).get("langgraph_node") or ""
+                self._ttft.setdefault(node, []).append(float(data["ttft_ms"]))
+            return
+        if kind not in ANALYTICS_EVENTS or "span_id" not in event:
+            return
+        metadata = event.get("metadata") or {}
+        node = metadata.get("langgraph_node") or ""
+        is_model = kind in MODEL_EVENTS
+        if not is_model and (not node or event.get("name") != node):
+            # inner chains (prompts, parsers, ...) are not nodes
+            return
+        is_end = kind.endswith("_end")
+        tokens = _usage(event) if is_model and is_end else (0, 0)
+        self._span.append(event["span_id"])
+        self._end.append(is_end)
+        self._ts.append(ts)
+        self._is_model.append(is_model)
+        self._node.append(node)
+        self._model.append((metadata.get("ls_model_name") or event.get("name") or "unknown") if is_model else "")
+        self._input.append(tokens[0])
+        self._output.append(tokens[1])
+
+    def metrics(self, status: Optional[str] = None) -> Dict[str, Any]:
+        return compute_run_metrics(
+            self.run_id,
+            status,
+            self.first_ts,
+            self.last_ts,
+            np.asarray(self._span, dtype=object),
+            np.asarray(self._end, dtype=bool),
+            np.asarray(self._ts, dtype=np.float64),
+            np.asarray(self._is_model, dtype=bool),
+            np.asarray(self._node, dtype=object),
+            np.asarray(self._model, dtype=object),
+            np.asarray(self._input, dtype=np.int64),
+            np.asarray(self._output, dtype=np.int64),
+            ttft=self._ttft,
+        )
+
+
+def _group(labels: np.ndarray, latency: np.ndarray, inp: np.ndarray, out: np.ndarray, prices=None) -> Dict[str, Any]:
+    """Per-label call count, latency samples and token/cost sums (one entry per span)."""
+    if labels.size == 0:
+        return {}
+    names, inverse = np.unique(labels.astype(str), return_inverse=True)
+    k = names.size
+    calls = np.bincount(inverse, minlength=k)
+    in_sum = np.bincount(inverse, weights=inp, minlength=k)
+    out_sum = np.bincount(inverse, weights=out, minlength=k)
+    if prices is None:
+        cost = np.zeros(k)
+    else:
+        cost = np.bincount(inverse, weights=prices, minlength=k)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(calls)[:-1]
+    per_label = np.split(latency[order], bounds)
+    result = {}
+    for i, name in enumerate(names.tolist()):
+        samples = per_label[i]
+        samples = samples[np.isfinite(samples)]
+        result[name] = {
+            "calls": int(calls[i]),
+            "latency_ms": {
+                "total": float(samples.sum()),
+                "avg": float(samples.mean()) if samples.size else None,
+                "max": float(samples.max()) if samples.size else None,
+            },
+            "samples_ms": [round(v, 3) for v in samples.tolist()],
+            "input_tokens": int(in_sum[i]),
+            "output_tokens": int(out_sum[i]),
+            "total_tokens": int(in_sum[i] + out_sum[i]),
+            "cost_usd": float(cost[i]),
+        }
+    return result
+
+
+def compute_run_metrics(
+    run_id: str,
+    status: Optional[str],
+    first_ts: Optional[float],
+    last_ts: Optional[float],
+    span: np.ndarray,
+    is_end: np.ndarray,
+    ts: np.ndarray,
+    is_model: np.ndarray,
+    node: np.ndarray,
+    model: np.ndarray,
+    inp: np.ndarray,
+    out: np.ndarray,
+    ttft: Optional[Dict[str, List[float]]] = None,
+) -> Dict[str, Any]:
+    # One row per span: start/end timestamps scattered into place, so the
+    # pairing works regardless of how calls interleave
+    if span.size:
+        span_ids, inverse = np.unique(span.astype(str), return_inverse=True)
+    else:
+        span_ids, inverse = np.empty(0, dtype=str), np.empty(0, dtype=np.int64)
+    n = span_ids.size
+    start = np.full(n, np.nan)
+    end = np.full(n, np.nan)
+    start[inverse[~is_end]] = ts[~is_end]
+    end[inverse[is_end]] = ts[is_end]
+    latency = (end - start) * 1000.0
+
+    span_model = np.zeros(n, dtype=bool)
+    span_model[inverse] = is_model
+    span_node = np.empty(n, dtype=object)
+    span_node[inverse] = node
+    span_name = np.empty(n, dtype=object)
+    span_name[inverse] = model
+    span_in = np.bincount(inverse, weights=inp, minlength=n).astype(np.int64)
+    span_out = np.bincount(inverse, weights=out, minlength=n).astype(np.int64)
+
+    # Cost per model span from the price table (one lookup per distinct model)
+    cost = np.zeros(n)
+    if span_model.any():
+        names, name_idx = np.unique(span_name[span_model].astype(str), return_inverse=True)
+        prices = np.array([model_price(m) for m in names]).reshape(-1, 2)
+        cost[span_model] = (
+            span_in[span_model] * prices[name_idx, 0] + span_out[span_model] * prices[name_idx, 1]
+        ) / 1_000_000
+
+    nodes_mask = ~span_model
+    models = _group(
+        span_name[span_model], latency[span_model], span_in[span_model], span_out[span_model], cost[span_model]
+    )
+    nodes = _group(span_node[nodes_mask], latency[nodes_mask], np.zeros(nodes_mask.sum()), np.zeros(nodes_mask.sum()))
+    # Tokens and cost of model calls belong to the node that made them
+    by_node = _group(
+        span_node[span_model], latency[span_model], span_in[span_model], span_out[span_model], cost[span_model]
+    )
+    for name, usage in by_node.items():
+        entry = nodes.setdefault(name, {
+            "calls": 0,
+            "latency_ms": {"total": 0.0, "avg": None, "max": None},
+            "samples_ms": [],
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "total_tokens": 0,
+            "cost_usd": 0.0,
+        })
+        for key in ("input_tokens", "output_tokens", "total_tokens", "cost_usd"):
+            entry[key] = usage[key]
+        entry["llm_calls"] = usage["calls"]
+    for name, samples in (ttft or {}).items():
+        if name in nodes:
+            nodes[name]["ttft_ms"] = {"first": samples[0], "samples_ms": [round(v, 3) for v in samples]}
+
+    total_in = int(span_in.sum())
+    total_out = int(span_out.sum())
+    return {
+        "run_id": run_id,
+        "status": status,
+        "duration_ms": (last_ts - first_ts) * 1000.0 if first_ts is not None else None,
+        "nodes": nodes,
+        "models": models,
+        "totals": {
+            "llm_calls": int(span_model.sum()),
+            "input_tokens": total_in,
+            "output_tokens": total_out,
+            "total_tokens": total_in + total_out,
+            "cost_usd": float(cost.sum()),
+        },
+    }
+
+
+class Rollup:
+    """Fleet-wide aggregate for one node or model: latency sketch plus sums."""
+
+    def __init__(self):
+        self.latency = LogHistogram()
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        # time-to-first-token of streamed model calls
+        self.ttft = LogHistogram()
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {
+            "calls": self.calls,
+            "latency_ms": {
+                **self.latency.quantiles(QUANTILES),
+                "mean": self.latency.mean,
+                "max": self.latency.max if self.latency.count else None,
+            },
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.input_tokens + self.output_tokens,
+            "cost_usd": self.cost_usd,
+        }
+        if self.ttft.count:
+            summary["ttft_ms"] = {**self.ttft.quantiles(QUANTILES), "mean": self.ttft.mean}
+        return summary
+
+
+class FleetAnalytics:
+    """Running rollups over every finished run, per node and per model.
+
+    Latencies go into mergeable log-bucket histograms, so a snapshot costs
+    the same however many runs were recorded.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.runs = Rollup()
+        self.nodes: Dict[str, Rollup] = {}
+        self.models: Dict[str, Rollup] = {}
+
+    def add_run(self, metrics: Dict[str, Any]) -> None:
+        self.add_runs([metrics])
+
+    def add_runs(self, runs: Iterable[Dict[str, Any]]) -> None:
+        # Gather samples per key first so each sketch is updated in one pass
+        durations: List[float] = []
+        samples: Dict[Tuple[str, str], List[float]] = {}
+        ttft: Dict[str, List[float]] = {}
+        for m in runs:
+            if m.get("duration_ms") is not None:
+                durations.append(m["duration_ms"])
+            totals = m.get("totals") or {}
+            self.runs.calls += 1
+            self.runs.input_tokens += totals.get("input_tokens", 0)
+            self.runs.output_tokens += totals.get("output_tokens", 0)
+            self.runs.cost_usd += totals.get("cost_usd", 0.0)
+            for group, rollups in (("nodes", self.nodes), ("models", self.models)):
+                for name, entry in (m.get(group) or {}).items():
+                    r = rollups.get(name)
+                    if r is None:
+                        r = rollups[name] = Rollup()
+                    r.calls += entry.get("calls", 0)
+                    r.input_tokens += entry.get("input_tokens", 0)
+                    r.output_tokens += entry.get("output_tokens", 0)
+                    r.cost_usd += entry.get("cost_usd", 0.0)
+                    samples.setdefault((group, name), []).extend(entry.get("samples_ms") or ())
+                    if group == "nodes" and entry.get("ttft_ms"):
+                        ttft.setdefault(name, []).extend(entry["ttft_ms"].get("samples_ms") or ())
+        self.runs.latency.add_many(durations)
+        for (group, name), values in samples.items():
+            (self.nodes if group == "nodes" else self.models)[name].latency.add_many(values)
+        for name, values in ttft.items():
+            self.nodes[name].ttft.add_many(values)
+
+    def snapshot(self) -> Dict[str, Any]:
+        runs = self.runs.summary()
+        return {
+            "runs": {**runs, "count": runs.pop("calls")},
+            "nodes": {name: r.summary() for name, r in sorted(self.nodes.items())},
+            "models": {name: r.summary() for name, r in sorted(self.models.items())},
+        }
+
+
+fleet_analytics = FleetAnalytics()
+
+
+async def init_fleet_analytics() -> None:
+    """Rebuild the fleet rollups from the metrics saved with past runs."""
+    fleet_analytics.reset()
+    fleet_analytics.add_runs(await event_store.all_metrics())
+
+
+def record_run(recorder: RunRecorder, status: str) -> Dict[str, Any]:
+    """Finish a run's analytics: add it to the fleet rollups and save it with the run."""
+    metrics = recorder.metrics(status)
+    fleet_analytics.add_run(metrics)
+    event_store.save_metrics(recorder.run_id, metrics)
+    return metrics
+
+
 async def compute_analytics(run_id: str):
-    # Placeholder for analytics computation
-    return {"run_id": run_id, "analytics": {}}
+    metrics = await event_store.get_metrics(run_id)
+    if metrics is None:
+        # Run still in progress (or recorded before analytics were saved)
+        run = await event_store.get_run(run_id)
+        if run is None:
+            return {"run_id": run_id, "analytics": {}}
+        recorder = RunRecorder(run_id)
+        for event in await event_store.get_events(run_id, event=ANALYTICS_EVENTS):
+            recorder.observe(event)
+        metrics = recorder.metrics(run["status"])
+    return {"run_id": run_id, "analytics": metrics}
+
 
+async def fleet_snapshot() -> Dict[str, Any]:
+    return fleet_analytics.snapshot()
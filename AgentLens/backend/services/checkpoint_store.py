@@ -0,0 +1,586 @@
+"""Durable LangGraph checkpoints in a local SQLite file.
+
+Attached to the compiled research graph when CHECKPOINTS_ENABLED is set:
+LangGraph saves the state after every node, so a run that failed or was
+interrupted can be resumed from its last good node, and any step of any
+run can be forked, without redoing the search, fetch and LLM work before
+it. Imports langgraph; load it lazily (the graph builder and the
+checkpoint routes do).
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from agents.serialization import serialize_for_json
+from core.config import CHECKPOINT_COMPRESS_MIN_BYTES, CHECKPOINT_PATH, CHECKPOINT_RETENTION_DAYS
+from core.metrics import BYTE_BUCKETS, metrics
+
+# Channel values and pending writes point at content-addressed blobs: nodes
+# return the whole state, so most channels (documents above all) are
+# re-written unchanged at every step, and forks share their parent's values
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    " thread_id TEXT NOT NULL, ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, parent_id TEXT,"
+    " step INTEGER, created_at REAL NOT NULL, type TEXT NOT NULL, checkpoint BLOB NOT NULL,"
+    " metadata_type TEXT NOT NULL, metadata BLOB NOT NULL,"
+    " PRIMARY KEY (thread_id, ns, checkpoint_id)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS checkpoint_channels ("
+    " thread_id TEXT NOT NULL, ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL, blob TEXT,"
+    " PRIMARY KEY (thread_id, ns, channel, version)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS checkpoint_writes ("
+    " thread_id TEXT NOT NULL, ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, task_id TEXT NOT NULL,"
+    " idx INTEGER NOT NULL, channel TEXT NOT NULL, blob TEXT NOT NULL, task_path TEXT NOT NULL DEFAULT '',"
+    " PRIMARY KEY (thread_id, ns, checkpoint_id, task_id, idx)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS checkpoint_blobs ("
+    " digest TEXT PRIMARY KEY, type TEXT NOT NULL, data BLOB NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS checkpoints_created ON checkpoints(created_at)",
+)
+
+# Suffix on the serializer's type tag of compressed values
+_ZLIB = "+zlib"
+_MAINTAIN_INTERVAL_S = 3600
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_SECONDS = metrics.histogram(
+    "agentlens_checkpoint_write_seconds", "Time to persist one checkpoint or one task's writes", ("kind",)
+)
+CHECKPOINT_BYTES = metrics.histogram(
+    "agentlens_checkpoint_new_bytes", "Bytes of new (not deduplicated) values stored per checkpoint", buckets=BYTE_BUCKETS
+)
+
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """LangGraph checkpoint saver on SQLite (WAL mode), one thread per run.
+
+    Values are serialized with LangGraph's serializer; those of at least
+    `compress_min_bytes` are zlib-compressed, and identical values are
+    stored once. Blocking SQLite calls run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_PATH,
+        compress_min_bytes: int = CHECKPOINT_COMPRESS_MIN_BYTES,
+        retention_days: float = CHECKPOINT_RETENTION_DAYS,
+    ):
+        super().__init__()
+        self.path = path
+        self.compress_min_bytes = compress_min_bytes
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._maintained_at = time.monotonic()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- values ------------------------------------------------------------
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        typ, data = self.serde.dumps_typed(value)
+        if len(data) >= self.compress_min_bytes:
+            return typ + _ZLIB, zlib.compress(data, 6)
+        return typ, data
+
+    def _load(self, typ: str, data: bytes) -> Any:
+        if typ.endswith(_ZLIB):
+            typ, data = typ[:-len(_ZLIB)], zlib.decompress(data)
+        return self.serde.loads_typed((typ, data))
+
+    def _store_value(self, db: sqlite3.Connection, value: Any) -> Tuple[str, int]:
+        """Blob digest for `value`, and the bytes written (0 if already stored)."""
+        typ, data = self.serde.dumps_typed(value)
+        digest = hashlib.blake2b(typ.encode() + b"\0" + data, digest_size=16).hexdigest()
+        if db.execute("SELECT 1 FROM checkpoint_blobs WHERE digest = ?", (digest,)).fetchone():
+            return digest, 0
+        if len(data) >= self.compress_min_bytes:
+            typ, data = typ + _ZLIB, zlib.compress(data, 6)
+        db.execute("INSERT OR IGNORE INTO checkpoint_blobs VALUES (?, ?, ?)", (digest, typ, data))
+        return digest, len(data)
+
+    def _blob(self, db: sqlite3.Connection, digest: str) -> Any:
+        typ, data = db.execute("SELECT type, data FROM checkpoint_blobs WHERE digest = ?", (digest,)).fetchone()
+        return self._load(typ, data)
+
+    # -- reading -----------------------------------------------------------
+
+    def _tuple(self, db: sqlite3.Connection, row: Tuple) -> CheckpointTuple:
+        thread_id, ns, checkpoint_id, parent_id, _, _, typ, data, metadata_type, metadata = row
+        checkpoint: Checkpoint = self._load(typ, data)
+        values: Dict[str, Any] = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            found = db.execute(
+                "SELECT blob FROM checkpoint_channels WHERE thread_id = ? AND ns = ? AND channel = ? AND version = ?",
+                (thread_id, ns, channel, str(version)),
+            ).fetchone()
+            if found and found[0] is not None:
+                values[channel] = self._blob(db, found[0])
+        writes = db.execute(
+            "SELECT task_id, idx, channel, blob, task_path FROM checkpoint_writes"
+            " WHERE thread_id = ? AND ns = ? AND checkpoint_id = ?",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[4], w[0], w[1]))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": values},
+            metadata=self._load(metadata_type, metadata),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self._blob(db, blob)) for task_id, _, channel, blob, _ in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            db = self._db()
+            if checkpoint_id:
+                row = db.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                # Checkpoint ids are time-ordered, so the largest is the latest
+                row = db.execute(
+                    "SELECT * FROM checkpoints WHERE thread_id = ? AND ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            return self._tuple(db, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                where.append("ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            where.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        # The step has its own column; other metadata keys are matched on
+        # the decoded metadata
+        filter = dict(filter or {})
+        if "step" in filter:
+            where.append("step = ?")
+            params.append(filter.pop("step"))
+        sql = "SELECT * FROM checkpoints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY thread_id, checkpoint_id DESC"
+        if limit is not None and not filter:
+            sql += " LIMIT ?"
+            params.append(limit)
+        found: List[CheckpointTuple] = []
+        with self._lock:
+            db = self._db()
+            # Rows are decoded (values and all) one at a time, up to `limit`
+            for row in db.execute(sql, params):
+                if limit is not None and len(found) >= limit:
+                    break
+                if filter:
+                    metadata = self._load(row[8], row[9])
+                    if not all(metadata.get(k) == v for k, v in filter.items()):
+                        continue
+                found.append(self._tuple(db, row))
+        yield from found
+
+    # -- writing -----------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self._put(config, checkpoint, metadata, new_versions)[0]
+
+    def _put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> Tuple[RunnableConfig, int]:
+        """Save a checkpoint; returns its config and the bytes of new values written."""
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+        metadata = get_checkpoint_metadata(config, metadata)
+        typ, data = self._dump(c)
+        metadata_type, metadata_data = self._dump(metadata)
+        written = 0
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN")
+            try:
+                for channel, version in new_versions.items():
+                    digest = None
+                    if channel in values:
+                        digest, size = self._store_value(db, values[channel])
+                        written += size
+                    db.execute(
+                        "INSERT OR REPLACE INTO checkpoint_channels VALUES (?, ?, ?, ?, ?)",
+                        (thread_id, ns, channel, str(version), digest),
+                    )
+                db.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id, ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                        metadata.get("step"), time.time(), typ, data, metadata_type, metadata_data,
+                    ),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        self._maybe_maintain()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}, written
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN")
+            try:
+                for idx, (channel, value) in enumerate(writes):
+                    idx = WRITES_IDX_MAP.get(channel, idx)
+                    digest, _ = self._store_value(db, value)
+                    # Regular writes are saved once; special ones (errors,
+                    # interrupts: negative idx) replace earlier ones
+                    verb = "INSERT OR IGNORE" if idx >= 0 else "INSERT OR REPLACE"
+                    db.execute(
+                        f"{verb} INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (thread_id, ns, checkpoint_id, task_id, idx, channel, digest, task_path),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def get_next_version(self, current: Optional[str], channel: None = None) -> str:
+        # As InMemorySaver: a random suffix keeps versions written on a fork
+        # from colliding with those of the branch it left
+        current_v = 0 if current is None else current if isinstance(current, int) else int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # -- threads -----------------------------------------------------------
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            db = self._db()
+            for table in ("checkpoints", "checkpoint_channels", "checkpoint_writes"):
+                db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN")
+            try:
+                for table in ("checkpoints", "checkpoint_channels", "checkpoint_writes"):
+                    columns = [row[1] for row in db.execute(f"PRAGMA table_info({table})")]
+                    rest = ", ".join(columns[1:])
+                    db.execute(
+                        f"INSERT OR REPLACE INTO {table} (thread_id, {rest}) SELECT ?, {rest} FROM {table} WHERE thread_id = ?",
+                        (target_thread_id, source_thread_id),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def fork_thread(
+        self,
+        source_thread_id: str,
+        target_thread_id: str,
+        checkpoint_id: str,
+        pending_writes: bool,
+        values: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Start `target_thread_id` at `checkpoint_id` of the source thread.
+
+        Copies that checkpoint and its ancestors only, so the new thread's
+        latest checkpoint is the fork point. With `pending_writes`, the
+        writes already saved on top of it (tasks of the step that finished
+        before the run failed) are kept, and only the rest of the step runs
+        again; without, the whole next step runs again. `values` replace
+        channel values of the fork point in the new thread's copy (channels
+        not yet written there are left alone); versions don't change, so
+        neither does what runs next.
+        """
+        with self._lock:
+            db = self._db()
+            chain: List[str] = []
+            current: Optional[str] = checkpoint_id
+            while current:
+                row = db.execute(
+                    "SELECT parent_id FROM checkpoints WHERE thread_id = ? AND ns = '' AND checkpoint_id = ?",
+                    (source_thread_id, current),
+                ).fetchone()
+                if row is None:
+                    break
+                chain.append(current)
+                current = row[0]
+            if not chain:
+                raise KeyError(f"Unknown checkpoint {checkpoint_id} of run {source_thread_id}")
+            db.execute("BEGIN")
+            try:
+                for cid in chain:
+                    db.execute(
+                        "INSERT OR REPLACE INTO checkpoints (thread_id, ns, checkpoint_id, parent_id, step, created_at,"
+                        " type, checkpoint, metadata_type, metadata) SELECT ?, ns, checkpoint_id, parent_id, step,"
+                        " created_at, type, checkpoint, metadata_type, metadata FROM checkpoints"
+                        " WHERE thread_id = ? AND ns = '' AND checkpoint_id = ?",
+                        (target_thread_id, source_thread_id, cid),
+                    )
+                    if cid != checkpoint_id or pending_writes:
+                        db.execute(
+                            "INSERT OR REPLACE INTO checkpoint_writes (thread_id, ns, checkpoint_id, task_id, idx,"
+                            " channel, blob, task_path) SELECT ?, ns, checkpoint_id, task_id, idx, channel, blob,"
+                            " task_path FROM checkpoint_writes WHERE thread_id = ? AND ns = '' AND checkpoint_id = ?",
+                            (target_thread_id, source_thread_id, cid),
+                        )
+                # Channel rows are few and small (they point at blobs)
+                db.execute(
+                    "INSERT OR REPLACE INTO checkpoint_channels (thread_id, ns, channel, version, blob)"
+                    " SELECT ?, ns, channel, version, blob FROM checkpoint_channels WHERE thread_id = ?",
+                    (target_thread_id, source_thread_id),
+                )
+                if values:
+                    typ, data = db.execute(
+                        "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND ns = '' AND checkpoint_id = ?",
+                        (source_thread_id, checkpoint_id),
+                    ).fetchone()
+                    versions = self._load(typ, data)["channel_versions"]
+                    for channel, value in values.items():
+                        if channel in versions:
+                            digest, _ = self._store_value(db, value)
+                            db.execute(
+                                "INSERT OR REPLACE INTO checkpoint_channels VALUES (?, '', ?, ?, ?)",
+                                (target_thread_id, channel, str(versions[channel]), digest),
+                            )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    # -- async -------------------------------------------------------------
+    #
+    # The graph runs on the event loop and calls these; metrics are recorded
+    # here, on the loop thread (core.metrics takes no locks), not in the
+    # worker thread that does the writing.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        found = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in found:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        start = time.perf_counter()
+        saved, written = await asyncio.to_thread(self._put, config, checkpoint, metadata, new_versions)
+        CHECKPOINT_SECONDS.observe(time.perf_counter() - start, kind="checkpoint")
+        CHECKPOINT_BYTES.observe(written)
+        return saved
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        start = time.perf_counter()
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+        CHECKPOINT_SECONDS.observe(time.perf_counter() - start, kind="writes")
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def acopy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        await asyncio.to_thread(self.copy_thread, source_thread_id, target_thread_id)
+
+    async def afork_thread(
+        self,
+        source_thread_id: str,
+        target_thread_id: str,
+        checkpoint_id: str,
+        pending_writes: bool,
+        values: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        await asyncio.to_thread(
+            self.fork_thread, source_thread_id, target_thread_id, checkpoint_id, pending_writes, values
+        )
+
+    # -- retention ---------------------------------------------------------
+
+    def maintain(self, retention_days: Optional[float] = None) -> Dict[str, int]:
+        """Delete threads past retention and values no checkpoint refers to any more."""
+        retention_days = self.retention_days if retention_days is None else retention_days
+        with self._lock:
+            db = self._db()
+            expired = [r[0] for r in db.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                (time.time() - retention_days * 86400,),
+            )] if retention_days > 0 else []
+            for thread_id in expired:
+                for table in ("checkpoints", "checkpoint_channels", "checkpoint_writes"):
+                    db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            orphans = db.execute(
+                "DELETE FROM checkpoint_blobs WHERE digest NOT IN"
+                " (SELECT blob FROM checkpoint_channels WHERE blob IS NOT NULL"
+                " UNION SELECT blob FROM checkpoint_writes)"
+            ).rowcount if expired else 0
+            if expired:
+                db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"expired_threads": len(expired), "deleted_blobs": orphans}
+
+    async def amaintain(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self.maintain)
+
+    def _maybe_maintain(self) -> None:
+        if time.monotonic() - self._maintained_at < _MAINTAIN_INTERVAL_S:
+            return
+        self._maintained_at = time.monotonic()
+        try:
+            self.maintain()
+        except sqlite3.Error as e:
+            log.warning("Checkpoint store maintenance failed", extra={"error": str(e)})
+
+
+checkpoint_store = SqliteCheckpointer()
+
+
+# -- run checkpoints, for the API ------------------------------------------
+
+def _checkpoint_id(snapshot) -> str:
+    return snapshot.config["configurable"]["checkpoint_id"]
+
+
+async def list_checkpoints(graph, run_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+    """A run's latest `limit` checkpoints, oldest first: step, the node(s) whose
+    output it holds, what runs next."""
+    # One more than asked for: a checkpoint's nodes are its parent's `next`
+    history = [
+        s async for s in graph.aget_state_history({"configurable": {"thread_id": run_id}}, limit=limit + 1)
+    ]
+    history.reverse()
+    found: List[Dict[str, Any]] = []
+    ran: Sequence[str] = ()
+    for snapshot in history:
+        metadata = snapshot.metadata or {}
+        found.append({
+            "checkpoint_id": _checkpoint_id(snapshot),
+            "parent_id": (snapshot.parent_config or {}).get("configurable", {}).get("checkpoint_id"),
+            "step": metadata.get("step"),
+            "source": metadata.get("source"),
+            "nodes": list(ran) if metadata.get("source") == "loop" else [],
+            "next": list(snapshot.next),
+            "error": next((str(t.error) for t in snapshot.tasks if t.error), None),
+            "created_at": snapshot.created_at,
+        })
+        ran = snapshot.next
+    return found[-limit:]
+
+
+async def find_checkpoint(
+    graph, run_id: str, checkpoint_id: Optional[str] = None, step: Optional[int] = None
+) -> Optional[Any]:
+    """The run's StateSnapshot at `checkpoint_id`, at LangGraph step `step`, or its latest."""
+    config: Dict[str, Any] = {"configurable": {"thread_id": run_id}}
+    if checkpoint_id:
+        config["configurable"]["checkpoint_id"] = checkpoint_id
+    if step is None:
+        snapshot = await graph.aget_state(config)
+        return snapshot if snapshot.created_at else None
+    # Matched on the store's step column: one checkpoint is read and decoded
+    async for snapshot in graph.aget_state_history(config, filter={"step": step}, limit=1):
+        return snapshot
+    return None
+
+
+def snapshot_dict(snapshot) -> Dict[str, Any]:
+    """A StateSnapshot as the JSON the API returns (state loaded, nothing re-run)."""
+    metadata = snapshot.metadata or {}
+    return {
+        "checkpoint_id": _checkpoint_id(snapshot),
+        "step": metadata.get("step"),
+        "next": list(snapshot.next),
+        "created_at": snapshot.created_at,
+        "state": serialize_for_json(snapshot.values),
+    }
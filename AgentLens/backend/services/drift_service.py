@@ -1,26 +1,65 @@
-from typing import Dict, Any
+import asyncio
+import hashlib
 import re
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
-def compute_drift(state: Dict[str, Any]) -> Dict[str, Any]:
+import numpy as np
+
+from agents.grounding import grounding_report
+from core.config import DRIFT_BATCH_SIZE, GROUNDING_MIN_SUPPORT
+from services.event_store import event_store
+
+WORD = re.compile(r"\w+")
+
+NO_CONTENT = {
+    "drift_score": 1.0,
+    "overlap": 0.0,
+    "cite_score": 0.0,
+    "length_score": 0.0,
+    "flags": ["No question or draft available for analysis."]
+}
+
+
+def _draft(state: Dict[str, Any]) -> str:
+    return state.get("draft", "") or state.get("final", "")
+
+
+def _grounding(state: Dict[str, Any], draft: str) -> Dict[str, Any]:
+    """Support of the draft's cited sentences by the state's documents (if it has any)."""
+    docs = [d for d in state.get("documents", []) or [] if isinstance(d, dict)]
+    if not docs:
+        return {"support_score": None, "unknown_citations": 0, "flags": []}
+    report = grounding_report(draft, docs)
+    flags = []
+    if report["unknown_citations"]:
+        flags.append("Some citations are not among the retrieved documents.")
+    if report["support_score"] is not None and report["support_score"] < GROUNDING_MIN_SUPPORT:
+        flags.append("Cited claims are weakly supported by the retrieved sources.")
+    return {
+        "support_score": report["support_score"],
+        "unknown_citations": len(report["unknown_citations"]),
+        "flags": flags,
+    }
+
+
+def compute_drift(state: Dict[str, Any], grounding: bool = True) -> Dict[str, Any]:
+    """Drift heuristics for one state; with `grounding`, also how well its
+    citations are supported by the state's documents (support_score,
+    unknown_citations)."""
     question = state.get("question", "")
-    draft = state.get("draft", "") or state.get("final", "")
+    draft = _draft(state)
     citations = state.get("citations", []) or []
     docs = state.get("documents", []) or []
 
     # Early return if no content to analyze
     if not question or not draft:
-        return {
-            "drift_score": 1.0,
-            "overlap": 0.0,
-            "cite_score": 0.0,
-            "length_score": 0.0,
-            "flags": ["No question or draft available for analysis."]
-        }
+        return {**NO_CONTENT, "flags": list(NO_CONTENT["flags"])}
 
     # heuristics that work without extra models
-    q_words = set(re.findall(r"\w+", question.lower()))
-    d_words = set(re.findall(r"\w+", draft.lower()))
-    
+    q_words = set(WORD.findall(question.lower()))
+    d_words = set(WORD.findall(draft.lower()))
+
     if not q_words:
         overlap = 0.0
     else:
@@ -43,12 +82,189 @@ def compute_drift(state: Dict[str, Any]) -> Dict[str, Any]:
         flags.append("Citation coverage is low.")
     if length_score < 0.4:
         flags.append("Answer seems shallow.")
+    report = _grounding(state, draft) if grounding else {"flags": []}
+    flags.extend(report.pop("flags"))
 
     return {
         "drift_score": drift_score,
         "overlap": overlap,
         "cite_score": cite_score,
         "length_score": length_score,
+        **report,
         "flags": flags
     }
 
+
+class Vocabulary:
+    """Question words -> integer ids, kept across batches.
+
+    Only question words matter for overlap, so drafts are reduced to the
+    ids of the vocabulary words they contain. Token ids are cached per
+    question and per draft (by content hash), so re-scoring the same runs
+    after a heuristic change skips tokenization. Learning new question
+    words bumps `generation`, which invalidates cached drafts.
+    """
+
+    def __init__(self, max_words: int = 200_000, max_texts: int = 100_000):
+        self.max_words = max_words
+        self.max_texts = max_texts
+        self.generation = 0
+        self._ids: Dict[str, int] = {}
+        self._questions: Dict[str, np.ndarray] = {}
+        self._drafts: Dict[bytes, Tuple[int, np.ndarray]] = {}
+        # Batches may be scored in several worker threads at once
+        self._lock = threading.Lock()
+
+    def _question(self, question: str) -> np.ndarray:
+        cached = self._questions.get(question)
+        if cached is not None:
+            return cached
+        # Distinct words, same tokenization as compute_drift
+        words = set(WORD.findall(question.lower()))
+        ids = self._ids
+        if not words <= ids.keys():
+            self.generation += 1
+        cached = np.fromiter((ids.setdefault(w, len(ids)) for w in words), dtype=np.int64, count=len(words))
+        self._questions[question] = cached
+        return cached
+
+    def _draft(self, draft: str) -> np.ndarray:
+        key = hashlib.blake2b(draft.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        cached = self._drafts.get(key)
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        words = set(WORD.findall(draft.lower())) & self._ids.keys()
+        ids = self._ids
+        arr = np.fromiter((ids[w] for w in words), dtype=np.int64, count=len(words))
+        self._drafts[key] = (self.generation, arr)
+        return arr
+
+    def encode_batch(self, questions: List[str], drafts: List[str]) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        with self._lock:
+            if len(self._ids) > self.max_words:
+                self._ids = {}
+                self._questions = {}
+                self.generation += 1
+            if len(self._questions) > self.max_texts:
+                self._questions = {}
+            if len(self._drafts) > self.max_texts:
+                self._drafts = {}
+            # Questions first: drafts are reduced against their words
+            q_ids = [self._question(q) for q in questions]
+            return q_ids, [self._draft(d) for d in drafts]
+
+
+drift_vocab = Vocabulary()
+
+
+def _flat(id_arrays: Sequence[np.ndarray]):
+    lengths = np.fromiter((a.size for a in id_arrays), dtype=np.int64, count=len(id_arrays))
+    rows = np.repeat(np.arange(len(id_arrays)), lengths)
+    tokens = np.concatenate(id_arrays) if len(id_arrays) else np.empty(0, dtype=np.int64)
+    return rows, tokens, lengths
+
+
+def compute_drift_batch(states: Sequence[Dict[str, Any]], grounding: bool = False) -> List[Dict[str, Any]]:
+    """compute_drift over many states at once; same results, one array pass per score.
+
+    Grounding is off unless asked for: it reads every sentence of every
+    draft against the run's documents, which costs far more than the
+    scores above.
+    """
+    n = len(states)
+    if n == 0:
+        return []
+    questions = [s.get("question", "") or "" for s in states]
+    drafts = [_draft(s) or "" for s in states]
+    empty = np.fromiter((not q or not d for q, d in zip(questions, drafts)), dtype=bool, count=n)
+
+    q_ids, d_ids = drift_vocab.encode_batch(questions, drafts)
+    q_rows, q_tokens, q_len = _flat(q_ids)
+    d_rows, d_tokens, _ = _flat(d_ids)
+
+    # |q ∩ d| per state: a question word hits when (row, word) also occurs in the draft
+    width = max(int(q_tokens.max(initial=-1)), int(d_tokens.max(initial=-1))) + 1
+    hits = np.isin(q_rows * width + q_tokens, d_rows * width + d_tokens)
+    shared = np.bincount(q_rows[hits], minlength=n)
+    overlap = np.zeros(n)
+    np.divide(shared, q_len, out=overlap, where=q_len > 0)
+
+    n_citations = np.fromiter((len(s.get("citations", []) or []) for s in states), dtype=np.float64, count=n)
+    draft_chars = np.fromiter((len(d) for d in drafts), dtype=np.float64, count=n)
+    cite_score = np.minimum(1.0, n_citations / 4.0)
+    length_score = np.minimum(1.0, draft_chars / 800.0)
+    drift_score = np.clip(1.0 - (0.5 * overlap + 0.3 * cite_score + 0.2 * length_score), 0.0, 1.0)
+
+    off_topic = overlap < 0.25
+    low_cites = cite_score < 0.5
+    shallow = length_score < 0.4
+
+    results = []
+    for i in range(n):
+        if empty[i]:
+            results.append({**NO_CONTENT, "flags": list(NO_CONTENT["flags"])})
+            continue
+        flags = []
+        if off_topic[i]:
+            flags.append("Answer may be off topic relative to question.")
+        if low_cites[i]:
+            flags.append("Citation coverage is low.")
+        if shallow[i]:
+            flags.append("Answer seems shallow.")
+        report = _grounding(states[i], drafts[i]) if grounding else {"flags": []}
+        flags.extend(report.pop("flags"))
+        results.append({
+            "drift_score": float(drift_score[i]),
+            "overlap": float(overlap[i]),
+            "cite_score": float(cite_score[i]),
+            "length_score": float(length_score[i]),
+            **report,
+            "flags": flags,
+        })
+    return results
+
+
+async def stream_drift(
+    states: Optional[List[Dict[str, Any]]] = None,
+    run_ids: Optional[List[str]] = None,
+    all_runs: bool = False,
+    batch_size: int = DRIFT_BATCH_SIZE,
+    grounding: bool = False,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Drift results for posted states and/or stored runs, one batch at a time.
+
+    Stored runs are scored on their latest state. Scoring runs in a worker
+    thread; the final item carries "done" and the count. With `grounding`,
+    results include citation support as in compute_drift.
+    """
+    count = 0
+    for i in range(0, len(states or []), batch_size):
+        batch = states[i:i + batch_size]
+        for j, result in enumerate(await asyncio.to_thread(compute_drift_batch, batch, grounding)):
+            yield {"index": i + j, **result}
+            count += 1
+
+    async def stored_run_ids() -> AsyncIterator[List[str]]:
+        ids = list(run_ids or [])
+        for i in range(0, len(ids), batch_size):
+            yield ids[i:i + batch_size]
+        if all_runs:
+            offset = 0
+            while True:
+                runs = await event_store.list_runs(limit=batch_size, offset=offset)
+                if not runs:
+                    return
+                yield [r["run_id"] for r in runs]
+                offset += len(runs)
+
+    async for ids in stored_run_ids():
+        found = await event_store.final_states(ids)
+        missing = [rid for rid in ids if found.get(rid) is None]
+        scored = [rid for rid in ids if found.get(rid) is not None]
+        results = await asyncio.to_thread(compute_drift_batch, [found[rid] for rid in scored], grounding)
+        for rid, result in zip(scored, results):
+            yield {"run_id": rid, **result}
+            count += 1
+        for rid in missing:
+            yield {"run_id": rid, "error": "Run not found or has no recorded state."}
+    yield {"done": True, "count": count}
@@ -0,0 +1,425 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from agents.serialization import dumps
+from agents.snapshots import apply_patch
+from core.config import (
+    EVENT_STORE_ENABLED,
+    EVENT_STORE_PATH,
+    EVENT_STORE_BATCH_SIZE,
+    EVENT_STORE_FLUSH_MS,
+    EVENT_STORE_MAX_PENDING,
+    EVENT_STORE_RETENTION_DAYS,
+    EVENT_STORE_COMPACT_AFTER_H,
+)
+
+# Token-level events; compaction drops them from old runs (node events,
+# snapshots and patches are kept, so state replay still works)
+COMPACTABLE_EVENTS = ("on_chat_model_stream", "on_llm_stream", "on_chain_stream", "on_tool_stream")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " run_id TEXT PRIMARY KEY, question TEXT, status TEXT NOT NULL DEFAULT 'running',"
+    " started_at REAL NOT NULL, updated_at REAL NOT NULL, event_count INTEGER NOT NULL DEFAULT 0,"
+    " compacted INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE IF NOT EXISTS events ("
+    " run_id TEXT NOT NULL, step_index INTEGER NOT NULL, event TEXT NOT NULL, node TEXT,"
+    " ts REAL NOT NULL, state_kind INTEGER NOT NULL DEFAULT 0, payload BLOB NOT NULL,"
+    " PRIMARY KEY (run_id, step_index)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS events_node ON events(run_id, node, step_index)",
+    "CREATE INDEX IF NOT EXISTS events_event ON events(run_id, event, step_index)",
+    "CREATE INDEX IF NOT EXISTS runs_started ON runs(started_at)",
+)
+
+_MAINTAIN_INTERVAL_S = 3600
+
+log = logging.getLogger(__name__)
+
+# events.state_kind
+_NO_STATE, _KEYFRAME, _PATCH = 0, 1, 2
+
+
+def _encode(event: Dict[str, Any]) -> Tuple:
+    metadata = event.get("metadata")
+    node = metadata.get("langgraph_node") if isinstance(metadata, dict) else None
+    if "state_snapshot" in event:
+        state_kind = _KEYFRAME
+    elif "state_patch" in event:
+        state_kind = _PATCH
+    else:
+        state_kind = _NO_STATE
+    return (
+        event["run_id"], event.get("step_index", 0), event.get("event") or "", node,
+        event.get("ts") or time.time(), state_kind, zlib.compress(dumps(event), 1),
+    )
+
+
+def _decode(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob))
+
+
+class EventStore:
+    """Append-only local store for run events, in SQLite (WAL mode).
+
+    `append` only queues the event; a background task writes queued events
+    in batches (every `flush_ms` or `batch_size` events) from a worker
+    thread, so the run doesn't wait on disk. If the writer falls behind
+    by `max_pending` items, writers wait in `wait_for_room` until the
+    queue is written. Events are keyed by (run_id, step_index) and indexed
+    by node and event type.
+    """
+
+    def __init__(
+        self,
+        path: str = EVENT_STORE_PATH,
+        batch_size: int = EVENT_STORE_BATCH_SIZE,
+        flush_ms: float = EVENT_STORE_FLUSH_MS,
+        max_pending: int = EVENT_STORE_MAX_PENDING,
+    ):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_s = max(0.0, flush_ms) / 1000
+        self.max_pending = max(self.batch_size, max_pending)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # ("event", event), ("run", run_id, question, status) and
+        # ("metrics", run_id, metrics) items, in order
+        self._pending: List[Tuple] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._maintained_at = time.monotonic()
+        self.written = 0
+        self.batches = 0
+        self.stalls = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+            if "metrics" not in columns:
+                conn.execute("ALTER TABLE runs ADD COLUMN metrics TEXT")
+            self._conn = conn
+        return self._conn
+
+    # -- writing -----------------------------------------------------------
+
+    def start_run(self, run_id: str, question: str) -> None:
+        self._enqueue(("run", run_id, question, "running"))
+
+    def finish_run(self, run_id: str, status: str = "completed") -> None:
+        self._enqueue(("run", run_id, None, status))
+
+    def append(self, event: Dict[str, Any]) -> None:
+        self._enqueue(("event", event))
+
+    def save_metrics(self, run_id: str, metrics: Dict[str, Any]) -> None:
+        self._enqueue(("metrics", run_id, metrics))
+
+    def _enqueue(self, item: Tuple) -> None:
+        if not EVENT_STORE_ENABLED:
+            return
+        self._pending.append(item)
+        self._ensure_writer()
+        if len(self._pending) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    @property
+    def backlogged(self) -> bool:
+        return len(self._pending) >= self.max_pending
+
+    async def wait_for_room(self) -> None:
+        """Back-pressure: while `backlogged`, write the queue before returning."""
+        while self.backlogged:
+            self.stalls += 1
+            self._ensure_writer()
+            await self._flush_pending()
+
+    def _ensure_writer(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (e.g. a generator finalized at shutdown); written on the next flush
+            return
+        # The writer task belongs to the loop it was started on
+        if self._writer is None or self._writer.done() or self._loop is not loop:
+            self._wake = asyncio.Event()
+            self._write_lock = asyncio.Lock()
+            self._loop = loop
+            self._writer = loop.create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._pending:
+                await self._flush_pending()
+            if time.monotonic() - self._maintained_at > _MAINTAIN_INTERVAL_S:
+                self._maintained_at = time.monotonic()
+                try:
+                    await self.amaintain()
+                except sqlite3.Error as e:
+                    log.warning("Event store maintenance failed", extra={"error": str(e)})
+
+    async def _flush_pending(self) -> None:
+        # Batches are written in the order they were taken
+        async with self._write_lock:
+            items, self._pending = self._pending, []
+            if not items:
+                return
+            try:
+                await asyncio.to_thread(self._write, items)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                log.error("Event store write failed", extra={"items": len(items), "error": str(e)})
+
+    def _write(self, items: List[Tuple]) -> None:
+        rows, runs, metrics = [], [], []
+        for item in items:
+            if item[0] == "event":
+                rows.append(_encode(item[1]))
+            elif item[0] == "run":
+                runs.append(item[1:])
+            else:
+                metrics.append((json.dumps(item[2]), item[1]))
+        now = time.time()
+        counts: Dict[str, int] = {}
+        for row in rows:
+            counts[row[0]] = counts.get(row[0], 0) + 1
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN")
+            try:
+                for run_id, question, status in runs:
+                    db.execute(
+                        "INSERT INTO runs (run_id, question, status, started_at, updated_at) VALUES (?, ?, ?, ?, ?)"
+                        " ON CONFLICT(run_id) DO UPDATE SET status = excluded.status,"
+                        " question = COALESCE(excluded.question, runs.question), updated_at = excluded.updated_at",
+                        (run_id, question, status, now, now),
+                    )
+                db.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                db.executemany(
+                    "INSERT INTO runs (run_id, started_at, updated_at, event_count) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(run_id) DO UPDATE SET updated_at = excluded.updated_at,"
+                    " event_count = runs.event_count + excluded.event_count",
+                    [(run_id, now, now, n) for run_id, n in counts.items()],
+                )
+                db.executemany("UPDATE runs SET metrics = ? WHERE run_id = ?", metrics)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        self.written += len(rows)
+        self.batches += 1
+
+    async def flush(self) -> None:
+        """Write everything queued so far (e.g. before reading a run back)."""
+        if self._pending:
+            self._ensure_writer()
+            await self._flush_pending()
+
+    async def aclose(self) -> None:
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        await self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- reading -----------------------------------------------------------
+
+    def _run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT run_id, question, status, started_at, updated_at, event_count, compacted"
+                " FROM runs WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()
+        return _run_dict(row) if row else None
+
+    def _runs(self, limit: int, offset: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT run_id, question, status, started_at, updated_at, event_count, compacted"
+                " FROM runs ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [_run_dict(r) for r in rows]
+
+    def _events(
+        self,
+        run_id: str,
+        start: Optional[int],
+        end: Optional[int],
+        node: Optional[str],
+        event: Union[str, Sequence[str], None],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        sql = "SELECT payload FROM events WHERE run_id = ?"
+        args: List[Any] = [run_id]
+        if start is not None:
+            sql += " AND step_index >= ?"
+            args.append(start)
+        if end is not None:
+            sql += " AND step_index <= ?"
+            args.append(end)
+        if node is not None:
+            sql += " AND node = ?"
+            args.append(node)
+        if isinstance(event, str):
+            sql += " AND event = ?"
+            args.append(event)
+        elif event is not None:
+            sql += f" AND event IN ({','.join('?' * len(event))})"
+            args.extend(event)
+        sql += " ORDER BY step_index LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._db().execute(sql, args).fetchall()
+        return [_decode(r[0]) for r in rows]
+
+    def _state_at(self, run_id: str, step_index: Optional[int]) -> Optional[Dict[str, Any]]:
+        upper = step_index if step_index is not None else 2**62
+        with self._lock:
+            db = self._db()
+            key = db.execute(
+                "SELECT step_index, payload FROM events WHERE run_id = ? AND state_kind = ? AND step_index <= ?"
+                " ORDER BY step_index DESC LIMIT 1",
+                (run_id, _KEYFRAME, upper),
+            ).fetchone()
+            if key is None:
+                return None
+            patches = db.execute(
+                "SELECT payload FROM events WHERE run_id = ? AND state_kind = ? AND step_index > ? AND step_index <= ?"
+                " ORDER BY step_index",
+                (run_id, _PATCH, key[0], upper),
+            ).fetchall()
+        # Replay from the nearest keyframe instead of the start of the run
+        state = _decode(key[1])["state_snapshot"]
+        for (blob,) in patches:
+            state = apply_patch(state, _decode(blob)["state_patch"])
+        return state
+
+    def _metrics(self, run_id: Optional[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            db = self._db()
+            if run_id is None:
+                rows = db.execute("SELECT metrics FROM runs WHERE metrics IS NOT NULL").fetchall()
+            else:
+                rows = db.execute("SELECT metrics FROM runs WHERE run_id = ? AND metrics IS NOT NULL", (run_id,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    async def get_metrics(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Analytics saved for a finished run, if any."""
+        await self.flush()
+        found = await asyncio.to_thread(self._metrics, run_id)
+        return found[0] if found else None
+
+    async def all_metrics(self) -> List[Dict[str, Any]]:
+        await self.flush()
+        return await asyncio.to_thread(self._metrics, None)
+
+    async def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        await self.flush()
+        return await asyncio.to_thread(self._run, run_id)
+
+    async def list_runs(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        await self.flush()
+        return await asyncio.to_thread(self._runs, limit, offset)
+
+    async def get_events(
+        self,
+        run_id: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        node: Optional[str] = None,
+        event: Union[str, Sequence[str], None] = None,
+        limit: int = 10000,
+    ) -> List[Dict[str, Any]]:
+        await self.flush()
+        return await asyncio.to_thread(self._events, run_id, start, end, node, event, limit)
+
+    async def final_states(self, run_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Latest recorded state of each run, in one worker-thread hop."""
+        await self.flush()
+        return await asyncio.to_thread(lambda: {rid: self._state_at(rid, None) for rid in run_ids})
+
+    async def state_at(self, run_id: str, step_index: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """State as of `step_index` (latest if None), rebuilt from the nearest keyframe."""
+        await self.flush()
+        return await asyncio.to_thread(self._state_at, run_id, step_index)
+
+    # -- retention ---------------------------------------------------------
+
+    def maintain(
+        self,
+        retention_days: float = EVENT_STORE_RETENTION_DAYS,
+        compact_after_h: float = EVENT_STORE_COMPACT_AFTER_H,
+    ) -> Dict[str, int]:
+        """Delete runs past retention and drop token-level events from old runs."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            expired = [r[0] for r in db.execute(
+                "SELECT run_id FROM runs WHERE started_at < ?", (now - retention_days * 86400,)
+            )] if retention_days > 0 else []
+            for run_id in expired:
+                db.execute("DELETE FROM events WHERE run_id = ?", (run_id,))
+                db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            compacted = 0
+            if compact_after_h > 0:
+                marks = ",".join("?" * len(COMPACTABLE_EVENTS))
+                stale = [r[0] for r in db.execute(
+                    "SELECT run_id FROM runs WHERE compacted = 0 AND status != 'running' AND updated_at < ?",
+                    (now - compact_after_h * 3600,),
+                )]
+                for run_id in stale:
+                    compacted += db.execute(
+                        f"DELETE FROM events WHERE run_id = ? AND event IN ({marks})",
+                        (run_id, *COMPACTABLE_EVENTS),
+                    ).rowcount
+                    db.execute(
+                        "UPDATE runs SET compacted = 1, event_count = (SELECT COUNT(*) FROM events WHERE run_id = ?)"
+                        " WHERE run_id = ?",
+                        (run_id, run_id),
+                    )
+            if expired or compacted:
+                db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"expired_runs": len(expired), "compacted_events": compacted}
+
+    async def amaintain(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self.maintain)
+
+
+def _run_dict(row: Tuple) -> Dict[str, Any]:
+    run_id, question, status, started_at, updated_at, event_count, compacted = row
+    return {
+        "run_id": run_id,
+        "question": question,
+        "status": status,
+        "started_at": started_at,
+        "updated_at": updated_at,
+        "event_count": event_count,
+        "compacted": bool(compacted),
+    }
+
+
+event_store = EventStore()
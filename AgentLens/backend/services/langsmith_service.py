@@ -1,61 +1,216 @@
-from langsmith import Client
-from core.config import LANGSMITH_PROJECT
+import asyncio
+import datetime
+import logging
+import sqlite3
+import time
+import uuid
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
-client = Client()
+from core.cache import cache
+from core.metrics import metrics
+from core.config import (
+    CACHE_ENABLED,
+    LANGSMITH_PROJECT,
+    TRACE_PAGE_SIZE,
+    TRACE_MAX_RUNS,
+    TRACE_CACHE_TTL_S,
+)
 
-async def fetch_trace(run_id: str):
+# The fields the trace views use; everything else stays on the server
+TRACE_FIELDS = (
+    "id", "name", "run_type", "status", "error", "parent_run_id", "trace_id", "dotted_order",
+    "start_time", "end_time", "total_tokens", "prompt_tokens", "completion_tokens", "total_cost",
+)
+
+log = logging.getLogger(__name__)
+
+TRACE_SECONDS = metrics.histogram("agentlens_trace_fetch_seconds", "LangSmith trace fetch time by outcome", ("outcome",))
+
+NOT_FOUND = "No runs found. Make sure LangSmith tracing is enabled and the run_id is correct."
+
+_client = None
+
+
+def get_client():
+    """The LangSmith client, created on first use."""
+    global _client
+    if _client is None:
+        from langsmith import Client
+        _client = Client()
+    return _client
+
+
+def set_client(client) -> None:
+    """Swap in another client (e.g. fakes.langsmith.FakeLangSmithClient)."""
+    global _client
+    _client = client
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, float) or value is None or isinstance(value, (str, int, bool)):
+        return value
+    return str(value)
+
+
+def project_run(run: Any) -> Dict[str, Any]:
+    return {f: _jsonable(getattr(run, f, None)) for f in TRACE_FIELDS}
+
+
+def _take(it: Iterator[Any], n: int) -> List[Dict[str, Any]]:
+    # Runs in a worker thread: the SDK fetches the next page as the iterator advances
+    page = []
+    for run in it:
+        page.append(project_run(run))
+        if len(page) >= n:
+            break
+    return page
+
+
+async def _pages(page_size: int, max_runs: int, **query) -> AsyncIterator[List[Dict[str, Any]]]:
+    client = get_client()
+    it = await asyncio.to_thread(lambda: iter(client.list_runs(select=list(TRACE_FIELDS), **query)))
+    fetched = 0
+    while fetched < max_runs:
+        want = min(page_size, max_runs - fetched)
+        page = await asyncio.to_thread(_take, it, want)
+        if not page:
+            return
+        fetched += len(page)
+        yield page
+        if len(page) < want:
+            return
+
+
+def _find_trace_id(run_id: str) -> Optional[str]:
+    runs = list(get_client().list_runs(run_ids=[run_id], select=["id", "trace_id"], limit=1))
+    return str(runs[0].trace_id) if runs else None
+
+
+async def iter_trace_pages(
+    run_id: str,
+    page_size: int = TRACE_PAGE_SIZE,
+    max_runs: int = TRACE_MAX_RUNS,
+) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Yield (trace_id, runs) pages of the trace `run_id` belongs to, as they arrive.
+
+    Every LangSmith call runs in a worker thread. Our run ids are the root
+    run's id, which is also its trace id, so that is tried first; any other
+    run id is resolved to its trace with one extra lookup.
+    """
+    trace_id = run_id
+    found = False
+    async for page in _pages(page_size, max_runs, project_name=LANGSMITH_PROJECT, trace_id=trace_id):
+        found = True
+        yield trace_id, page
+    if found:
+        return
+    trace_id = await asyncio.to_thread(_find_trace_id, run_id)
+    if trace_id is None or trace_id == run_id:
+        return
+    async for page in _pages(page_size, max_runs, project_name=LANGSMITH_PROJECT, trace_id=trace_id):
+        yield trace_id, page
+
+
+def is_complete(runs: List[Dict[str, Any]]) -> bool:
+    """A trace is complete once every run in it has ended."""
+    return bool(runs) and all(r.get("end_time") and r.get("status") not in ("pending", "running") for r in runs)
+
+
+async def _cached(run_id: str) -> Optional[Dict[str, Any]]:
+    if not CACHE_ENABLED:
+        return None
     try:
-        # Try to find the run by ID first
-        try:
-            runs = list(
-                client.list_runs(
-                    project_name=LANGSMITH_PROJECT,
-                    filter=f'eq(id,"{run_id}")',
-                    limit=1
-                )
-            )
-        except Exception as e:
-            # If filter fails, try without project filter
-            try:
-                runs = list(
-                    client.list_runs(
-                        filter=f'eq(id,"{run_id}")',
-                        limit=1
-                    )
-                )
-            except:
-                # Last resort: try to get by trace_id if run_id looks like a trace_id
-                runs = []
-        
-        if not runs:
-            # Try searching by trace_id as fallback
-            try:
-                runs = list(
-                    client.list_runs(
-                        project_name=LANGSMITH_PROJECT,
-                        trace_id=run_id,
-                        limit=10
-                    )
-                )
-            except:
-                runs = []
-        
-        if not runs:
-            return {"run_id": run_id, "runs": [], "error": "No runs found. Make sure LangSmith tracing is enabled and the run_id is correct."}
+        return await cache.aget("trace", run_id)
+    except (ValueError, zlib.error, sqlite3.Error) as e:
+        log.warning("Trace cache read failed", extra={"run_id": run_id, "error": str(e)})
+        return None
+
+
+async def _store(run_id: str, trace: Dict[str, Any]) -> None:
+    # Only finished traces are cached; a running one would go stale
+    if not CACHE_ENABLED or not trace["complete"]:
+        return
+    try:
+        await cache.aset("trace", run_id, trace, TRACE_CACHE_TTL_S)
+    except (TypeError, ValueError, sqlite3.Error) as e:
+        log.warning("Trace cache write failed", extra={"run_id": run_id, "error": str(e)})
 
-        root = runs[0]
-        # fetch full tree by trace_id
-        trace_id = root.trace_id
-        tree = list(client.list_runs(project_name=LANGSMITH_PROJECT, trace_id=trace_id, limit=100))
+
+async def _load_trace(run_id: str) -> Optional[Dict[str, Any]]:
+    cached = await _cached(run_id)
+    if cached is not None:
+        return cached
+    trace_id, runs = None, []
+    async for trace_id, page in iter_trace_pages(run_id):
+        runs.extend(page)
+    if not runs:
+        return None
+    truncated = len(runs) >= TRACE_MAX_RUNS
+    trace = {
+        "run_id": run_id,
+        "trace_id": trace_id,
+        "complete": is_complete(runs) and not truncated,
+        "truncated": truncated,
+        "runs": runs,
+    }
+    await _store(run_id, trace)
+    return trace
+
+
+async def fetch_trace(run_id: str, offset: int = 0, limit: Optional[int] = None):
+    start = time.perf_counter()
+    try:
+        # Concurrent requests for the same trace share one fetch
+        trace = await cache.flight.do(f"trace:{run_id}", lambda: _load_trace(run_id))
+        TRACE_SECONDS.observe(time.perf_counter() - start, outcome="ok" if trace is not None else "not_found")
+        if trace is None:
+            return {"run_id": run_id, "runs": [], "error": NOT_FOUND}
+        runs = trace["runs"]
+        end = len(runs) if limit is None else min(len(runs), offset + limit)
         return {
-            "run_id": run_id,
-            "trace_id": str(trace_id),
-            "runs": [r.dict() for r in tree],
+            **trace,
+            "total": len(runs),
+            "offset": offset,
+            "next_offset": end if end < len(runs) else None,
+            "runs": runs[offset:end],
         }
     except Exception as e:
+        TRACE_SECONDS.observe(time.perf_counter() - start, outcome="error")
+        log.warning("Trace fetch failed", extra={"run_id": run_id, "error": str(e)})
         return {
             "run_id": run_id,
             "runs": [],
             "error": f"Error fetching trace: {str(e)}"
         }
 
+
+async def stream_trace(run_id: str, page_size: int = TRACE_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """Yield {"trace_id", "runs"} pages; the final item carries "done" (and "error" if any)."""
+    try:
+        cached = await _cached(run_id)
+        if cached is not None:
+            runs = cached["runs"]
+            for i in range(0, len(runs), page_size):
+                yield {"trace_id": cached["trace_id"], "runs": runs[i:i + page_size]}
+            yield {"done": True, "complete": True, "total": len(runs)}
+            return
+        trace_id, runs = None, []
+        async for trace_id, page in iter_trace_pages(run_id, page_size):
+            runs.extend(page)
+            yield {"trace_id": trace_id, "runs": page}
+        if not runs:
+            yield {"done": True, "error": NOT_FOUND}
+            return
+        truncated = len(runs) >= TRACE_MAX_RUNS
+        complete = is_complete(runs) and not truncated
+        await _store(run_id, {
+            "run_id": run_id, "trace_id": trace_id, "complete": complete, "truncated": truncated, "runs": runs,
+        })
+        yield {"done": True, "complete": complete, "total": len(runs)}
+    except Exception as e:
+        yield {"done": True, "error": f"Error fetching trace: {str(e)}"}
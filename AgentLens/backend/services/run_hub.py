@@ -0,0 +1,113 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from agents.serialization import dumps
+from core.config import RUN_HUB_BUFFER_EVENTS
+from services.event_store import event_store
+
+
+class _Entry:
+    """A buffered event and its JSON text, encoded on first use and then shared."""
+
+    __slots__ = ("event", "_encoded")
+
+    def __init__(self, event: Dict[str, Any]):
+        self.event = event
+        self._encoded: Optional[str] = None
+
+    @property
+    def step_index(self) -> int:
+        return self.event.get("step_index", -1)
+
+    @property
+    def encoded(self) -> str:
+        if self._encoded is None:
+            self._encoded = dumps(self.event).decode("utf-8")
+        return self._encoded
+
+
+class RunTopic:
+    """Live events of one run, fanned out to every attached subscriber.
+
+    Subscribers are EventChannel-like: `publish(event, encoded=None)` for
+    live events, `backfill` / `replay` for the run so far. Each event is
+    serialized at most once, whatever the number of subscribers. The last
+    `buffer_size` events are kept so a subscriber attaching mid-run starts
+    from step 0 (older steps come from the event store) and then continues
+    live, without gaps or repeats.
+    """
+
+    def __init__(self, run_id: str, buffer_size: int = RUN_HUB_BUFFER_EVENTS):
+        self.run_id = run_id
+        self.subscribers: Dict[int, Any] = {}
+        self.closed = False
+        self.done = asyncio.Event()
+        # Cancel the run once its last subscriber leaves (runs started by a websocket)
+        self.cancel_when_unwatched = False
+        self.published = 0
+        self._buffer: Deque[_Entry] = deque(maxlen=max(1, buffer_size))
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        entry = _Entry(event)
+        self._buffer.append(entry)
+        self.published += 1
+        for subscriber in list(self.subscribers.values()):
+            subscriber.publish(event, entry.encoded)
+
+    async def attach(self, subscriber: Any) -> None:
+        """Replay the run so far to `subscriber`, then subscribe it to live events."""
+        delivered = -1
+        while self._buffer and self._buffer[0].step_index > delivered + 1:
+            # Steps evicted from the buffer; the store has every appended event
+            older = await event_store.get_events(
+                self.run_id, delivered + 1, self._buffer[0].step_index - 1, limit=10**9
+            )
+            if not older:
+                break
+            await subscriber.replay((event, None) for event in older)
+            delivered = older[-1].get("step_index", delivered)
+        # No await from here on: nothing can be published in between
+        subscriber.backfill((entry.event, entry.encoded) for entry in self._buffer if entry.step_index > delivered)
+        if not self.closed:
+            self.subscribers[id(subscriber)] = subscriber
+
+    def detach(self, subscriber: Any) -> None:
+        self.subscribers.pop(id(subscriber), None)
+
+    def close(self) -> None:
+        self.closed = True
+        self.subscribers.clear()
+        self.done.set()
+
+
+class RunHub:
+    """In-process registry of live runs by run_id."""
+
+    def __init__(self, buffer_size: int = RUN_HUB_BUFFER_EVENTS):
+        self.buffer_size = buffer_size
+        self._topics: Dict[str, RunTopic] = {}
+
+    def open(self, run_id: str) -> RunTopic:
+        topic = self._topics.get(run_id)
+        if topic is None:
+            topic = self._topics[run_id] = RunTopic(run_id, self.buffer_size)
+        return topic
+
+    def get(self, run_id: str) -> Optional[RunTopic]:
+        return self._topics.get(run_id)
+
+    def close(self, run_id: str) -> None:
+        topic = self._topics.pop(run_id, None)
+        if topic is not None:
+            topic.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "live_runs": len(self._topics),
+            "subscribers": sum(len(t.subscribers) for t in self._topics.values()),
+            "buffered_events": sum(len(t._buffer) for t in self._topics.values()),
+        }
+
+
+run_hub = RunHub()
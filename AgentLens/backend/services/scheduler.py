@@ -0,0 +1,266 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, Callable, Dict, List, Optional
+
+from langsmith import uuid7
+
+from agents.registry import get_graph
+from agents.research_graph import is_final_event, stream_graph
+from core.config import RUN_WORKERS, RUN_QUEUE_MAX, RUN_TENANT_LIMIT
+from core.metrics import metrics
+from services.run_hub import RunTopic, run_hub
+
+# Finished jobs kept for status lookups (the event store has the rest)
+_FINISHED_HISTORY = 1000
+
+log = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """The scheduler's queue is at capacity; the caller should retry later."""
+
+
+class Job:
+    """One submitted run: its place in the queue, its task once started, its outcome."""
+
+    def __init__(
+        self,
+        question: str,
+        tenant: str,
+        priority: int,
+        extraction_mode: Optional[str],
+        sink: Optional[Callable[[Dict[str, Any]], None]],
+        resume_from: Optional[Dict[str, Any]] = None,
+    ):
+        self.run_uuid = uuid7()
+        self.run_id = str(self.run_uuid)
+        self.question = question
+        self.tenant = tenant
+        self.priority = priority
+        self.extraction_mode = extraction_mode
+        # Called with every event of the run (e.g. a websocket channel's publish)
+        self.sink = sink
+        # {"run_id", "checkpoint_id", "mode"}: continue another run's checkpoint
+        self.resume_from = resume_from
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.final_state: Optional[Dict[str, Any]] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.done = asyncio.Event()
+        # Live viewers attach here (see services/run_hub.py)
+        self.topic: RunTopic = run_hub.open(self.run_id)
+
+    def to_dict(self, position: Optional[int] = None) -> Dict[str, Any]:
+        out = {
+            "run_id": self.run_id,
+            "status": self.status,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if position is not None:
+            out["position"] = position
+        if self.resume_from is not None:
+            out["resumed_from"] = self.resume_from
+        if self.error:
+            out["error"] = self.error
+        if self.status == COMPLETED:
+            out["final_state"] = self.final_state
+        return out
+
+
+class RunScheduler:
+    """Admission control for graph runs.
+
+    - at most `max_workers` runs execute at once, each as its own task
+    - waiting runs queue by priority (higher first, then submission order),
+      up to `max_queue`; beyond that `submit` raises QueueFull
+    - a tenant never has more than `tenant_limit` runs executing; its
+      queued runs wait without blocking other tenants behind them
+    - cancelling a run removes it from the queue or cancels its task, which
+      unwinds the graph and its in-flight fetches and model calls
+    """
+
+    def __init__(
+        self,
+        max_workers: int = RUN_WORKERS,
+        max_queue: int = RUN_QUEUE_MAX,
+        tenant_limit: int = RUN_TENANT_LIMIT,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self.tenant_limit = max(1, tenant_limit)
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._running: Dict[str, Job] = {}
+        self._by_tenant: Dict[str, int] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()
+
+    def submit(
+        self,
+        question: str,
+        tenant: str = "default",
+        priority: int = 0,
+        extraction_mode: Optional[str] = None,
+        sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+        resume_from: Optional[Dict[str, Any]] = None,
+    ) -> Job:
+        if len(self._queue) >= self.max_queue:
+            raise QueueFull(f"Run queue is full ({self.max_queue} waiting)")
+        job = Job(question, tenant, priority, extraction_mode, sink, resume_from)
+        self._jobs[job.run_id] = job
+        heapq.heappush(self._queue, (-priority, next(self._seq), job))
+        self._dispatch()
+        return job
+
+    def _dispatch(self) -> None:
+        while self._queue and len(self._running) < self.max_workers:
+            # Highest priority whose tenant has a free slot
+            for entry in sorted(self._queue):
+                if self._by_tenant.get(entry[2].tenant, 0) < self.tenant_limit:
+                    break
+            else:
+                return
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._start(entry[2])
+
+    def _start(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._running[job.run_id] = job
+        self._by_tenant[job.tenant] = self._by_tenant.get(job.tenant, 0) + 1
+        job.task = asyncio.create_task(self._run(job), name=f"run:{job.run_id}")
+        job.task.add_done_callback(lambda task: self._reap(job))
+
+    async def _run(self, job: Job) -> None:
+        try:
+            graph = get_graph()
+            async with aclosing(stream_graph(graph, job.question, job.extraction_mode, job.run_uuid, job.resume_from)) as events:
+                async for event in events:
+                    if is_final_event(event):
+                        job.final_state = (event.get("data") or {}).get("output")
+                    job.topic.publish(event)
+                    if job.sink is not None:
+                        job.sink(event)
+            job.status = COMPLETED
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            log.warning("Run failed", extra={"run_id": job.run_id, "tenant": job.tenant, "error": str(e)})
+        finally:
+            self._finish(job)
+
+    def _reap(self, job: Job) -> None:
+        # A task cancelled before its first step never ran _run's cleanup
+        if not job.done.is_set():
+            job.status = CANCELLED
+            self._finish(job)
+
+    def _finish(self, job: Job) -> None:
+        job.finished_at = time.time()
+        if self._running.pop(job.run_id, None) is not None:
+            left = self._by_tenant.get(job.tenant, 1) - 1
+            if left:
+                self._by_tenant[job.tenant] = left
+            else:
+                self._by_tenant.pop(job.tenant, None)
+        self._jobs.pop(job.run_id, None)
+        self._finished[job.run_id] = job
+        while len(self._finished) > _FINISHED_HISTORY:
+            self._finished.popitem(last=False)
+        run_hub.close(job.run_id)
+        job.done.set()
+        self._dispatch()
+
+    def get(self, run_id: str) -> Optional[Job]:
+        return self._jobs.get(run_id) or self._finished.get(run_id)
+
+    def status(self, run_id: str) -> Optional[Dict[str, Any]]:
+        job = self.get(run_id)
+        if job is None:
+            return None
+        position = None
+        if job.status == QUEUED:
+            position = next(i for i, entry in enumerate(sorted(self._queue)) if entry[2] is job)
+        return job.to_dict(position)
+
+    def cancel(self, run_id: str) -> bool:
+        """Cancel a queued or running run; False if unknown or already finished."""
+        job = self._jobs.get(run_id)
+        if job is None:
+            return False
+        if job.status == QUEUED:
+            self._queue = [entry for entry in self._queue if entry[2] is not job]
+            heapq.heapify(self._queue)
+            job.status = CANCELLED
+            self._finish(job)
+        elif job.task is not None:
+            job.task.cancel()
+        return True
+
+    async def cancel_and_wait(self, run_id: str) -> None:
+        """Cancel a run and return once its task has fully unwound."""
+        job = self._jobs.get(run_id)
+        if job is None:
+            return
+        self.cancel(run_id)
+        await job.done.wait()
+
+    async def wait(self, job: Job) -> Job:
+        """Wait for a run to finish; if the waiter is cancelled, so is the run."""
+        try:
+            await asyncio.shield(job.done.wait())
+        except asyncio.CancelledError:
+            self.cancel(job.run_id)
+            raise
+        return job
+
+    def snapshot(self) -> Dict[str, Any]:
+        queued_by_tenant: Dict[str, int] = {}
+        for _, _, job in self._queue:
+            queued_by_tenant[job.tenant] = queued_by_tenant.get(job.tenant, 0) + 1
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "tenant_limit": self.tenant_limit,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "running_by_tenant": dict(self._by_tenant),
+            "queued_by_tenant": queued_by_tenant,
+        }
+
+    async def aclose(self) -> None:
+        """Cancel everything (app shutdown)."""
+        for entry in list(self._queue):
+            self.cancel(entry[2].run_id)
+        running = list(self._running.values())
+        for job in running:
+            job.task.cancel()
+        await asyncio.gather(*(job.done.wait() for job in running))
+
+
+run_scheduler = RunScheduler()
+
+metrics.gauge("agentlens_runs_running", "Runs holding a worker slot", fn=lambda: len(run_scheduler._running))
+metrics.gauge("agentlens_runs_queued", "Runs waiting for a worker slot", fn=lambda: len(run_scheduler._queue))
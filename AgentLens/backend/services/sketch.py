@@ -0,0 +1,80 @@
+import math
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+class LogHistogram:
+    """Mergeable quantile sketch over positive values (log-spaced buckets).
+
+    Bucket i covers (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a),
+    so any quantile is answered within relative error `a`. The bucket range
+    is fixed, which makes merging an array add and a quantile query a
+    cumulative sum over a constant number of buckets, however many values
+    were recorded. Values below `min_value` count in the first bucket and
+    values above `max_value` in the last.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-3, max_value: float = 1e8):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        size = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _compatible(self, other: "LogHistogram") -> bool:
+        return (
+            other.relative_accuracy == self.relative_accuracy
+            and other.min_value == self.min_value
+            and other.max_value == self.max_value
+        )
+
+    def add(self, value: float) -> None:
+        self.add_many([value])
+
+    def add_many(self, values: Iterable[float]) -> None:
+        arr = np.asarray(values if isinstance(values, np.ndarray) else list(values), dtype=np.float64)
+        arr = arr[np.isfinite(arr)]
+        if arr.size == 0:
+            return
+        clipped = np.clip(arr, self.min_value, self.max_value)
+        idx = np.ceil(np.log(clipped) / self._log_gamma).astype(np.int64) - self._offset
+        np.clip(idx, 0, self.counts.size - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.counts.size)
+        self.count += int(arr.size)
+        self.sum += float(arr.sum())
+        self.min = min(self.min, float(arr.min()))
+        self.max = max(self.max, float(arr.max()))
+
+    def merge(self, other: "LogHistogram") -> None:
+        if not self._compatible(other):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+        self.counts += other.counts
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        i = int(np.searchsorted(np.cumsum(self.counts), rank, side="right"))
+        i = min(i, self.counts.size - 1)
+        # Midpoint of the bucket in relative terms
+        value = 2 * self._gamma ** (i + self._offset) / (self._gamma + 1)
+        return min(max(value, self.min), self.max)
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[str, Optional[float]]:
+        return {f"p{round(q * 100):g}": self.quantile(q) for q in qs}
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
@@ -0,0 +1,53 @@
+"""Test setup: run from backend/ with `python -m pytest`.
+
+Settings are read from the environment when core.config is imported, so
+the stores are pointed at a scratch directory (and tracing off) before
+any test module imports the app.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND))
+
+_scratch = tempfile.mkdtemp(prefix="agentlens-tests-")
+os.environ.update({
+    "LANGSMITH_TRACING": "false",
+    "CACHE_PATH": os.path.join(_scratch, "cache.sqlite"),
+    "EVENT_STORE_PATH": os.path.join(_scratch, "events.sqlite"),
+    "CHECKPOINT_PATH": os.path.join(_scratch, "checkpoints.sqlite"),
+    "STARTUP_WARMUP": "lazy",
+})
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def stubs():
+    """The local model endpoint and page server (fakes/), for the whole session."""
+    from types import SimpleNamespace
+
+    from fakes.openai_stub import start_stub
+    from fakes.web_stub import start_pages
+
+    llm_server, llm_url, llm_stats = start_stub()
+    page_server, pages_url, page_stats = start_pages(page_kb=16)
+    yield SimpleNamespace(llm_url=llm_url, llm_stats=llm_stats, pages_url=pages_url, page_stats=page_stats)
+    llm_server.shutdown()
+    page_server.shutdown()
+
+
+@pytest.fixture
+def offline(stubs, monkeypatch):
+    """Point model calls and web search at the stubs."""
+    from agents import llm
+    from agents.nodes import researcher
+    from fakes.web_stub import make_search
+
+    monkeypatch.setattr(llm, "OPENAI_BASE_URL", stubs.llm_url)
+    monkeypatch.setattr(llm.llm_gateway, "_clients", {})
+    monkeypatch.setattr(researcher, "search_web", make_search(stubs.pages_url, stats=stubs.page_stats))
+    return stubs
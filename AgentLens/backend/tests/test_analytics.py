@@ -0,0 +1,165 @@
+import json
+
+import numpy as np
+import pytest
+
+from agents.research_graph import build_payload
+from agents.snapshots import SnapshotEncoder
+from benchmarks.bench_micro import FIXTURES, load_fixture
+from services.analytics_service import MODEL_EVENTS, NODE_EVENTS, FleetAnalytics, RunRecorder, _usage, model_price
+from services.sketch import LogHistogram
+
+DISTRIBUTIONS = {
+    "lognormal": lambda rng: rng.lognormal(mean=5, sigma=1.5, size=5000),
+    "uniform": lambda rng: rng.uniform(0.5, 2000, size=3000),
+    "bimodal": lambda rng: np.concatenate([rng.normal(20, 2, 1000), rng.normal(3000, 100, 200)]).clip(0.01),
+    "few": lambda rng: np.array([3.0, 7.0, 7.0, 400.0]),
+}
+
+
+@pytest.mark.parametrize("name", DISTRIBUTIONS)
+def test_quantiles_within_relative_error(name):
+    values = DISTRIBUTIONS[name](np.random.default_rng(7))
+    sketch = LogHistogram(relative_accuracy=0.01)
+    sketch.add_many(values)
+    for q in (0, 0.1, 0.5, 0.9, 0.95, 0.99, 1):
+        # The sketch answers with the value at rank q * (n - 1), rounded down
+        exact = float(np.quantile(values, q, method="lower"))
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.01), q
+    assert sketch.count == values.size
+    assert sketch.mean == pytest.approx(values.mean())
+
+
+def test_merge_matches_one_sketch_fed_both():
+    rng = np.random.default_rng(3)
+    a, b = rng.lognormal(4, 1, 2000), rng.lognormal(6, 0.5, 500)
+    left, right, both = LogHistogram(), LogHistogram(), LogHistogram()
+    left.add_many(a)
+    right.add_many(b)
+    both.add_many(np.concatenate([a, b]))
+    left.merge(right)
+    assert np.array_equal(left.counts, both.counts)
+    assert (left.count, left.min, left.max) == (both.count, both.min, both.max)
+    assert left.sum == pytest.approx(both.sum)
+    assert left.quantiles((0.5, 0.95, 0.99)) == both.quantiles((0.5, 0.95, 0.99))
+    with pytest.raises(ValueError):
+        left.merge(LogHistogram(relative_accuracy=0.05))
+
+
+def test_empty_and_out_of_range():
+    sketch = LogHistogram(min_value=1, max_value=1000)
+    assert sketch.quantile(0.5) is None and sketch.mean is None
+    sketch.add_many([0.001, float("nan"), 5e6])
+    # Out-of-range values land in the edge buckets, never beyond what was seen
+    assert 0.001 <= sketch.quantile(0) <= 1 and 1000 <= sketch.quantile(1) <= 5e6
+    assert sketch.count == 2
+
+
+def reference_metrics(events):
+    """The per-event loop: pair start/end events by span id in a dict."""
+    spans = {}
+    for e in events:
+        kind = e.get("event")
+        if "span_id" not in e or e.get("ts") is None:
+            continue
+        node = (e.get("metadata") or {}).get("langgraph_node") or ""
+        is_model = kind in MODEL_EVENTS
+        if not is_model and not (kind in NODE_EVENTS and node and e.get("name") == node):
+            continue
+        span = spans.setdefault(e["span_id"], {"model": is_model, "node": node, "in": 0, "out": 0})
+        if is_model:
+            span["name"] = (e.get("metadata") or {}).get("ls_model_name") or e.get("name") or "unknown"
+        if kind.endswith("_end"):
+            span["end"] = e["ts"]
+            if is_model:
+                span["in"], span["out"] = _usage(e)
+        else:
+            span["start"] = e["ts"]
+    nodes, models = {}, {}
+    for span in spans.values():
+        latency = (span["end"] - span["start"]) * 1000 if "start" in span and "end" in span else None
+        cost = 0.0
+        if span["model"]:
+            price_in, price_out = model_price(span["name"])
+            cost = (span["in"] * price_in + span["out"] * price_out) / 1_000_000
+            groups = [(models, span["name"], True), (nodes, span["node"], False)]
+        else:
+            groups = [(nodes, span["node"], True)]
+        for table, key, counts_call in groups:
+            entry = table.setdefault(key, {"calls": 0, "samples": [], "in": 0, "out": 0, "cost": 0.0, "llm_calls": 0})
+            if counts_call:
+                entry["calls"] += 1
+                if latency is not None:
+                    entry["samples"].append(latency)
+            else:
+                entry["llm_calls"] += 1
+            if span["model"]:
+                entry["in"] += span["in"]
+                entry["out"] += span["out"]
+                entry["cost"] += cost
+    return nodes, models
+
+
+@pytest.fixture(scope="module")
+def trace_events():
+    trace = load_fixture(FIXTURES / "traces" / "research_run.json.gz")
+    encoder = SnapshotEncoder()
+    return [json.loads(json.dumps(build_payload(step, "run", i, encoder))) for i, step in enumerate(trace)]
+
+
+def test_run_metrics_match_the_per_event_loop(trace_events):
+    recorder = RunRecorder("run")
+    for event in trace_events:
+        recorder.observe(event)
+    metrics = recorder.metrics("completed")
+    nodes, models = reference_metrics(trace_events)
+
+    assert models and nodes
+    for table, got in ((models, metrics["models"]), (nodes, metrics["nodes"])):
+        assert set(got) == set(table)
+        for name, want in table.items():
+            entry = got[name]
+            assert entry["calls"] == want["calls"], name
+            assert sorted(entry["samples_ms"]) == pytest.approx(sorted(round(v, 3) for v in want["samples"]))
+            assert (entry["input_tokens"], entry["output_tokens"]) == (want["in"], want["out"])
+            assert entry["cost_usd"] == pytest.approx(want["cost"])
+            assert entry.get("llm_calls", 0) == want["llm_calls"]
+    totals = metrics["totals"]
+    assert totals["llm_calls"] == sum(m["calls"] for m in models.values())
+    assert totals["input_tokens"] == sum(m["in"] for m in models.values())
+    assert totals["cost_usd"] == pytest.approx(sum(m["cost"] for m in models.values()))
+    timestamps = [e["ts"] for e in trace_events]
+    assert metrics["duration_ms"] == pytest.approx((max(timestamps) - min(timestamps)) * 1000)
+
+
+def test_interleaved_calls_pair_by_span():
+    def e(kind, span, ts, **extra):
+        return {"event": kind, "span_id": span, "ts": ts, "name": "ChatOpenAI",
+                "metadata": {"langgraph_node": "researcher", "ls_model_name": "gpt-4o-mini"}, **extra}
+
+    usage = {"output": {"usage_metadata": {"input_tokens": 1000, "output_tokens": 100}}}
+    recorder = RunRecorder("run")
+    for event in [
+        e("on_chat_model_start", "a", 1.0), e("on_chat_model_start", "b", 1.1),
+        e("on_chat_model_end", "b", 1.3, data=usage), e("on_chat_model_end", "a", 1.5, data=usage),
+    ]:
+        recorder.observe(event)
+    model = recorder.metrics()["models"]["gpt-4o-mini"]
+    assert model["calls"] == 2
+    assert sorted(model["samples_ms"]) == pytest.approx([200.0, 500.0])
+    assert model["cost_usd"] == pytest.approx(2 * (1000 * 0.15 + 100 * 0.60) / 1e6)
+
+
+def test_fleet_rollups_merge_runs(trace_events):
+    recorder = RunRecorder("run")
+    for event in trace_events:
+        recorder.observe(event)
+    metrics = recorder.metrics("completed")
+    fleet = FleetAnalytics()
+    fleet.add_runs([metrics, metrics])
+    fleet.add_run(metrics)
+    snapshot = fleet.snapshot()
+    assert snapshot["runs"]["count"] == 3
+    assert snapshot["runs"]["total_tokens"] == 3 * metrics["totals"]["total_tokens"]
+    for name, entry in metrics["nodes"].items():
+        assert snapshot["nodes"][name]["calls"] == 3 * entry["calls"]
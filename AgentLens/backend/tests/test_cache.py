@@ -0,0 +1,169 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import core.cache
+from core.cache import DiskCache, SingleFlight, canonical_url
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(core.cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def disk(tmp_path):
+    store = DiskCache(str(tmp_path / "cache.sqlite"), max_bytes=10_000)
+    yield store
+    store.close()
+
+
+def test_canonical_url():
+    assert canonical_url("HTTPS://Example.com:443/a?b=2&a=1&utm_source=x#frag") == "https://example.com/a?a=1&b=2"
+    assert canonical_url("http://example.com:8080") == "http://example.com:8080/"
+
+
+def test_ttl_expiry(disk, clock):
+    disk.set("search", "q", {"results": [1]}, ttl=10)
+    assert disk.get("search", "q") == {"results": [1]}
+    clock.now += 10
+    assert disk.get("search", "q") is None
+    assert disk.stats["search"]["hits"] == 1
+    assert disk.stats["search"]["misses"] == 1
+    assert disk.snapshot()["entries"] == 0
+
+
+def test_lru_eviction_keeps_recently_read(disk, clock):
+    # Random hex compresses to about half; room for four and a half entries
+    disk.set("page", "0", os.urandom(1500).hex(), ttl=3600)
+    disk.max_bytes = int(disk.snapshot()["bytes"] * 4.5)
+    for i in range(1, 4):
+        disk.set("page", str(i), os.urandom(1500).hex(), ttl=3600)
+    assert disk.get("page", "0") is not None
+    disk.set("page", "4", os.urandom(1500).hex(), ttl=3600)
+
+    assert disk.get("page", "1") is None
+    for key in ("0", "2", "3", "4"):
+        assert disk.get("page", key) is not None
+    assert disk.stats["page"]["evictions"] == 1
+    assert disk.snapshot()["bytes"] <= disk.max_bytes
+
+
+def test_size_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = DiskCache(path)
+    first.set("page", "a", "x" * 5000, ttl=3600)
+    size = first.snapshot()["bytes"]
+    first.close()
+    second = DiskCache(path)
+    assert second.snapshot()["bytes"] == size
+    second.close()
+
+
+def test_get_or_fetch_caches_non_empty_results(disk):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"text": "page"} if len(calls) > 1 else {}
+
+    async def main():
+        # Empty results are returned but not stored
+        assert await disk.get_or_fetch("page", "u", fetch, ttl=60) == {}
+        assert await disk.get_or_fetch("page", "u", fetch, ttl=60) == {"text": "page"}
+        assert await disk.get_or_fetch("page", "u", fetch, ttl=60) == {"text": "page"}
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_singleflight_shares_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert len(calls) == 1
+    assert flight.shared == 4
+
+
+def test_singleflight_cancelled_caller_leaves_others_intact():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "value"
+
+    async def main():
+        # The first caller starts the call, then times out while another
+        # caller (another run) is waiting on the same key
+        first = asyncio.create_task(asyncio.wait_for(flight.do("k", fetch), 0.05))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.do("k", fetch))
+        with pytest.raises(asyncio.TimeoutError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "value"
+    assert len(calls) == 1
+
+
+def test_singleflight_cancels_call_when_every_caller_left():
+    flight = SingleFlight()
+    state = {}
+
+    async def fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def main():
+        callers = [asyncio.create_task(flight.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        # A later caller starts a fresh call instead of joining the cancelled one
+        state["after"] = await flight.do("k", lambda: asyncio.sleep(0, "fresh"))
+
+    asyncio.run(main())
+    assert state == {"cancelled": True, "after": "fresh"}
+
+
+def test_singleflight_failure_reaches_every_caller():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
@@ -0,0 +1,169 @@
+import asyncio
+import json
+from typing import List, Optional
+
+from api.channel import CLOSE_TOO_SLOW, EventChannel, Subscription
+from services.run_hub import RunTopic
+
+
+class FakeWebSocket:
+    """Records frames; while `stalled`, a send never completes (a client not reading)."""
+
+    def __init__(self, stalled: bool = False):
+        self.frames: List[dict] = []
+        self.stalled = stalled
+        self.close_code: Optional[int] = None
+
+    async def send_text(self, text: str) -> None:
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.frames.append(json.loads(text))
+
+    async def close(self, code: int = 1000) -> None:
+        self.close_code = code
+
+
+def node_event(i: int) -> dict:
+    return {"event": "on_chain_end", "name": f"node_{i}", "step": i}
+
+
+def token_event(i: int) -> dict:
+    return {"event": "on_chat_model_stream", "name": "model", "step": i}
+
+
+def test_batches_keep_order():
+    ws = FakeWebSocket()
+
+    async def main():
+        channel = EventChannel(ws, batch_ms=50)
+        channel.publish(token_event(0))
+        channel.publish(token_event(1))
+        channel.publish(node_event(2))
+        await channel.aclose()
+
+    asyncio.run(main())
+    assert ws.frames[0] == {"type": "batch", "events": [token_event(0), token_event(1)]}
+    assert ws.frames[1] == node_event(2)
+
+
+def test_subscription_filters_events():
+    ws = FakeWebSocket()
+
+    async def main():
+        channel = EventChannel(ws, Subscription(events=["on_chain_end"]), batch_ms=0)
+        channel.publish(token_event(0))
+        channel.publish(node_event(1))
+        await channel.aclose()
+
+    asyncio.run(main())
+    assert ws.frames == [node_event(1)]
+
+
+def test_stalled_client_drops_high_rate_events_first():
+    ws = FakeWebSocket(stalled=True)
+
+    async def main():
+        channel = EventChannel(ws, batch_ms=0, max_frames=4, close_frames=100)
+        for i in range(10):
+            channel.publish(token_event(i))
+        channel.publish(node_event(10))
+        await asyncio.sleep(0)
+        result = (channel.dropped, len(channel._frames), channel.overflowed)
+        channel.cancel()
+        return result
+
+    # Four token frames queue and six are dropped; the node event is queued
+    # past max_frames, then the stalled sender takes one frame
+    assert asyncio.run(main()) == (6, 4, False)
+
+
+def test_stalled_client_is_closed_past_the_frame_cap():
+    ws = FakeWebSocket(stalled=True)
+
+    async def main():
+        channel = EventChannel(ws, batch_ms=0, max_frames=4, close_frames=8)
+        for i in range(20):
+            channel.publish(node_event(i))
+        await channel.aclose()
+        return channel
+
+    channel = asyncio.run(main())
+    assert channel.overflowed and channel.closed
+    assert ws.close_code == CLOSE_TOO_SLOW
+    assert not channel._frames and channel._queued_bytes == 0
+
+
+def test_stalled_client_is_closed_past_the_byte_cap():
+    ws = FakeWebSocket(stalled=True)
+
+    async def main():
+        channel = EventChannel(ws, batch_ms=0, close_frames=1000, close_bytes=10_000)
+        big = {"event": "on_chain_end", "name": "node", "state_snapshot": {"notes": "x" * 3000}}
+        for _ in range(5):
+            channel.publish(big)
+        await channel.aclose()
+        return channel
+
+    channel = asyncio.run(main())
+    assert channel.overflowed
+    assert ws.close_code == CLOSE_TOO_SLOW
+
+
+def delivered_steps(frames: List[dict]) -> List[int]:
+    steps = []
+    for frame in frames:
+        events = frame["events"] if frame.get("type") == "batch" else [frame]
+        steps.extend(event["step"] for event in events)
+    return steps
+
+
+def test_replay_sends_every_event():
+    ws = FakeWebSocket()
+    # Far more frames than max_frames; nothing of a replay may be dropped
+    events = [node_event(i) if i % 3 == 0 else token_event(i) for i in range(3000)]
+
+    async def main():
+        channel = EventChannel(ws, max_frames=4, max_batch=50)
+        await channel.replay((event, None) for event in events)
+        await channel.aclose()
+        return channel
+
+    channel = asyncio.run(main())
+    assert channel.dropped == 0 and not channel.overflowed
+    assert delivered_steps(ws.frames) == list(range(3000))
+
+
+def test_backfill_then_live_events():
+    ws = FakeWebSocket()
+
+    async def main():
+        channel = EventChannel(ws, batch_ms=0, max_frames=4, close_frames=8)
+        # More backfilled frames than either live limit
+        channel.backfill((node_event(i), None) for i in range(20))
+        channel.publish(node_event(20))
+        channel.publish(token_event(21))
+        await channel.aclose()
+        return channel
+
+    channel = asyncio.run(main())
+    assert not channel.overflowed
+    assert delivered_steps(ws.frames) == list(range(22))
+
+
+def test_attach_mid_run_replays_then_follows_live():
+    ws = FakeWebSocket()
+
+    async def main():
+        topic = RunTopic("run", buffer_size=5000)
+        for i in range(2000):
+            topic.publish({**(token_event(i) if i % 4 else node_event(i)), "step_index": i})
+        channel = EventChannel(ws, batch_ms=0, max_frames=8)
+        await topic.attach(channel)
+        for i in range(2000, 2010):
+            topic.publish({**node_event(i), "step_index": i})
+        await channel.aclose()
+        return channel
+
+    channel = asyncio.run(main())
+    assert channel.dropped == 0
+    assert delivered_steps(ws.frames) == list(range(2010))
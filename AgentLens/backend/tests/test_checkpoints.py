@@ -0,0 +1,134 @@
+import asyncio
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import pytest
+
+import services.checkpoint_store
+from agents.nodes import synthesizer
+from agents.research_graph import build_graph, is_final_event, stream_graph
+from services.checkpoint_store import SqliteCheckpointer, _checkpoint_id, find_checkpoint, list_checkpoints
+
+QUESTION = "How do research agents checkpoint their state?"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SqliteCheckpointer(str(tmp_path / "checkpoints.sqlite"))
+    monkeypatch.setattr(services.checkpoint_store, "checkpoint_store", store)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def failing_synthesizer(monkeypatch):
+    """The synthesizer fails on its first call only."""
+    real = synthesizer.synthesizer_node
+    calls = {"n": 0}
+
+    async def flaky(state, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("synthesizer blew up")
+        return await real(state, **kwargs)
+
+    monkeypatch.setattr(synthesizer, "synthesizer_node", flaky)
+    return calls
+
+
+async def run(graph, question: str = QUESTION, resume_from: Optional[Dict[str, Any]] = None) -> Tuple[str, Any]:
+    run_uuid = uuid.uuid4()
+    final = None
+    async for event in stream_graph(graph, question, run_id_uuid=run_uuid, resume_from=resume_from):
+        if is_final_event(event):
+            final = (event.get("data") or {}).get("output")
+    return str(run_uuid), final
+
+
+def test_list_and_find_checkpoints(offline, store):
+    async def main():
+        graph = build_graph(checkpoints=True)
+        run_id, final = await run(graph)
+        everything = await list_checkpoints(graph, run_id, limit=1000)
+        latest = await list_checkpoints(graph, run_id, limit=2)
+        at_step = await find_checkpoint(graph, run_id, step=2)
+        newest = await find_checkpoint(graph, run_id)
+        return final, everything, latest, at_step, newest
+
+    final, everything, latest, at_step, newest = asyncio.run(main())
+    assert final["final"]
+    steps = [c["step"] for c in everything]
+    assert steps == list(range(-1, len(steps) - 1))
+    assert everything[1]["nodes"] == ["__start__"] and everything[-1]["next"] == []
+    # The latest two, oldest first, with the nodes that produced them
+    assert latest == everything[-2:]
+    assert at_step.metadata["step"] == 2
+    assert at_step.config["configurable"]["checkpoint_id"] == everything[3]["checkpoint_id"]
+    assert newest.config["configurable"]["checkpoint_id"] == everything[-1]["checkpoint_id"]
+
+
+def test_list_limit_and_step_filter_in_sql(offline, store):
+    async def main():
+        graph = build_graph(checkpoints=True)
+        run_id, _ = await run(graph)
+        return run_id
+
+    run_id = asyncio.run(main())
+    config = {"configurable": {"thread_id": run_id, "checkpoint_ns": ""}}
+    decoded = []
+    real_tuple = store._tuple
+    store._tuple = lambda db, row: decoded.append(row[2]) or real_tuple(db, row)
+    assert [t.metadata["step"] for t in store.list(config, limit=2)] == [4, 3]
+    assert [t.metadata["step"] for t in store.list(config, filter={"step": 1})] == [1]
+    # Only the rows returned were read back
+    assert len(decoded) == 3
+
+
+def test_resume_failed_run_reuses_research(offline, store, stubs, failing_synthesizer):
+    async def main():
+        graph = build_graph(checkpoints=True)
+        # A question of its own, so no model call is answered from the cache
+        question = "How does a resumed run pick up where it failed?"
+        failed_id = str(uuid.uuid4())
+        with pytest.raises(RuntimeError):
+            async for _ in stream_graph(graph, question, run_id_uuid=uuid.UUID(failed_id)):
+                pass
+        failed = await find_checkpoint(graph, failed_id)
+        before = (stubs.llm_stats.requests, stubs.page_stats.requests)
+        run_id, final = await run(
+            graph, question, resume_from={"run_id": failed_id, "checkpoint_id": _checkpoint_id(failed), "mode": "resume"}
+        )
+        after = (stubs.llm_stats.requests, stubs.page_stats.requests)
+        resumed = await find_checkpoint(graph, run_id, step=failed.metadata["step"])
+        return failed, resumed, final, before, after
+
+    failed, resumed, final, before, after = asyncio.run(main())
+    assert failed.next == ("synthesizer",)
+    assert final["final"]
+    # Only the synthesizer ran again: no new searches or page fetches
+    assert after[0] - before[0] == 1
+    assert after[1] == before[1]
+    # The resumed run's time budget starts when it does
+    assert resumed.values["started_at"] > failed.values["started_at"]
+    assert resumed.values["notes"] == failed.values["notes"]
+
+
+def test_fork_reruns_from_checkpoint(offline, store):
+    async def main():
+        graph = build_graph(checkpoints=True)
+        source_id, _ = await run(graph)
+        supervised = await find_checkpoint(graph, source_id, step=1)
+        run_id, final = await run(
+            graph, resume_from={"run_id": source_id, "checkpoint_id": _checkpoint_id(supervised), "mode": "fork"}
+        )
+        source = await list_checkpoints(graph, source_id)
+        forked = await list_checkpoints(graph, run_id)
+        return supervised, source, forked, final
+
+    supervised, source, forked, final = asyncio.run(main())
+    assert supervised.next == ("researcher",)
+    assert final["final"]
+    # The fork shares the history up to the fork point, then runs on its own
+    assert [c["checkpoint_id"] for c in forked[:3]] == [c["checkpoint_id"] for c in source[:3]]
+    assert forked[3]["nodes"] == ["researcher"] and forked[3]["checkpoint_id"] != source[3]["checkpoint_id"]
+    assert forked[-1]["next"] == []
@@ -0,0 +1,120 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from agents.nodes.context import BM25_B, BM25_K1, bm25_scores, estimate_tokens, pack_context, split_chunks, terms
+
+WORDS = "agents checkpoint state retry graph node model token budget cache drift source latency".split()
+QUESTION = "How do agents checkpoint state?"
+
+
+def random_documents(rng: random.Random):
+    return [
+        {
+            "title": f"Doc {i}",
+            "url": f"https://example.com/{i}",
+            "content": ". ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 15))) for _ in range(rng.randint(0, 60))
+            ),
+        }
+        for i in range(rng.randint(1, 6))
+    ]
+
+
+def reference_bm25(query, chunks):
+    """Textbook BM25, one chunk and one term at a time."""
+    docs = [terms(c) for c in chunks]
+    avgdl = (sum(len(d) for d in docs) / len(docs)) or 1.0
+    scores = []
+    for d in docs:
+        score = 0.0
+        for t in dict.fromkeys(terms(query)):
+            df = sum(1 for other in docs if t in other)
+            tf = d.count(t)
+            idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(d) / avgdl))
+        scores.append(score)
+    return scores
+
+
+def test_bm25_matches_the_formula():
+    rng = random.Random(1)
+    chunks = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 20))) for _ in range(40)]
+    assert bm25_scores(QUESTION, chunks) == pytest.approx(reference_bm25(QUESTION, chunks))
+    assert bm25_scores(QUESTION, []).size == 0
+    # Nothing to score against: stopwords only, or no chunk shares a term
+    assert not bm25_scores("What is the", chunks).any()
+    assert not bm25_scores("unrelated words", chunks).any()
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_packed_context_fits_the_budget(seed):
+    rng = random.Random(seed)
+    budget = rng.randint(20, 800)
+    packed, stats = pack_context(QUESTION, random_documents(rng), budget, chunk_chars=rng.choice([8, 50, 200, 400]))
+    assert estimate_tokens(packed) <= budget
+    assert stats["packed_tokens"] == estimate_tokens(packed)
+
+
+def test_many_short_chunks_fit_the_budget():
+    # Separators between small chunks add up: they must be counted too
+    doc = {"title": "T", "url": "u", "content": " ".join(["agent x."] * 200)}
+    for budget in range(10, 200, 7):
+        packed, _ = pack_context("agent", [doc], budget, chunk_chars=8)
+        assert estimate_tokens(packed) <= budget
+
+
+def test_higher_scoring_chunks_are_kept_first():
+    sentences = [f"{' '.join(random.Random(i).choices(WORDS, k=6))} filler{i:03d}." for i in range(60)]
+    doc = {"title": "T", "url": "https://example.com", "content": " ".join(sentences)}
+    chunks = split_chunks(doc["content"], 60)
+    scores = bm25_scores(QUESTION, chunks)
+    packed, stats = pack_context(QUESTION, [doc], 120, chunk_chars=60)
+    kept = [i for i, c in enumerate(chunks) if c in packed]
+    dropped = [i for i in range(len(chunks)) if i not in kept]
+    assert 0 < stats["packed_chunks"] == len(kept) < len(chunks)
+    assert min(scores[kept]) >= max(scores[dropped])
+    # Kept chunks stay in document order
+    assert [packed.index(chunks[i]) for i in kept] == sorted(packed.index(chunks[i]) for i in kept)
+
+
+def test_every_document_gets_its_best_chunk():
+    docs = [
+        {"title": "Strong", "url": "https://example.com/a", "content": "Agents checkpoint state. " * 80},
+        {"title": "Weak", "url": "https://example.com/b", "content": "Latency of the cache. " * 80},
+    ]
+    packed, _ = pack_context(QUESTION, docs, 200, chunk_chars=100)
+    assert "https://example.com/a" in packed and "https://example.com/b" in packed
+    assert packed.count("Latency") < packed.count("Agents")
+
+
+def test_tokens_saved():
+    rng = random.Random(5)
+    docs = random_documents(rng) + [{"title": "Empty", "url": "https://example.com/empty", "content": ""}]
+    full = "\n\n".join(f"TITLE: {d['title']}\nURL: {d['url']}\nCONTENT:\n{d['content']}" for d in docs)
+    packed, stats = pack_context(QUESTION, docs, 100, chunk_chars=200)
+    assert stats["input_tokens"] == estimate_tokens(full)
+    assert stats["tokens_saved"] == stats["input_tokens"] - estimate_tokens(packed) > 0
+    # Sources that fit are passed through whole
+    whole, stats = pack_context(QUESTION, docs, stats["input_tokens"])
+    assert whole == full and stats["tokens_saved"] == 0
+    assert pack_context(QUESTION, docs, 0)[0] == full
+
+
+def test_empty_documents_and_unmatched_query():
+    docs = [
+        {"title": "Empty", "url": "https://example.com/empty", "content": ""},
+        {"title": "Text", "url": "https://example.com/text", "content": "Some words here. " * 100},
+    ]
+    packed, stats = pack_context("quantum chromodynamics", docs, 60, chunk_chars=100)
+    assert estimate_tokens(packed) <= 60
+    assert "https://example.com/empty" not in packed
+    # With every score equal, chunks go in document order
+    chunks = split_chunks(docs[1]["content"], 100)
+    assert packed.endswith(" ... ".join(chunks[: stats["packed_chunks"]]))
+    assert pack_context(QUESTION, [], 60) == ("", {
+        "input_tokens": 0, "packed_tokens": 0, "tokens_saved": 0, "chunks": 0, "packed_chunks": 0,
+    })
+    assert np.array_equal(bm25_scores("quantum", split_chunks("")), np.zeros(0))
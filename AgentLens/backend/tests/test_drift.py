@@ -0,0 +1,85 @@
+import pytest
+
+from benchmarks.bench_micro import FIXTURES, load_fixture
+from services.drift_service import NO_CONTENT, Vocabulary, compute_drift, compute_drift_batch
+
+DOCS = [{"title": "Agents", "url": "https://example.com/a", "content": "Agents checkpoint their state after every step."}]
+
+EDGE_STATES = [
+    {},
+    {"question": "What is drift?"},
+    {"question": "", "draft": "An answer without a question."},
+    {"question": "???", "draft": "No question words to overlap with."},
+    {"question": "Why do agents checkpoint?", "final": "Agents checkpoint state. " * 40},
+    {"question": "Why do agents checkpoint?", "draft": "", "final": "Only a final answer."},
+    {"question": "Café naïve Ünïcode words", "draft": "café NAÏVE words"},
+    {
+        "question": "How do agents checkpoint state?",
+        "draft": "Agents checkpoint their state after every step (source: https://example.com/a).",
+        "citations": ["https://example.com/a"] * 5,
+        "documents": DOCS,
+    },
+    {
+        "question": "How do agents checkpoint state?",
+        "draft": "Unrelated text (source: https://example.com/missing).",
+        "citations": None,
+        "documents": DOCS,
+    },
+]
+
+
+def assert_same(batch, single):
+    assert len(batch) == len(single)
+    for got, want in zip(batch, single):
+        assert got.keys() == want.keys()
+        for key, value in want.items():
+            if isinstance(value, float):
+                assert got[key] == pytest.approx(value, abs=1e-12), key
+            else:
+                assert got[key] == value, key
+
+
+@pytest.mark.parametrize("grounding", [False, True])
+def test_batch_matches_single_on_edge_cases(grounding):
+    assert_same(
+        compute_drift_batch(EDGE_STATES, grounding=grounding),
+        [compute_drift(s, grounding=grounding) for s in EDGE_STATES],
+    )
+    assert compute_drift_batch([]) == []
+    assert compute_drift_batch([{}])[0] == NO_CONTENT
+
+
+@pytest.mark.parametrize("grounding", [False, True])
+def test_batch_matches_single_on_recorded_states(grounding):
+    states = load_fixture(FIXTURES / "states" / "run_states.json.gz")
+    assert_same(
+        compute_drift_batch(states, grounding=grounding),
+        [compute_drift(s, grounding=grounding) for s in states],
+    )
+
+
+def test_grounding_only_when_asked():
+    state = EDGE_STATES[-1]
+    assert "support_score" not in compute_drift_batch([state])[0]
+    grounded = compute_drift_batch([state], grounding=True)[0]
+    assert grounded["unknown_citations"] == 1
+    assert "Some citations are not among the retrieved documents." in grounded["flags"]
+
+
+def test_batches_share_the_vocabulary(monkeypatch):
+    # A later batch brings new question words: drafts cached by the first
+    # batch must be re-reduced against them
+    monkeypatch.setattr("services.drift_service.drift_vocab", Vocabulary())
+    draft = "Agents checkpoint state and retry failed steps."
+    first = [{"question": "How do agents checkpoint?", "draft": draft}]
+    second = [{"question": "How do agents retry failed steps?", "draft": draft}]
+    assert_same(compute_drift_batch(first), [compute_drift(s, grounding=False) for s in first])
+    assert_same(compute_drift_batch(second), [compute_drift(s, grounding=False) for s in second])
+    assert_same(compute_drift_batch(first + second), [compute_drift(s, grounding=False) for s in first + second])
+
+
+def test_vocabulary_reset_keeps_results(monkeypatch):
+    monkeypatch.setattr("services.drift_service.drift_vocab", Vocabulary(max_words=4, max_texts=1))
+    states = [{"question": f"word{i} shared words here", "draft": f"shared word{i} here"} for i in range(6)]
+    for state in states:
+        assert_same(compute_drift_batch([state]), [compute_drift(state, grounding=False)])
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from agents.research_graph import build_payload
+from agents.snapshots import SnapshotEncoder
+from benchmarks.bench_micro import FIXTURES, load_fixture
+from services.event_store import COMPACTABLE_EVENTS, EventStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / "events.sqlite"), batch_size=10, flush_ms=10_000)
+    yield store
+    asyncio.run(store.aclose())
+
+
+def event(run_id: str, i: int) -> dict:
+    kind = "on_chat_model_stream" if i % 2 else "on_chain_end"
+    node = "researcher" if i < 10 else "synthesizer"
+    return {"run_id": run_id, "step_index": i, "event": kind, "metadata": {"langgraph_node": node}, "ts": 1000.0 + i}
+
+
+def test_append_then_read(store):
+    async def main():
+        store.start_run("a", "question a")
+        for i in range(25):
+            store.append(event("a", i))
+        store.append(event("b", 0))
+        # A full batch wakes the writer long before its timer, and it takes
+        # everything queued by then
+        await asyncio.sleep(0.1)
+        batches = store.batches
+        everything = await store.get_events("a")
+        ranged = await store.get_events("a", start=5, end=8)
+        by_node = await store.get_events("a", node="synthesizer", event="on_chain_end")
+        by_kinds = await store.get_events("a", event=["on_chain_end", "on_chat_model_stream"], limit=3)
+        store.finish_run("a", "completed")
+        return batches, everything, ranged, by_node, by_kinds, await store.get_run("a"), await store.list_runs()
+
+    batches, everything, ranged, by_node, by_kinds, run, runs = asyncio.run(main())
+    assert batches == 1 and store.written == 26
+    assert everything == [event("a", i) for i in range(25)]
+    assert [e["step_index"] for e in ranged] == [5, 6, 7, 8]
+    assert [e["step_index"] for e in by_node] == [10, 12, 14, 16, 18, 20, 22, 24]
+    assert [e["step_index"] for e in by_kinds] == [0, 1, 2]
+    assert (run["question"], run["status"], run["event_count"]) == ("question a", "completed", 25)
+    assert {r["run_id"] for r in runs} == {"a", "b"}
+
+
+@pytest.fixture(scope="module")
+def trace_payloads():
+    trace = load_fixture(FIXTURES / "traces" / "research_run.json.gz")
+    full, delta = SnapshotEncoder(keyframe_interval=1), SnapshotEncoder(keyframe_interval=3)
+    # What the run streamed (full snapshots) and what it stored (keyframes and patches)
+    live = [json.loads(json.dumps(build_payload(step, "run", i, full))) for i, step in enumerate(trace)]
+    stored = [json.loads(json.dumps(build_payload(step, "run", i, delta))) for i, step in enumerate(trace)]
+    return live, stored
+
+
+def test_state_at_matches_live_snapshots(store, trace_payloads):
+    live, stored = trace_payloads
+
+    async def main():
+        store.start_run("run", "q")
+        for payload in stored:
+            store.append(payload)
+        return {p["step_index"]: await store.state_at("run", p["step_index"]) for p in live}, await store.state_at("run")
+
+    states, latest = asyncio.run(main())
+    snapshots = {p["step_index"]: p["state_snapshot"] for p in live if "state_snapshot" in p}
+    assert any("state_patch" in p for p in stored)
+    current = None
+    for step in sorted(states):
+        current = snapshots.get(step, current)
+        assert states[step] == current
+    assert latest == current
+
+
+def test_maintain_expires_and_compacts(store, trace_payloads):
+    _, stored = trace_payloads
+
+    async def main():
+        for run_id in ("old", "stale", "fresh"):
+            store.start_run(run_id, "q")
+            for payload in stored:
+                store.append({**payload, "run_id": run_id})
+            store.finish_run(run_id, "completed")
+        await store.flush()
+        now = time.time()
+        with store._lock:
+            db = store._db()
+            db.execute("UPDATE runs SET started_at = ?, updated_at = ? WHERE run_id = 'old'", (now - 40 * 86400,) * 2)
+            db.execute("UPDATE runs SET updated_at = ? WHERE run_id = 'stale'", (now - 48 * 3600,))
+        before = await store.state_at("stale")
+        result = store.maintain(retention_days=30, compact_after_h=24)
+        return result, before, [await store.get_run(r) for r in ("old", "stale", "fresh")], await store.state_at("stale"), {
+            r: await store.get_events(r, event=COMPACTABLE_EVENTS) for r in ("stale", "fresh")
+        }
+
+    result, before, (old, stale, fresh), after, tokens = asyncio.run(main())
+    n_tokens = sum(1 for p in stored if p["event"] in COMPACTABLE_EVENTS)
+    assert n_tokens > 0
+    assert result == {"expired_runs": 1, "compacted_events": n_tokens}
+    assert old is None
+    assert stale["compacted"] and stale["event_count"] == len(stored) - n_tokens
+    assert not fresh["compacted"] and len(tokens["fresh"]) == n_tokens
+    assert tokens["stale"] == []
+    # Snapshots and patches survive compaction
+    assert after == before
+
+
+def test_writers_wait_when_the_store_falls_behind(tmp_path):
+    store = EventStore(str(tmp_path / "events.sqlite"), batch_size=5, flush_ms=10_000, max_pending=20)
+    write = store._write
+
+    def slow_write(items):
+        time.sleep(0.02)
+        write(items)
+
+    store._write = slow_write
+    peak = 0
+
+    async def main():
+        nonlocal peak
+        for i in range(200):
+            store.append(event("a", i))
+            peak = max(peak, len(store._pending))
+            if store.backlogged:
+                await store.wait_for_room()
+        return await store.get_events("a")
+
+    try:
+        events = asyncio.run(main())
+    finally:
+        asyncio.run(store.aclose())
+    assert len(events) == 200
+    assert peak <= store.max_pending
+    assert store.stalls > 0
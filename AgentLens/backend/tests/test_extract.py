@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+from agents.nodes.extract import StreamingDecoder, StreamingTextExtractor, bs4_html_to_text, stream_html_to_text
+
+PAGES = sorted((Path(__file__).parent.parent / "benchmarks" / "fixtures" / "html").glob("*.html"))
+
+SNIPPETS = [
+    "<p>Fish &amp; chips &lt;3 &copy; 2024 &#65;&#x42; &nbsp;end</p>",
+    "<p>Bare refs: AT&T, &amp without semicolon, &#x41x, &unknown; &#;</p>",
+    "<head><title>Title</title><style>p { color: red }</style><script>var a = '<p>no</p>';</script></head>"
+    "<body><noscript>enable js</noscript><p>shown</p></body>",
+    "<div>before<template><p>hidden</p></template>after</div><ruby>漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby>",
+    "<p>one<br>two<img src=x>three<hr/>four</p>",
+    "<!-- a comment --><p>text<!-- inside --> more</p><![CDATA[ cdata ]]>",
+    "<ul><li>unclosed<li>items<p>para</ul>   lots   of\n\n whitespace \t here",
+    "<!DOCTYPE html><html><body><p>Ünïcode – “quotes” 😀</p></body></html>",
+    "",
+    "plain text, no tags at all",
+]
+
+
+def chunked(html: str, max_chars: int, size: int) -> str:
+    extractor = StreamingTextExtractor(max_chars)
+    for i in range(0, len(html), size):
+        if extractor.feed(html[i:i + size]):
+            break
+    return extractor.text()
+
+
+@pytest.mark.parametrize("path", PAGES, ids=lambda path: path.stem)
+@pytest.mark.parametrize("max_chars", [200, 6000, 10 ** 7])
+def test_pages_match_bs4(path, max_chars):
+    html = path.read_text(encoding="utf-8")
+    expected = bs4_html_to_text(html, max_chars)
+    assert stream_html_to_text(html, max_chars) == expected
+    assert chunked(html, max_chars, 16 * 1024) == expected
+    assert chunked(html, max_chars, 1000) == expected
+
+
+@pytest.mark.parametrize("html", SNIPPETS)
+def test_snippets_match_bs4(html):
+    expected = bs4_html_to_text(html, 6000)
+    assert stream_html_to_text(html, 6000) == expected
+    # Chunk boundaries fall inside tags, entities and comments
+    for size in (1, 3, 5):
+        assert chunked(html, 6000, size) == expected
+
+
+def test_decoder_splits_multibyte_characters():
+    html = "<p>Ünïcode – “quotes” 😀 and more</p>" * 20
+    raw = html.encode("utf-8")
+    decoder = StreamingDecoder("utf-8", 6000)
+    for i in range(0, len(raw), 5):
+        decoder.feed(raw[i:i + 5])
+    assert decoder.text() == bs4_html_to_text(html, 6000)
+
+
+def test_stops_reading_at_max_chars():
+    extractor = StreamingTextExtractor(100)
+    assert extractor.feed("<p>" + "word " * 100 + "</p>")
+    assert extractor.done
+    assert len(extractor.text()) <= 100
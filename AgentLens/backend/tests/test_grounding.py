@@ -0,0 +1,103 @@
+import copy
+
+import pytest
+
+from agents import grounding
+from agents.grounding import DocumentIndex, get_index, grounding_report, split_sentences
+
+A, B, C = "https://example.com/a", "https://example.com/b", "https://example.com/c"
+
+DOCS = [
+    {"title": "A", "url": A, "content": "LangGraph agents checkpoint their state after every step."},
+    {"title": "B", "url": B, "content": "Retries resume a failed run from the last checkpoint."},
+]
+
+
+@pytest.mark.parametrize("draft,expected", [
+    (
+        f"Frameworks, e.g. LangGraph, checkpoint state (source: {A}). Dr. Smith et al. found retries work vs. restarts (source: {B}).",
+        [("Frameworks, e.g. LangGraph, checkpoint state .", [A]), ("Dr. Smith et al. found retries work vs. restarts .", [B])],
+    ),
+    (
+        f"Agents checkpoint state (source: {A}) (source: {B})(source: {C}). Version 3.5 of the U.S. rules applies.",
+        [("Agents checkpoint state  .", [A, B, C]), ("Version 3.5 of the U.S. rules applies.", [])],
+    ),
+    (
+        f"Agents checkpoint state. (source: {A}) (source: {B}) Retries resume runs.",
+        [("Agents checkpoint state.", [A, B]), ("Retries resume runs.", [])],
+    ),
+    (
+        f"- First bullet (source: {A})\n- Second bullet\n\n(source: {B})\nIs it fast? Mostly! (source: {C})",
+        [("- First bullet", [A]), ("- Second bullet", [B]), ("Is it fast?", []), ("Mostly!", [C])],
+    ),
+    ("", []),
+    (f"(source: {A})", []),
+])
+def test_split_sentences(draft, expected):
+    assert split_sentences(draft) == expected
+
+
+def test_unknown_citations_are_counted_once():
+    draft = (
+        f"Agents checkpoint their state after every step (source: {A}#intro) (source: {C}). "
+        f"Retries resume a failed run (source: https://EXAMPLE.com/b?utm_source=x) (source: {C}). "
+        f"Made-up claim (source: https://example.com/missing)."
+    )
+    report = grounding_report(draft, DOCS)
+    assert report["unknown_citations"] == [C, "https://example.com/missing"]
+    assert report["cited_sentences"] == 3
+    first, second, third = report["sentences"]
+    # A sentence citing a known and an unknown source keeps the known one's support
+    assert first["cited_support"] == pytest.approx(1.0)
+    assert second["cited_support"] > 0.5
+    assert third["cited_support"] == 0.0
+    assert report["unsupported"] == 1
+
+
+def test_no_documents():
+    report = grounding_report(f"Agents checkpoint state (source: {A}). Uncited.", [])
+    assert report["unknown_citations"] == [A]
+    assert report["sentences"][1] == {
+        "sentence": "Uncited.", "cited": [], "cited_support": None, "best_url": None, "best_support": 0.0,
+    }
+    assert grounding_report("", DOCS)["support_score"] is None
+
+
+def test_index_is_reused_for_the_same_documents(monkeypatch):
+    monkeypatch.setattr(grounding, "_cache", type(grounding._cache)())
+    built = []
+    monkeypatch.setattr(grounding, "DocumentIndex", lambda docs: built.append(docs) or DocumentIndex(docs))
+
+    index = get_index(DOCS)
+    # Equal documents (e.g. the same state deserialized again) share the index
+    assert get_index(copy.deepcopy(DOCS)) is index
+    grounding_report(f"Agents checkpoint state (source: {A}).", DOCS)
+    assert len(built) == 1
+    changed = [DOCS[0], {**DOCS[1], "content": "Something else."}]
+    assert get_index(changed) is not index
+    assert get_index(list(reversed(DOCS))) is not index
+    assert len(built) == 3
+
+
+def test_index_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(grounding, "_cache", type(grounding._cache)())
+    monkeypatch.setattr(grounding, "_INDEX_CACHE_SIZE", 3)
+    sets = [[{"url": f"{A}/{i}", "content": f"text {i}"}] for i in range(5)]
+    first = get_index(sets[0])
+    for docs in sets[1:4]:
+        get_index(docs)
+    assert len(grounding._cache) == 3
+    assert get_index(sets[0]) is not first
+    # Most recently used stays
+    recent = get_index(sets[3])
+    get_index(sets[4])
+    assert get_index(sets[3]) is recent
+
+
+def test_find_matches_canonical_urls():
+    index = DocumentIndex(DOCS)
+    assert index.find(A) == 0
+    assert index.find("https://Example.com/b#section") == 1
+    assert index.find(C) is None
+    # Memoized, including misses
+    assert index._found == {A: 0, "https://Example.com/b#section": 1, C: None}
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from fakes.langsmith import FakeLangSmithClient
+from services import langsmith_service
+from services.langsmith_service import TRACE_FIELDS, fetch_trace, iter_trace_pages, stream_trace
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    client = FakeLangSmithClient(page_size=25)
+    monkeypatch.setattr(langsmith_service, "_client", client)
+    return client
+
+
+async def collect(run_id: str, **kwargs):
+    return [(trace_id, page) async for trace_id, page in iter_trace_pages(run_id, **kwargs)]
+
+
+def test_pages_carry_only_the_trace_fields(fake):
+    run_id = fake.add_trace(n_runs=100)
+    fake.add_trace(n_runs=10)
+    pages = asyncio.run(collect(run_id, page_size=40))
+    assert [len(page) for _, page in pages] == [40, 40, 20]
+    assert {trace_id for trace_id, _ in pages} == {run_id}
+    assert all(set(run) == set(TRACE_FIELDS) for _, page in pages for run in page)
+    # Datetimes and UUIDs come back as JSON-ready strings
+    first = pages[0][1][0]
+    assert first["id"] == run_id and isinstance(first["start_time"], str)
+    assert fake.pages_served == 4
+
+
+def test_stops_at_max_runs(fake):
+    run_id = fake.add_trace(n_runs=100)
+    pages = asyncio.run(collect(run_id, page_size=40, max_runs=50))
+    assert [len(page) for _, page in pages] == [40, 10]
+    # The rest of the trace is never requested
+    assert fake.pages_served == 2
+
+
+def test_child_run_id_resolves_to_its_trace(fake):
+    root_id = fake.add_trace(n_runs=30)
+    child_id = str(fake.runs[5]["id"])
+    pages = asyncio.run(collect(child_id, page_size=100))
+    assert [trace_id for trace_id, _ in pages] == [root_id]
+    assert len(pages[0][1]) == 30
+    assert asyncio.run(collect("00000000-0000-0000-0000-000000000000")) == []
+
+
+def test_fetch_caches_complete_traces_only(fake):
+    done_id = fake.add_trace(n_runs=60)
+    open_id = fake.add_trace(n_runs=60, complete=False)
+
+    async def main():
+        first = await fetch_trace(done_id, offset=0, limit=25)
+        calls = fake.calls
+        second = await fetch_trace(done_id, offset=50, limit=25)
+        cached_calls = fake.calls - calls
+        running = await fetch_trace(open_id)
+        calls = fake.calls
+        await fetch_trace(open_id)
+        return first, second, cached_calls, running, fake.calls - calls
+
+    first, second, cached_calls, running, running_calls = asyncio.run(main())
+    assert first["complete"] and first["total"] == 60
+    assert (len(first["runs"]), first["next_offset"]) == (25, 25)
+    assert (len(second["runs"]), second["next_offset"]) == (10, None)
+    assert cached_calls == 0
+    assert not running["complete"]
+    assert running_calls > 0
+
+
+def test_concurrent_fetches_share_one_listing(fake):
+    fake.page_latency_s = 0.05
+    run_id = fake.add_trace(n_runs=60)
+
+    async def main():
+        return await asyncio.gather(*(fetch_trace(run_id) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert all(result["total"] == 60 for result in results)
+    assert fake.calls == 1
+
+
+def test_paging_does_not_block_the_loop(fake):
+    fake.page_latency_s = 0.05
+    run_id = fake.add_trace(n_runs=200, complete=False)
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        items = [item async for item in stream_trace(run_id, page_size=25)]
+        ticker.cancel()
+        return items, ticks
+
+    items, ticks = asyncio.run(main())
+    assert [len(item["runs"]) for item in items[:-1]] == [25] * 8
+    assert items[-1] == {"done": True, "complete": False, "total": 200}
+    # Eight pages at 50 ms each; the loop kept running throughout
+    assert ticks >= 20
@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+
+import pytest
+
+from agents import llm
+from agents.llm import LLMGateway, is_timeout, tokens_spent
+from fakes.openai_stub import start_stub
+
+
+@pytest.fixture(scope="module")
+def slow_stub():
+    server, url, stats = start_stub(latency_s=0.3)
+    yield url, stats
+    server.shutdown()
+
+
+def unique_prompt() -> str:
+    # The response cache is shared by the whole session
+    return f"Summarize https://example.com/{uuid.uuid4()}"
+
+
+def test_second_call_is_a_cache_hit(offline):
+    gateway = LLMGateway()
+    prompt = unique_prompt()
+
+    async def main():
+        first = await gateway.ainvoke(prompt, node="test")
+        second = await gateway.ainvoke(prompt, node="test")
+        other = await gateway.ainvoke(prompt, temperature=0.7, node="test")
+        return first, second, other
+
+    before = offline.llm_stats.requests
+    first, second, other = asyncio.run(main())
+    # The temperature is part of the key: the third call is a miss
+    assert offline.llm_stats.requests - before == 2
+    assert second.content == first.content
+    assert not first.response_metadata["cached"] and second.response_metadata["cached"]
+    assert tokens_spent(first) > 0 and tokens_spent(second) == 0
+    assert not other.response_metadata["cached"]
+    totals = gateway.snapshot()["models"][llm.OPENAI_MODEL]
+    assert (totals["calls"], totals["api_calls"], totals["cache_hits"]) == (3, 2, 1)
+
+
+def test_streamed_reply_answers_later_calls(offline):
+    gateway = LLMGateway()
+    prompt = unique_prompt()
+
+    async def main():
+        chunks = [chunk async for chunk in gateway.astream(prompt, node="test")]
+        invoked = await gateway.ainvoke(prompt, node="test")
+        streamed_again = [chunk async for chunk in gateway.astream(prompt, node="test")]
+        return chunks, invoked, streamed_again
+
+    before = offline.llm_stats.requests
+    chunks, invoked, streamed_again = asyncio.run(main())
+    assert offline.llm_stats.requests - before == 1
+    assert len(chunks) > 1
+    full = "".join(chunk.content for chunk in chunks)
+    assert invoked.content == full and invoked.response_metadata["cached"]
+    # A hit arrives as one chunk
+    assert [chunk.content for chunk in streamed_again] == [full]
+
+
+def test_cache_disabled_still_shares_concurrent_calls(offline, slow_stub, monkeypatch):
+    url, stats = slow_stub
+    monkeypatch.setattr(llm, "OPENAI_BASE_URL", url)
+    gateway = LLMGateway(cache_enabled=False)
+    prompt = unique_prompt()
+
+    async def main():
+        together = await asyncio.gather(*(gateway.ainvoke(prompt) for _ in range(4)))
+        later = await gateway.ainvoke(prompt)
+        return together, later
+
+    before = stats.requests
+    together, later = asyncio.run(main())
+    # One request for the four concurrent calls, one for the later call
+    assert stats.requests - before == 2
+    assert len({reply.content for reply in together}) == 1
+    assert not later.response_metadata["cached"]
+
+
+def test_timeout_is_one_unretried_request(offline, slow_stub, monkeypatch):
+    url, stats = slow_stub
+    monkeypatch.setattr(llm, "OPENAI_BASE_URL", url)
+    gateway = LLMGateway()
+
+    async def main():
+        with pytest.raises(Exception) as raised:
+            await gateway.ainvoke(unique_prompt(), timeout=0.1)
+        return raised.value
+
+    before = stats.requests
+    error = asyncio.run(main())
+    assert is_timeout(error)
+    assert stats.requests - before == 1
@@ -0,0 +1,37 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from core.metrics import Registry
+
+
+def test_metrics_route_renders_on_the_event_loop():
+    route = next(r for r in main.app.routes if getattr(r, "path", None) == "/metrics")
+    assert asyncio.iscoroutinefunction(route.endpoint)
+    with TestClient(main.app) as client:
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE agentlens_event_loop_lag_seconds histogram" in response.text
+
+
+def test_render_format():
+    registry = Registry()
+    counter = registry.counter("test_total", "Things", ("kind",))
+    histogram = registry.histogram("test_seconds", "Durations", buckets=(0.1, 1))
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    histogram.observe(0.5)
+    assert registry.render().splitlines() == [
+        "# HELP test_total Things",
+        "# TYPE test_total counter",
+        'test_total{kind="a"} 3',
+        "# HELP test_seconds Durations",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="0.1"} 0',
+        'test_seconds_bucket{le="1"} 1',
+        'test_seconds_bucket{le="+Inf"} 1',
+        "test_seconds_sum 0.5",
+        "test_seconds_count 1",
+    ]
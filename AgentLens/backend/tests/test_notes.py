@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agents.nodes import notes
+from agents.nodes.notes import CITATION, extract_map_reduce, reduce_bullets
+
+A, B, C = "https://example.com/a", "https://example.com/b", "https://example.com/c"
+
+
+def test_near_duplicates_are_kept_once_with_all_sources():
+    merged = reduce_bullets([
+        (A, f"Facts:\n- Agents checkpoint state after every step (source: {A})\n- Retries are bounded."),
+        (B, f"1. Agents checkpoint their state after every step. (source: {B})\n2) Caches cut latency (source: {B})"),
+        (C, f"* agents checkpoint state after every step (source: {C}) (source: {A})"),
+    ])
+    lines = merged.splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith("- Agents checkpoint state after every step")
+    assert CITATION.findall(lines[0]) == [A, B, C]
+    # An uncited bullet can only come from the document it was extracted from
+    assert CITATION.findall(lines[1]) == [A]
+    assert CITATION.findall(lines[2]) == [B]
+
+
+def test_every_kept_bullet_keeps_its_source():
+    per_document = [
+        (A, f"- Fact one about graphs\n- Fact two about nodes (source: {A})\n\n- Header:\n- "),
+        (B, f"- Something else entirely (source: {C})\n- No citation here"),
+    ]
+    merged = reduce_bullets(per_document)
+    lines = merged.splitlines()
+    assert len(lines) == 4
+    for line in lines:
+        assert line.startswith("- ") and CITATION.search(line), line
+    assert {u for line in lines for u in CITATION.findall(line)} == {A, B, C}
+    assert reduce_bullets([]) == ""
+    # Citations alone are not facts
+    assert reduce_bullets([(A, f"- (source: {A})\n- the of and")]) == ""
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Per-document map calls: the document's URL picks the behavior."""
+    calls = {"active": 0, "peak": 0, "timeouts": []}
+
+    async def ainvoke(prompt, timeout=None, **kwargs):
+        calls["active"] += 1
+        calls["peak"] = max(calls["peak"], calls["active"])
+        calls["timeouts"].append(timeout)
+        try:
+            url = prompt.split("URL: ", 1)[1].split("\n", 1)[0]
+            if "slow" in url:
+                # Stands in for the API client's request timeout
+                await asyncio.wait_for(asyncio.sleep(10), timeout)
+            if "broken" in url:
+                raise RuntimeError("server error")
+            await asyncio.sleep(0.01)
+            return AIMessage(
+                content=f"- A fact from {url.rsplit('/', 1)[1]}",
+                usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+            )
+        finally:
+            calls["active"] -= 1
+
+    monkeypatch.setattr(notes.llm_gateway, "ainvoke", ainvoke)
+    return calls
+
+
+def docs(*names):
+    return [{"title": n, "url": f"https://example.com/{n}", "content": f"Content of {n}."} for n in names]
+
+
+def test_a_timed_out_map_call_drops_only_its_document(fake_model):
+    text, stats = asyncio.run(
+        extract_map_reduce("q", docs("one", "slow", "two", "broken", "three"), concurrency=2, timeout=0.05)
+    )
+    lines = text.splitlines()
+    assert [CITATION.findall(line) for line in lines] == [
+        [f"https://example.com/{n}"] for n in ("one", "two", "three")
+    ]
+    assert stats["calls"] == 5 and stats["failed"] == 2 and stats["tokens"] == 45
+    assert stats["packing"]["chunks"] == 5
+    assert fake_model["timeouts"] == [0.05] * 5
+    assert fake_model["peak"] == 2
+
+
+def test_map_reduce_fails_only_when_every_call_errors(fake_model):
+    with pytest.raises(RuntimeError):
+        asyncio.run(extract_map_reduce("q", docs("broken", "broken2"), timeout=0.05))
+    # Timeouts alone leave the round empty rather than failing it
+    text, stats = asyncio.run(extract_map_reduce("q", docs("slow", "slow2"), timeout=0.05))
+    assert text == "" and stats["failed"] == 2
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.nodes.utils import PageFetcher
+from fakes.web_stub import start_pages
+
+
+@pytest.fixture
+def pages():
+    server, base_url, stats = start_pages(page_kb=4, latency_s=0.1)
+    port = server.server_address[1]
+    # Two host names for the same server: per-host limits apply to each
+    yield [f"http://127.0.0.1:{port}", f"http://localhost:{port}"], stats
+    server.shutdown()
+
+
+def test_per_host_limit(pages):
+    (host_a, host_b), stats = pages
+    fetcher = PageFetcher(max_per_host=2, max_connections=50, engine="stream")
+
+    async def main():
+        try:
+            return await fetcher.fetch_many([f"{host}/page/{i}" for i in range(6) for host in (host_a, host_b)])
+        finally:
+            await fetcher.aclose()
+
+    texts = asyncio.run(main())
+    assert all("Page" in t for t in texts)
+    assert stats.peak[host_a.split("//")[1]] == 2
+    assert stats.peak[host_b.split("//")[1]] == 2
+    assert stats.peak_total() == 4
+
+
+def test_connection_limit(pages):
+    (host, _), stats = pages
+    fetcher = PageFetcher(max_per_host=10, max_connections=3, engine="bs4")
+
+    async def main():
+        try:
+            return await fetcher.fetch_many([f"{host}/page/{i}" for i in range(9)])
+        finally:
+            await fetcher.aclose()
+
+    texts = asyncio.run(main())
+    assert all(texts)
+    assert stats.peak_total() == 3
+
+
+def test_a_slow_host_does_not_hold_up_the_others(pages):
+    (host_a, host_b), stats = pages
+    fetcher = PageFetcher(timeout=0.3, max_per_host=1, engine="stream")
+    urls = [f"{host_a}/page/1?delay=3", f"{host_b}/page/2", f"{host_b}/page/3", f"{host_a}/page/4?delay=3"]
+
+    async def main():
+        try:
+            return await fetcher.fetch_many(urls)
+        finally:
+            await fetcher.aclose()
+
+    start = time.perf_counter()
+    texts = asyncio.run(main())
+    # Each slow request times out on its own; the other host's pages arrive
+    assert time.perf_counter() - start < 1.5
+    assert texts[0] == texts[3] == ""
+    assert "Page 2" in texts[1] and "Page 3" in texts[2]
+
+
+def test_cancelling_releases_the_host_slots(pages):
+    (host, _), stats = pages
+    fetcher = PageFetcher(max_per_host=2, engine="stream")
+
+    async def main():
+        task = asyncio.create_task(fetcher.fetch_many([f"{host}/page/{i}?delay=2" for i in range(6)]))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Slots freed: the next fetch doesn't wait behind cancelled ones
+        started = time.perf_counter()
+        text = await fetcher.fetch_text(f"{host}/page/9")
+        elapsed = time.perf_counter() - started
+        await fetcher.aclose()
+        return text, elapsed
+
+    start = time.perf_counter()
+    text, elapsed = asyncio.run(main())
+    assert "Page 9" in text
+    assert elapsed < 1 and time.perf_counter() - start < 1.5
+
+
+def test_client_follows_the_event_loop(pages):
+    (host, _), _ = pages
+    fetcher = PageFetcher(engine="stream")
+
+    async def fetch_and_close(url):
+        try:
+            return await fetcher.fetch_text(url)
+        finally:
+            await fetcher.aclose()
+
+    # A client is bound to its loop: a second loop gets a fresh one
+    assert "Page 1" in asyncio.run(fetcher.fetch_text(f"{host}/page/1"))
+    assert "Page 2" in asyncio.run(fetch_and_close(f"{host}/page/2"))
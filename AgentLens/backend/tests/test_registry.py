@@ -0,0 +1,100 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agents.registry import FALLBACK_SCHEMA, GraphRegistry
+from api import graph_schema
+
+
+class FakeGraph:
+    def __init__(self, *nodes):
+        self.nodes = nodes
+
+    def get_graph(self):
+        if not self.nodes:
+            raise NotImplementedError
+        return SimpleNamespace(
+            nodes=[SimpleNamespace(id=n) for n in self.nodes],
+            edges=[SimpleNamespace(source=a, target=b) for a, b in zip(self.nodes, self.nodes[1:])],
+        )
+
+
+def test_lazy_build_uses_the_builders_version():
+    registry = GraphRegistry()
+    built = []
+
+    def build():
+        time.sleep(0.05)
+        built.append(FakeGraph("a", "b"))
+        return built[-1]
+
+    registry.register_builder("research", "v7", build)
+    with pytest.raises(KeyError):
+        registry.get("research", "v1")
+    entries = []
+    threads = [threading.Thread(target=lambda: entries.append(registry.get("research"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Built once, under the version the builder was registered with
+    assert len(built) == 1
+    assert {e.version for e in entries} == {"v7"} and all(e is entries[0] for e in entries)
+    assert registry.get("research", "v7") is entries[0]
+    assert registry.versions("research") == {"active": "v7", "versions": ["v7"]}
+    with pytest.raises(KeyError):
+        registry.get("other")
+
+
+def test_registered_versions_and_activation():
+    registry = GraphRegistry()
+    registry.register_builder("research", "v1", lambda: FakeGraph("lazy"))
+    v1 = registry.register("research", "v1", FakeGraph())
+    v2 = registry.register("research", "v2", FakeGraph("a", "b"), activate=False)
+    assert registry.get("research") is v1
+    assert v1.schema == FALLBACK_SCHEMA and v1.etag != v2.etag
+    in_flight = registry.get("research")
+    registry.activate("research", "v2")
+    assert registry.get("research") is v2 and in_flight is v1
+    with pytest.raises(KeyError):
+        registry.activate("research", "v3")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    registry = GraphRegistry()
+    registry.register("research", "v1", FakeGraph("a", "b"))
+    registry.register("research", "v2", FakeGraph("a", "b", "c"), activate=False)
+    monkeypatch.setattr(graph_schema, "graph_registry", registry)
+    app = FastAPI()
+    app.include_router(graph_schema.router, prefix="/api")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_schema_with_etag(client):
+    response = client.get("/api/graph-schema")
+    assert response.status_code == 200
+    assert response.json()["nodes"] == [{"id": "a", "label": "a"}, {"id": "b", "label": "b"}]
+    assert response.headers["cache-control"] == "no-cache"
+    v2 = client.get("/api/graph-schema", params={"version": "v2"})
+    assert v2.headers["etag"] != response.headers["etag"]
+    assert client.get("/api/graph-schema", params={"version": "v9"}).status_code == 404
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get("/api/graph-schema").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/api/graph-schema", headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+    # Another version's tag, or a stale one, gets the full schema
+    for header in ('"other"', etag.replace("v1", "v2")):
+        assert client.get("/api/graph-schema", headers={"If-None-Match": header}).status_code == 200
+    response = client.get("/api/graph-schema", params={"version": "v2"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json()["nodes"]) == 3
@@ -0,0 +1,36 @@
+import asyncio
+
+from langchain_core.messages import AIMessageChunk
+
+from agents.research_graph import build_graph, build_payload, is_final_event, stream_graph
+from agents.snapshots import SnapshotEncoder
+
+
+def test_stream_payload_keeps_token_text():
+    step = {
+        "event": "on_chat_model_stream",
+        "name": "ChatOpenAI",
+        "run_id": "r",
+        "data": {"chunk": AIMessageChunk(content=" tok", id="run-1")},
+        "metadata": {"langgraph_node": "synthesizer"},
+    }
+    payload = build_payload(step, "run", 0, SnapshotEncoder())
+    assert payload["data"]["chunk"]["content"] == " tok"
+
+
+def test_streamed_tokens_add_up_to_the_draft(offline):
+    async def main():
+        graph = build_graph(checkpoints=False)
+        # A question of its own: a cached reply arrives without stream events
+        events = [e async for e in stream_graph(graph, "How do streamed drafts reach the browser?")]
+        return events
+
+    events = asyncio.run(main())
+    tokens = [
+        e["data"]["chunk"]["content"]
+        for e in events
+        if e["event"] == "on_chat_model_stream" and e["metadata"].get("langgraph_node") == "synthesizer"
+    ]
+    final = next(e for e in events if is_final_event(e))["data"]["output"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == final["draft"]
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.nodes import researcher, verifier
+from agents.nodes.researcher import CITATION_SUFFIXES, DEPTH_SUFFIXES, followup_queries, researcher_node
+from agents.nodes.verifier import budget_exhausted, verifier_node
+
+QUESTION = "How do agents checkpoint state?"
+FIRST_ROUND = [QUESTION, f"{QUESTION} overview", f"{QUESTION} examples"]
+CITATIONS = "Not enough citations, need more sources."
+SHORT = "Draft too short, likely missing depth."
+
+
+def test_followup_queries_aim_at_the_issues():
+    queries = followup_queries(QUESTION, [CITATIONS, SHORT], FIRST_ROUND)
+    assert queries == [f"{QUESTION} {s}" for s in CITATION_SUFFIXES[:2] + DEPTH_SUFFIXES[:2]]
+    assert followup_queries(QUESTION, [], FIRST_ROUND) == [f"{QUESTION} {s}" for s in CITATION_SUFFIXES[:2]]
+    assert followup_queries(QUESTION, ["Something else"], FIRST_ROUND, per_issue=1) == [f"{QUESTION} details"]
+
+
+def test_followup_queries_skip_ones_already_run():
+    done = FIRST_ROUND + [f"  {QUESTION.upper()}  SOURCES ", f"{QUESTION} study"]
+    assert followup_queries(QUESTION, [CITATIONS, CITATIONS], done) == [
+        f"{QUESTION} research", f"{QUESTION} references", f"{QUESTION} official documentation",
+    ]
+    every = FIRST_ROUND + [f"{QUESTION} {s}" for s in CITATION_SUFFIXES]
+    assert followup_queries(QUESTION, [CITATIONS], every) == []
+
+
+def test_a_retry_only_searches_new_followup_queries(monkeypatch):
+    searched = []
+
+    async def search_web(queries):
+        searched.append(list(queries))
+        return []
+
+    monkeypatch.setattr(researcher, "search_web", search_web)
+    state = {"question": QUESTION, "queries": [], "documents": [], "notes": []}
+    state = asyncio.run(researcher_node(state))
+    for _ in range(3):
+        state["verification"] = {"issues": [CITATIONS]}
+        state = asyncio.run(researcher_node(state))
+    assert searched[0] == FIRST_ROUND
+    assert searched[1:] == [
+        [f"{QUESTION} sources", f"{QUESTION} research"],
+        [f"{QUESTION} references", f"{QUESTION} study"],
+        [f"{QUESTION} official documentation"],
+    ]
+    assert state["queries"] == [q for batch in searched for q in batch]
+    # Out of follow-ups: nothing is searched again
+    state["verification"] = {"issues": [CITATIONS]}
+    asyncio.run(researcher_node(state))
+    assert len(searched) == 4
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    monkeypatch.setattr(verifier, "MAX_RESEARCH_RETRIES", 2)
+    monkeypatch.setattr(verifier, "RUN_TIME_BUDGET_S", 60)
+    monkeypatch.setattr(verifier, "RUN_TOKEN_BUDGET", 1000)
+
+
+def test_budget_exhausted(budgets):
+    now = time.time()
+    assert budget_exhausted({}) is None
+    assert budget_exhausted({"retries": 1, "started_at": now, "tokens_used": 999}) is None
+    assert budget_exhausted({"retries": 2}) == "retries"
+    assert budget_exhausted({"started_at": now - 61}) == "time"
+    assert budget_exhausted({"tokens_used": 1000}) == "tokens"
+    assert budget_exhausted({"retries": 5, "started_at": now - 61, "tokens_used": 1000}) == "retries"
+
+
+DOCS = [
+    {"title": "A", "url": "https://example.com/a", "content": "Agents checkpoint their state after every step."},
+    {"title": "B", "url": "https://example.com/b", "content": "Checkpoints let a failed run resume from the last step."},
+]
+# One citation but long enough: a single issue
+BEST = (
+    "Agents checkpoint their state after every step (source: https://example.com/a). "
+    + "Checkpoints let a failed run resume from the last step, so work is not lost. " * 3
+)
+# No citations and short: two issues
+WORSE = "Agents save state."
+
+
+def verify_until_done(state, drafts):
+    """The graph's researcher -> synthesizer -> verifier loop, without the search."""
+    for draft, citations in drafts:
+        state = asyncio.run(verifier_node({**state, "draft": draft, "citations": citations}))
+        verification = state["verification"]
+        if not verification["issues"] or verification.get("budget_exhausted"):
+            return state
+    raise AssertionError("the verifier never stopped the run")
+
+
+def test_retries_stop_and_return_the_best_draft(budgets):
+    drafts = [(WORSE, []), (BEST, ["https://example.com/a"]), (WORSE, []), (WORSE, [])]
+    state = verify_until_done({"question": QUESTION, "documents": DOCS, "started_at": time.time()}, drafts)
+    assert state["retries"] == 2
+    assert state["verification"]["budget_exhausted"] == "retries"
+    # The last draft's issues are reported, the best draft is what the run returns
+    assert state["verification"]["issues"] == [CITATIONS, SHORT]
+    assert state["final"] == state["draft"] == BEST
+    assert state["citations"] == ["https://example.com/a"]
+
+
+def test_token_budget_stops_retries_early(budgets):
+    state = {"question": QUESTION, "documents": DOCS, "tokens_used": 5000}
+    state = verify_until_done(state, [(WORSE, [])])
+    assert state["verification"]["budget_exhausted"] == "tokens"
+    assert state["final"] == WORSE and "retries" not in state
+
+
+def test_a_clean_draft_ends_the_run(budgets):
+    draft = (
+        "Agents checkpoint their state after every step (source: https://example.com/a). "
+        "Checkpoints let a failed run resume from the last step (source: https://example.com/b). "
+    ) * 2
+    state = verify_until_done(
+        {"question": QUESTION, "documents": DOCS},
+        [(WORSE, []), (draft, ["https://example.com/a", "https://example.com/b"])],
+    )
+    assert state["verification"]["issues"] == []
+    assert state["final"] == draft and state["retries"] == 1
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import services.scheduler
+from core.cache import cache
+from fakes.web_stub import make_search, start_pages
+from services.scheduler import CANCELLED, COMPLETED, QueueFull, RunScheduler
+
+
+@pytest.fixture
+def fake_runs(monkeypatch):
+    """Runs that only wait on an event, so scheduling can be tested alone."""
+    release = asyncio.Event()
+
+    async def stream_graph(graph, question, *args):
+        await release.wait()
+        yield {"event": "on_chain_end", "name": "LangGraph", "data": {"output": {"final": question}}}
+
+    monkeypatch.setattr(services.scheduler, "get_graph", lambda: None)
+    monkeypatch.setattr(services.scheduler, "stream_graph", stream_graph)
+    return release
+
+
+def test_queue_full_and_tenant_limit(fake_runs):
+    async def main():
+        scheduler = RunScheduler(max_workers=2, max_queue=2, tenant_limit=1)
+        a1 = scheduler.submit("q", tenant="a")
+        a2 = scheduler.submit("q", tenant="a")
+        b1 = scheduler.submit("q", tenant="b")
+        # a2 waits for tenant a's slot without holding up tenant b
+        assert (a1.status, a2.status, b1.status) == ("running", "queued", "running")
+        scheduler.submit("q", tenant="c")
+        with pytest.raises(QueueFull):
+            scheduler.submit("q", tenant="c")
+        fake_runs.set()
+        await scheduler.aclose()
+
+    asyncio.run(main())
+
+
+def test_cancel_queued_run(fake_runs):
+    async def main():
+        scheduler = RunScheduler(max_workers=1)
+        first = scheduler.submit("first")
+        second = scheduler.submit("second")
+        assert scheduler.cancel(second.run_id)
+        assert second.status == CANCELLED
+        fake_runs.set()
+        await scheduler.wait(first)
+        assert first.status == COMPLETED
+        assert first.final_state == {"final": "first"}
+
+    asyncio.run(main())
+
+
+def test_cancelling_a_run_leaves_an_identical_run_intact(offline, monkeypatch):
+    # Slow pages on a server of their own (so nothing is cached yet): both
+    # runs are waiting on the same shared page fetches when A is cancelled
+    server, pages_url, stats = start_pages(page_kb=16, latency_s=0.5)
+    monkeypatch.setattr("agents.nodes.researcher.search_web", make_search(pages_url, stats=stats))
+
+    async def main():
+        scheduler = RunScheduler(max_workers=2, tenant_limit=2)
+        shared = cache.flight.shared
+        a = scheduler.submit("How do shared fetches survive cancellation?", tenant="a")
+        b = scheduler.submit("How do shared fetches survive cancellation?", tenant="b")
+        # The first run in the process also builds the graph; wait for B to
+        # join one of A's calls
+        for _ in range(200):
+            if cache.flight.shared > shared:
+                break
+            await asyncio.sleep(0.05)
+        assert cache.flight.shared > shared
+        await scheduler.cancel_and_wait(a.run_id)
+        await scheduler.wait(b)
+        return a, b
+
+    try:
+        a, b = asyncio.run(main())
+    finally:
+        server.shutdown()
+    assert a.status == CANCELLED
+    assert b.status == COMPLETED, b.error
+    assert b.final_state["final"]
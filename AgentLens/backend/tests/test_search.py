@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.nodes.search import _normalize_tavily, search_all
+from fakes.web_stub import PageStats, make_search
+
+
+class FakeSearch:
+    """Per-query results after a delay; "slow" queries hang, "bad" ones fail."""
+
+    def __init__(self, delay_s: float = 0.02):
+        self.delay_s = delay_s
+        self.active = self.peak = self.cancelled = 0
+
+    async def __call__(self, q: str):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(10 if "slow" in q else self.delay_s)
+            if "bad" in q:
+                raise RuntimeError(f"search failed for {q}")
+            return [{"url": f"https://example.com/{q}", "title": q}, {"url": "https://example.com/shared", "title": q}]
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+
+
+def run(search, queries, **kwargs):
+    return asyncio.run(search_all(search, queries, _normalize_tavily, "test", **kwargs))
+
+
+def test_at_most_concurrency_queries_in_flight():
+    search = FakeSearch()
+    queries = [f"q{i}" for i in range(10)]
+    results = run(search, queries, concurrency=3, timeout=5)
+    assert search.peak == 3
+    # Query order, first occurrence of a URL wins
+    assert [r["url"] for r in results] == [
+        "https://example.com/q0", "https://example.com/shared", *(f"https://example.com/{q}" for q in queries[1:])
+    ]
+    assert results[1]["title"] == "q0"
+
+
+def test_a_slow_or_failing_query_does_not_fail_the_step():
+    search = FakeSearch()
+    start = time.perf_counter()
+    results = run(search, ["q0", "slow", "bad", "q1"], concurrency=4, timeout=0.2)
+    assert time.perf_counter() - start < 2
+    assert [r["url"] for r in results] == [
+        "https://example.com/q0", "https://example.com/shared", "https://example.com/q1",
+    ]
+    # The timed-out query was cancelled, not left running
+    assert search.cancelled == 1 and search.active == 0
+
+
+def test_each_query_gets_its_own_timeout():
+    # Queued queries start their clock when they start, not when the step does
+    search = FakeSearch(delay_s=0.1)
+    results = run(search, [f"q{i}" for i in range(6)], concurrency=2, timeout=0.15)
+    assert len(results) == 7 and search.cancelled == 0
+
+
+def test_errors_only_surface_when_every_query_fails():
+    with pytest.raises(RuntimeError, match="bad1"):
+        run(FakeSearch(), ["bad1", "bad2"])
+    # Timeouts alone give no results rather than an error
+    assert run(FakeSearch(), ["slow1", "slow2"], timeout=0.05) == []
+    assert run(FakeSearch(), []) == []
+
+
+def test_cancelling_the_step_cancels_running_queries():
+    search = FakeSearch(delay_s=5)
+
+    async def main():
+        task = asyncio.create_task(search_all(search, [f"q{i}" for i in range(6)], _normalize_tavily, "test", 3, 10))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    start = time.perf_counter()
+    leftover = asyncio.run(main())
+    assert time.perf_counter() - start < 1
+    assert leftover == []
+    assert search.cancelled == 3 and search.active == 0
+
+
+def test_stub_search_fans_out_through_search_all():
+    stats = PageStats()
+    search_web = make_search("http://pages", results=3, latency_s=0.01, stats=stats)
+    results = asyncio.run(search_web(["agents", "graphs", "agents"]))
+    assert stats.searches == 3
+    # The repeated query adds no new URLs
+    assert len(results) == len({r["url"] for r in results}) == 6
+    assert all(r["url"].startswith("http://pages/page/") for r in results)
@@ -0,0 +1,93 @@
+import datetime
+import decimal
+import json
+import uuid
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+import agents.serialization
+from agents.serialization import JSONSerializer, dumps, serialize_for_json
+from benchmarks.bench_serialize import legacy_serialize_for_json, make_trace
+
+
+class Usage:
+    def __init__(self):
+        self.input_tokens = 3
+        self.output_tokens = 4
+
+
+class Node:
+    def __init__(self, name, child=None):
+        self.name = name
+        self.child = child
+        self._private = "hidden"
+        self._type = "node"
+        self.token_usage = Usage()
+
+
+class WithUsage:
+    def __init__(self):
+        self.usage_metadata = Usage()
+
+
+class WithContent:
+    content = [{"type": "text", "text": "hi"}, ("a", 1)]
+
+
+EDGE_CASES = [
+    None,
+    {"nested": {"list": [1, 2.5, True, None, ("t", "u")], "empty": {}}},
+    {1: "int key", "s": "str key"},
+    uuid.UUID(int=7),
+    datetime.datetime(2024, 1, 2, 3, 4, 5),
+    datetime.date(2024, 1, 2),
+    decimal.Decimal("1.25"),
+    b"bytes",
+    {"set": {1}, "complex": 1j},
+    Node("root", Node("leaf")),
+    WithUsage(),
+    WithContent(),
+    HumanMessage(content="question"),
+    AIMessage(content="answer", usage_metadata={"input_tokens": 1, "output_tokens": 2, "total_tokens": 3}),
+    AIMessageChunk(content=" tok", id="run-1"),
+    object(),
+]
+
+
+@pytest.mark.parametrize("obj", EDGE_CASES, ids=lambda obj: type(obj).__name__)
+def test_matches_legacy_serializer(obj):
+    # A fresh instance too: the handler cache must not change the result
+    assert serialize_for_json(obj) == legacy_serialize_for_json(obj)
+    assert JSONSerializer()(obj) == legacy_serialize_for_json(obj)
+
+
+def test_matches_legacy_serializer_on_a_run_trace():
+    for event in make_trace(tokens=20):
+        for part in (event.get("data"), event.get("metadata", {})):
+            assert serialize_for_json(part) == legacy_serialize_for_json(part)
+
+
+def test_cycle_serializes_instead_of_recursing():
+    node = Node("loop")
+    node.child = node
+    loop = {"self": None}
+    loop["self"] = loop
+    assert json.loads(dumps(serialize_for_json(node)))["name"] == "loop"
+    assert json.loads(dumps(serialize_for_json(loop)))
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_dumps_matches_json_dumps(backend, monkeypatch):
+    if backend == "json":
+        monkeypatch.setattr(agents.serialization, "orjson", None)
+    elif agents.serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    payloads = [serialize_for_json(obj) for obj in EDGE_CASES] + [{"wide": 2 ** 70, "text": "naïve ✓"}]
+    for payload in payloads:
+        assert json.loads(dumps(payload)) == json.loads(json.dumps(payload))
+    # Unserialized values go through the serializer rather than failing
+    assert json.loads(dumps({"id": uuid.UUID(int=7), "node": Node("n")})) == {
+        "id": str(uuid.UUID(int=7)),
+        "node": legacy_serialize_for_json(Node("n")),
+    }
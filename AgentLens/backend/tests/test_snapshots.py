@@ -0,0 +1,88 @@
+import copy
+import json
+
+import pytest
+
+from agents.research_graph import build_payload
+from agents.snapshots import SnapshotEncoder, apply_patch, diff, rebuild_state
+from benchmarks.bench_micro import FIXTURES, load_fixture
+
+PAIRS = [
+    ({}, {"a": 1}),
+    ({"a": 1, "b": 2}, {"a": 1}),
+    ({"a": {"b": {"c": [1, 2]}}}, {"a": {"b": {"c": [1, 2, 3], "d": None}}}),
+    ({"notes": ["a", "b"]}, {"notes": ["a", "b", "c", "d"]}),
+    ({"notes": ["a", "b", "c"]}, {"notes": ["a"]}),
+    ({"notes": ["a", "b", "c"]}, {"notes": ["x", "b", "c"]}),
+    ({"docs": [{"url": "u", "n": 1}]}, {"docs": [{"url": "u", "n": 2, "t": "x"}]}),
+    ({"a/b": 1, "c~d": {"~/": [1]}}, {"a/b": 2, "c~d": {"~/": [1, 2]}, "~1": "x", "/": "y"}),
+    ({"v": 1}, {"v": True}),
+    ({"v": 1}, {"v": 1.0}),
+    ({"v": [1]}, {"v": {"0": 1}}),
+    ({"v": "text"}, {"v": None}),
+    ([1, 2], [3]),
+    ("a", "b"),
+]
+
+
+@pytest.mark.parametrize("old,new", PAIRS)
+def test_patch_round_trip(old, new):
+    before = copy.deepcopy(old)
+    ops = diff(old, new)
+    # Over the wire, as the frontend gets them
+    ops = json.loads(json.dumps(ops))
+    patched = apply_patch(old, ops)
+    assert patched == new
+    assert [type(v) for v in _leaves(patched)] == [type(v) for v in _leaves(new)]
+    assert old == before
+
+
+def _leaves(value):
+    if isinstance(value, dict):
+        return [leaf for k in sorted(value) for leaf in _leaves(value[k])]
+    if isinstance(value, list):
+        return [leaf for v in value for leaf in _leaves(v)]
+    return [value]
+
+
+def test_appended_items_only_cost_the_new_items():
+    old = {"notes": ["n"] * 100}
+    ops = diff(old, {"notes": ["n"] * 100 + ["new"]})
+    assert ops == [{"op": "add", "path": "/notes/-", "value": "new"}]
+    assert diff(old, copy.deepcopy(old)) == []
+
+
+def test_keyframe_every_n_snapshots():
+    encoder = SnapshotEncoder(keyframe_interval=3)
+    kinds = []
+    for i in range(7):
+        fields = encoder.encode(i * 10, {"notes": [str(n) for n in range(i)]})
+        kinds.append("keyframe" if "state_snapshot" in fields else "patch")
+        if "state_patch" in fields:
+            assert fields["state_base_step"] == (i - 1) * 10
+    assert kinds == ["keyframe", "patch", "patch"] * 2 + ["keyframe"]
+    assert not SnapshotEncoder(keyframe_interval=1).delta
+
+
+@pytest.fixture(scope="module")
+def trace():
+    return load_fixture(FIXTURES / "traces" / "research_run.json.gz")
+
+
+def payloads(trace, interval):
+    encoder = SnapshotEncoder(keyframe_interval=interval)
+    return [json.loads(json.dumps(build_payload(step, "run", i, encoder))) for i, step in enumerate(trace)]
+
+
+def test_rebuild_state_reproduces_every_step(trace):
+    full = payloads(trace, 1)
+    delta = payloads(trace, 2)
+    snapshots = [p for p in full if "state_snapshot" in p]
+    assert len(snapshots) >= 4
+    assert any("state_patch" in p for p in delta)
+    for p in snapshots:
+        assert rebuild_state(delta, p["step_index"]) == p["state_snapshot"]
+    assert rebuild_state(delta) == snapshots[-1]["state_snapshot"]
+    # Events out of order, as a store may return them
+    assert rebuild_state(list(reversed(delta))) == snapshots[-1]["state_snapshot"]
+    assert rebuild_state(delta, -1) == {}
@@ -0,0 +1,79 @@
+import asyncio
+import random
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from agents.nodes import synthesizer
+from agents.nodes.synthesizer import CITATION, CitationScanner, synthesizer_node
+
+DRAFT = (
+    "Agents checkpoint state (source: https://example.com/a). Streams are cheap "
+    "(source: https://example.com/b?x=1&y=2)(source: https://example.com/c). "
+    "Not a citation (see: https://example.com/d) nor (source: ftp://example.com/e). "
+    "Unfinished (source: https://example.com/f"
+)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_scanner_matches_findall_on_any_split(seed):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(DRAFT)), 30))
+    chunks = [DRAFT[i:j] for i, j in zip([0] + cuts, cuts + [len(DRAFT)])]
+    scanner = CitationScanner()
+    found = []
+    for chunk in chunks:
+        found.extend(scanner.feed(chunk))
+    assert scanner.text == DRAFT
+    assert found == scanner.urls == CITATION.findall(DRAFT)
+
+
+def test_scanner_one_character_at_a_time():
+    scanner = CitationScanner()
+    for ch in DRAFT:
+        scanner.feed(ch)
+    assert scanner.urls == CITATION.findall(DRAFT)
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    events = []
+
+    async def emit(name, data):
+        events.append((name, data))
+
+    monkeypatch.setattr(synthesizer, "_emit", emit)
+    return events
+
+
+def stream_of(chunks, delay_s: float = 0.0):
+    async def astream(prompt, **kwargs):
+        for chunk in chunks:
+            await asyncio.sleep(delay_s)
+            yield AIMessageChunk(content=chunk)
+
+    return astream
+
+
+def test_first_token_and_citations_are_dispatched(emitted, monkeypatch):
+    chunks = ["", "Agents checkpoint (source: https://exa", "mple.com/a). And (source: https://example.com/b)."]
+    monkeypatch.setattr(synthesizer.llm_gateway, "astream", stream_of(chunks, delay_s=0.02))
+    state = asyncio.run(synthesizer_node({"question": "q", "notes": ["n"]}))
+
+    assert state["draft"] == "".join(chunks)
+    # The empty first chunk does not count as the first token
+    first_tokens = [data for name, data in emitted if name == "first_token"]
+    assert first_tokens == [{"node": "synthesizer", "ttft_ms": state["ttft_ms"]}]
+    assert state["ttft_ms"] >= 40
+    assert [data for name, data in emitted if name == "citation"] == [
+        {"url": "https://example.com/a", "index": 0},
+        {"url": "https://example.com/b", "index": 1},
+    ]
+    assert [c["url"] for c in state["citations"]] == ["https://example.com/a", "https://example.com/b"]
+
+
+def test_cached_reply_is_one_chunk(emitted, monkeypatch):
+    monkeypatch.setattr(synthesizer.llm_gateway, "astream", stream_of(["All at once (source: https://example.com/a)."]))
+    state = asyncio.run(synthesizer_node({"question": "q", "notes": []}))
+    assert [name for name, _ in emitted] == ["first_token", "citation"]
+    assert state["ttft_ms"] is not None
@@ -1,2 +1,62 @@
-# Basic run demo
+"""Basic run demo: one research run, printed node by node.
 
+    python demos/basic_run.py "What is LangGraph?"
+    python demos/basic_run.py --offline "What is LangGraph?"
+
+With --offline, the LLM, search and pages are local stand-ins
+(backend/fakes), so no API keys or network are needed.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND))
+
+
+async def run(question: str) -> None:
+    from agents.registry import get_graph, init_graph_registry
+    from agents.research_graph import is_final_event, stream_graph
+    from services.event_store import event_store
+
+    init_graph_registry()
+    final = None
+    async for event in stream_graph(get_graph(), question):
+        node = (event.get("metadata") or {}).get("langgraph_node")
+        if event["event"] == "on_chain_end" and node and event["name"] == node:
+            print(f"[{event['step_index']:4d}] {node} done")
+        if is_final_event(event):
+            final = (event.get("data") or {}).get("output") or {}
+    await event_store.aclose()
+
+    if final:
+        print(f"\nrun {event['run_id']}\n")
+        print(final.get("final") or final.get("draft") or "(no answer)")
+        for c in final.get("citations") or []:
+            print(f"  - {c['url']}")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("question", nargs="?", default="What is LangGraph and how does it handle state?")
+    p.add_argument("--offline", action="store_true", help="use the local LLM/search/page stand-ins")
+    args = p.parse_args()
+
+    if args.offline:
+        from fakes.openai_stub import start_stub
+
+        _, base_url, _ = start_stub()
+        os.environ.update({"OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "stub", "LANGSMITH_TRACING": "false"})
+        from fakes.web_stub import make_search, start_pages
+        from agents.nodes import researcher
+
+        _, pages_url, _ = start_pages(page_kb=16)
+        researcher.search_web = make_search(pages_url)
+
+    asyncio.run(run(args.question))
+
+
+if __name__ == "__main__":
+    main()
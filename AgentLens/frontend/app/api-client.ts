@@ -7,9 +7,25 @@ export async function runAgent(question: string) {
   return res.json();
 }
 
-export function openRunWebsocket(question: string) {
+export type RunStreamOptions = {
+  // Only receive these event kinds / node names (default: everything)
+  subscribe?: { events?: string[]; nodes?: string[] };
+  // Coalescing window for high-rate events; 0 sends them one per frame
+  batch_ms?: number;
+  // Note extraction: one call over all sources, or one per source merged
+  extraction_mode?: "single" | "map_reduce";
+};
+
+export function openRunWebsocket(question: string, options: RunStreamOptions = {}) {
   const ws = new WebSocket("ws://localhost:8000/ws/run");
-  ws.onopen = () => ws.send(JSON.stringify({ question }));
+  ws.onopen = () => ws.send(JSON.stringify({ question, ...options }));
   return ws;
 }
 
+
+// Watch a run already in progress (or finished) from step 0 without re-running it
+export function attachRunWebsocket(runId: string, options: Omit<RunStreamOptions, "extraction_mode"> = {}) {
+  const ws = new WebSocket(`ws://localhost:8000/ws/runs/${encodeURIComponent(runId)}`);
+  ws.onopen = () => ws.send(JSON.stringify(options));
+  return ws;
+}
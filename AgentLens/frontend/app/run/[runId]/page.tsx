@@ -14,6 +14,7 @@ import DriftPanel from "../../../components/DriftPanel";
 import FinalAnswer from "../../../components/FinalAnswer";
 import StatusLog from "../../../components/StatusLog";
 import { diffStates, DiffItem } from "../../../components/diff";
+import { applyPatch, PatchOp } from "../../../components/patch";
 
 type RunEvent = {
   run_id: string;
@@ -24,6 +25,8 @@ type RunEvent = {
   ts?: number;
   step_index?: number;
   state_snapshot?: any;
+  state_patch?: PatchOp[];
+  state_base_step?: number;
 };
 
 type Snapshot = { step: number; state: any };
@@ -140,6 +143,8 @@ function RunPageContent({ runId }: { runId: string }) {
     const ws = openRunWebsocket(question);
     let eventBuffer: RunEvent[] = [];
     let bufferTimeout: NodeJS.Timeout | null = null;
+    // Last full state; snapshots between keyframes arrive as patches against it
+    let lastState: any = null;
     
     const flushBuffer = () => {
       if (eventBuffer.length === 0) return;
@@ -179,8 +184,13 @@ function RunPageContent({ runId }: { runId: string }) {
       bufferTimeout = null;
     };
     
-    ws.onmessage = (msg) => {
-      const e: RunEvent = JSON.parse(msg.data);
+    const handleEvent = (e: RunEvent) => {
+      if (e.state_patch && lastState) {
+        e.state_snapshot = applyPatch(lastState, e.state_patch);
+      }
+      if (e.state_snapshot) {
+        lastState = e.state_snapshot;
+      }
       
       // Process critical events immediately (state changes, node completions)
       if (e.state_snapshot || e.event === "on_chain_end" || e.event === "on_chain_start" || 
@@ -214,6 +224,18 @@ function RunPageContent({ runId }: { runId: string }) {
         }
       }
     };
+
+    ws.onmessage = (msg) => {
+      const frame = JSON.parse(msg.data);
+      // High-rate events (token chunks) arrive coalesced into batch frames
+      if (frame.type === "batch") {
+        for (const e of frame.events as RunEvent[]) {
+          handleEvent(e);
+        }
+      } else {
+        handleEvent(frame as RunEvent);
+      }
+    };
     
     ws.onclose = () => {
       // Flush any remaining events on close
@@ -227,7 +249,25 @@ function RunPageContent({ runId }: { runId: string }) {
     };
   }, [question, isLive]);
 
-  const hasFinalAnswer = shownState?.final || shownState?.draft;
+  // Draft text as the synthesizer streams it; cleared once its node ends
+  // (the snapshot then carries the draft)
+  const liveDraft = useMemo(() => {
+    if (!isLive) return "";
+    let text = "";
+    for (const e of events) {
+      if (e.metadata?.langgraph_node !== "synthesizer") continue;
+      if ((e.event === "on_chain_start" || e.event === "on_chain_end") && e.name === "synthesizer") {
+        text = "";
+      } else if (e.event === "on_chat_model_stream") {
+        const content = e.data?.chunk?.content;
+        if (typeof content === "string") text += content;
+      }
+    }
+    return text;
+  }, [events, isLive]);
+
+  const answerState = liveDraft ? { draft: liveDraft } : shownState;
+  const hasFinalAnswer = answerState?.final || answerState?.draft;
 
   return (
     <main className="min-h-screen p-8 bg-gradient-to-br from-gray-50 to-white">
@@ -240,7 +280,7 @@ function RunPageContent({ runId }: { runId: string }) {
         </div>
         
         {/* Final Answer at Top */}
-        {hasFinalAnswer && <FinalAnswer state={shownState || {}} />}
+        {hasFinalAnswer && <FinalAnswer state={answerState || {}} />}
       </div>
 
       {/* Center: Graph Execution */}
@@ -0,0 +1,43 @@
+export type PatchOp = {
+  op: "add" | "remove" | "replace";
+  path: string;
+  value?: any;
+};
+
+function unescape(token: string): string {
+  return token.replace(/~1/g, "/").replace(/~0/g, "~");
+}
+
+// Apply JSON Patch operations (as produced by the backend's snapshot encoder)
+// to a copy of `doc`.
+export function applyPatch(doc: any, ops: PatchOp[]): any {
+  let root = structuredClone(doc);
+  for (const op of ops) {
+    if (op.path === "") {
+      root = structuredClone(op.value);
+      continue;
+    }
+    const tokens = op.path.split("/").slice(1).map(unescape);
+    let parent: any = root;
+    for (const token of tokens.slice(0, -1)) {
+      parent = Array.isArray(parent) ? parent[Number(token)] : parent[token];
+    }
+    const last = tokens[tokens.length - 1];
+    const value = op.value === undefined ? undefined : structuredClone(op.value);
+    if (Array.isArray(parent)) {
+      if (op.op === "add") {
+        if (last === "-") parent.push(value);
+        else parent.splice(Number(last), 0, value);
+      } else if (op.op === "remove") {
+        parent.splice(Number(last), 1);
+      } else {
+        parent[Number(last)] = value;
+      }
+    } else if (op.op === "remove") {
+      delete parent[last];
+    } else {
+      parent[last] = value;
+    }
+  }
+  return root;
+}